@@ -0,0 +1,46 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def clave_calle(nombre):
+    # Copia de calles.models.clave_calle al momento de esta migración
+    sin_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", nombre or "") if not unicodedata.combining(c)
+    )
+    return " ".join(sin_acentos.lower().split())
+
+
+def llenar_claves(apps, schema_editor):
+    """
+    Calcula la clave de las calles existentes. Si dos calles ya tenían el
+    mismo nombre normalizado, la de menor id se queda con la clave y las
+    demás quedan en NULL (no se fusionan: pueden tener cuentas asignadas).
+    """
+    Calle = apps.get_model("calles", "Calle")
+    vistas = set()
+    cambiadas = []
+    for calle in Calle.objects.order_by("id_calle"):
+        clave = clave_calle(calle.nombre_calle)
+        if clave in vistas:
+            continue
+        vistas.add(clave)
+        calle.clave = clave
+        cambiadas.append(calle)
+    Calle.objects.bulk_update(cambiadas, ["clave"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calle',
+            name='clave',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True),
+        ),
+        migrations.RunPython(llenar_claves, migrations.RunPython.noop),
+    ]
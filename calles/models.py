@@ -1,15 +1,48 @@
+import unicodedata
+
 from django.db import models
 
+
+def clave_calle(nombre):
+    """
+    Nombre de calle normalizado para comparar: sin espacios de más, en
+    minúsculas y sin acentos ("  Av. Juárez " y "AV. JUAREZ" son la misma).
+    """
+    sin_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", nombre or "") if not unicodedata.combining(c)
+    )
+    return " ".join(sin_acentos.lower().split())
+
+
 # Create your models here.
 class Calle(models.Model):
     id_calle = models.AutoField(primary_key=True)
     nombre_calle = models.CharField(max_length=100)
     activo = models.BooleanField(default=True)
+    # clave_calle(nombre_calle); única para que asignar_calles pueda crear
+    # las faltantes con bulk_create(ignore_conflicts=True). NULL en los
+    # duplicados que ya existían antes de la migración 0002.
+    clave = models.CharField(max_length=100, unique=True, null=True, editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._nombre_guardado = self.__dict__.get("nombre_calle")
 
     def __str__(self):
         return self.nombre_calle
+
+    def save(self, *args, **kwargs):
+        # Solo si cambió el nombre: editar otro campo de un duplicado viejo
+        # (clave NULL) no debe chocar con la calle que se quedó la clave.
+        if self._state.adding or self.nombre_calle != self._nombre_guardado:
+            self.clave = clave_calle(self.nombre_calle)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "nombre_calle" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "clave"}
+        super().save(*args, **kwargs)
+        self._nombre_guardado = self.nombre_calle
     
     class Meta:
         ordering = ['nombre_calle']
         verbose_name = "Calle"
-        verbose_name_plural = "Calles"
\ No newline at end of file
+        verbose_name_plural = "Calles"
@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Calle
+from .models import Calle, clave_calle
+
+DUPLICADA = "Ya existe una calle con ese nombre."
+
 
 class CalleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,10 +12,29 @@ class CalleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id_calle']
 
     def validate_nombre_calle(self, value):
-        # Evita calles duplicadas
-        qs = Calle.objects.filter(nombre_calle__iexact=value.strip())
+        # Mismo nombre normalizado que ya tenía: no es duplicado (aunque sea
+        # una de las calles repetidas de antes de la clave)
+        if self.instance and clave_calle(value) == clave_calle(self.instance.nombre_calle):
+            return value.strip()
+        # Evita calles duplicadas (sin importar mayúsculas, acentos ni espacios)
+        qs = Calle.objects.filter(clave=clave_calle(value))
         if self.instance:
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
-            raise serializers.ValidationError("Ya existe una calle con ese nombre.")
-        return value.strip()
\ No newline at end of file
+            raise serializers.ValidationError(DUPLICADA)
+        return value.strip()
+
+    # Dos altas simultáneas pasan la validación; la restricción única decide
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"nombre_calle": [DUPLICADA]})
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"nombre_calle": [DUPLICADA]})
@@ -1,3 +1,51 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from cobrador.jwt_utils import create_access_token
+from cobrador.models import Cobrador
+from cobrador.principal_cache import principal_cache
+
+from .models import Calle
+
+
+class CalleClaveTests(TestCase):
+    """La clave normalizada evita duplicados sin romper las calles repetidas de antes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Cobrador.objects.create(
+            nombre="Admin", apellidos="Calles", email="admin-calles@test.mx",
+            usuario="admin-calles", password="secreto123", role=Cobrador.ROLE_ADMIN,
+        )
+        cls.calle = Calle.objects.create(nombre_calle="Av. Juárez")
+        # Duplicado anterior a la migración 0002: se quedó sin clave
+        cls.repetida = Calle.objects.create(nombre_calle="Otra")
+        Calle.objects.filter(pk=cls.repetida.pk).update(nombre_calle="AV. JUAREZ", clave=None)
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.admin.pk}))
+
+    def test_editar_duplicado_viejo(self):
+        resp = self.client.patch(f"/calles/{self.repetida.pk}/", {"activo": False}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        resp = self.client.put(
+            f"/calles/{self.repetida.pk}/", {"nombre_calle": "AV. JUAREZ", "activo": True}, format="json",
+        )
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertIsNone(Calle.objects.get(pk=self.repetida.pk).clave)
+
+        # Renombrarlo a un nombre libre le asigna su clave
+        resp = self.client.patch(f"/calles/{self.repetida.pk}/", {"nombre_calle": "Av. Hidalgo"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(Calle.objects.get(pk=self.repetida.pk).clave, "av. hidalgo")
+
+    def test_nombre_repetido_es_400(self):
+        resp = self.client.post("/calles/", {"nombre_calle": "  av.  juarez "}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("nombre_calle", resp.json())
+
+        otra = Calle.objects.create(nombre_calle="Morelos")
+        resp = self.client.patch(f"/calles/{otra.pk}/", {"nombre_calle": "Av. Juarez"}, format="json")
+        self.assertEqual(resp.status_code, 400)
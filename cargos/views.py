@@ -4,8 +4,9 @@ from rest_framework.permissions import IsAuthenticated
 from .models import Cargo, TipoCargo
 from .serializers import CargoSerializer, TipoCargoSerializer
 from cobrador.permissions import IsDirectivoOrReadOnly
+from cuentahabientes.saldos import SaldosMixin
 
-class CargoViewSet(viewsets.ModelViewSet):
+class CargoViewSet(SaldosMixin, viewsets.ModelViewSet):
     #queryset = Cargo.objects.select_related("cuentahabiente").order_by("-fecha_cargo","-id_cargo")
     serializer_class = CargoSerializer
     permission_classes = [IsAuthenticated]
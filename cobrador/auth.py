@@ -1,13 +1,32 @@
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework import exceptions
 from .jwt_utils import decode_token
 from .models import Cobrador
+from .principal_cache import principal_cache
 import jwt
 
 class JWTAuthentication(BaseAuthentication):
     keyword = b"Bearer"
 
     def authenticate(self, request):
+        payload = self._get_payload(request)
+        if payload is None:
+            return None
+
+        sub = payload.get("sub")
+        if not sub:
+            raise exceptions.AuthenticationFailed("Token sin 'sub'.")
+
+        user = self._get_cobrador(str(sub))
+
+        if hasattr(user, "is_active") and not user.is_active:
+            raise exceptions.AuthenticationFailed("Cuenta desactivada.")
+
+        return (user, None)
+
+    def _get_payload(self, request):
+        """Extrae y verifica el JWT de la cabecera; None si no viene Bearer."""
         auth = get_authorization_header(request).split()
         if not auth or auth[0].lower() != self.keyword.lower():
             return None
@@ -30,16 +49,97 @@ class JWTAuthentication(BaseAuthentication):
         except Exception:
             raise exceptions.AuthenticationFailed("Token inválido o expirado.")
 
-        sub = payload.get("sub")
-        if not sub:
-            raise exceptions.AuthenticationFailed("Token sin 'sub'.")
+        return payload
 
+    def _get_values(self, sub: str) -> dict:
+        """
+        Valores de la fila del Cobrador del token: primero el cache de
+        principals y, si no hay entrada vigente, una consulta por pk.
+        """
+        cached = principal_cache.get(sub)
+        if cached is not None:
+            return cached[0]
+
+        field_names = [f.attname for f in Cobrador._meta.concrete_fields]
         try:
-            user = Cobrador.objects.get(pk=int(sub))  # 🔸 convertir a int al buscar
-        except (ValueError, Cobrador.DoesNotExist):
+            values = Cobrador.objects.filter(pk=int(sub)).values(*field_names).first()  # 🔸 convertir a int al buscar
+        except ValueError:
+            values = None
+        if values is None:
             raise exceptions.AuthenticationFailed("Cobrador no encontrado.")
 
-        if hasattr(user, "is_active") and not user.is_active:
+        principal_cache.set(sub, values, values["is_active"])
+        return values
+
+    def _get_cobrador(self, sub: str) -> Cobrador:
+        """
+        Resuelve el Cobrador del token pasando primero por el cache de principals.
+        Cada request recibe su propia instancia (se reconstruye desde los valores).
+        """
+        values = self._get_values(sub)
+        field_names = [f.attname for f in Cobrador._meta.concrete_fields]
+        return Cobrador.from_db("default", field_names, [values[f] for f in field_names])
+
+
+
+class ClaimsPrincipal:
+    """
+    Principal ligero con los valores vigentes del Cobrador (cache de
+    principals). Expone lo que usan HasAnyRole / Roles(...) y el throttling
+    (pk, role). No es un Cobrador: no sirve para escribir.
+    """
+    __slots__ = ("id_cobrador", "usuario", "role")
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, id_cobrador: int, usuario: str, role: str):
+        self.id_cobrador = id_cobrador
+        self.usuario = usuario
+        self.role = role
+
+    @property
+    def pk(self) -> int:
+        return self.id_cobrador
+
+    def __eq__(self, other):
+        return getattr(other, "pk", None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return f"{self.usuario} [{self.role}]"
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """
+    Modo opt-in para viewsets de solo lectura:
+    - GET/HEAD/OPTIONS: el principal es un ClaimsPrincipal (sin instanciar el
+      modelo) con el 'usuario', 'role' e 'is_active' vigentes, resueltos por el
+      cache de principals o, si no hay entrada, con una consulta por pk. Los
+      claims 'usuario'/'role' del token no autorizan nada: una baja o un cambio
+      de rol aplica a más tardar en PRINCIPAL_CACHE_TTL segundos en cualquier
+      worker (de inmediato en el que guardó el cambio, o en todos con
+      PRINCIPAL_CACHE_SHARED), no cuando vence el token.
+    - Cualquier otro método resuelve el Cobrador completo.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        payload = self._get_payload(request)
+        if payload is None:
+            return None
+
+        sub = payload.get("sub")
+        if not sub:
+            raise exceptions.AuthenticationFailed("Token sin 'sub'.")
+
+        values = self._get_values(str(sub))
+        if not values["is_active"]:
             raise exceptions.AuthenticationFailed("Cuenta desactivada.")
 
-        return (user, None)
+        return (ClaimsPrincipal(values["id_cobrador"], values["usuario"], values["role"]), None)
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
+from .principal_cache import invalidar_principal
 # Create your models here.
 class Cobrador(models.Model):
     #------ ROLES DE USUARIOS ------
@@ -124,6 +125,11 @@ class Cobrador(models.Model):
 
         super().save(*args, **kwargs)
 
+        # El principal cacheado en JWTAuthentication deja de ser válido
+        # (rol, is_active, etc.) en cuanto el cambio se confirma.
+        pk = self.pk
+        transaction.on_commit(lambda: invalidar_principal(pk))
+
     def __str__(self):
         return f"{self.nombre} {self.apellidos} ({self.usuario}) [{self.get_role_display()}]"
 
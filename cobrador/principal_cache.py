@@ -0,0 +1,113 @@
+# cobrador/principal_cache.py
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _conf(key, default):
+    return getattr(settings, "JWT_SETTINGS", {}).get(key, default)
+
+
+class PrincipalCache:
+    """
+    Cache en memoria (por proceso) de los Cobradores autenticados.
+
+    - Llave: el 'sub' del token.
+    - Cada entrada guarda los valores de la fila, el 'is_active' y el sello de
+      versión con el que se construyó; caduca a los PRINCIPAL_CACHE_TTL segundos.
+    - Si PRINCIPAL_CACHE_SHARED está activo, el sello se compara contra el cache
+      compartido de Django para que una invalidación alcance a todos los workers.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # ─── Config ──────────
+    @property
+    def ttl(self) -> int:
+        return int(_conf("PRINCIPAL_CACHE_TTL", 60))
+
+    @property
+    def shared(self) -> bool:
+        return bool(_conf("PRINCIPAL_CACHE_SHARED", False))
+
+    @staticmethod
+    def _version_key(pk) -> str:
+        return f"cobrador:principal:v:{pk}"
+
+    def _version(self, pk) -> int:
+        if not self.shared:
+            return 0
+        return cache.get(self._version_key(pk), 0)
+
+    # ─── Lectura / escritura ─────
+    def get(self, sub: str):
+        """Devuelve (values, is_active) o None si no hay entrada vigente."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sub)
+
+        if entry is not None:
+            values, is_active, version, expires_at = entry
+            if expires_at > now and version == self._version(sub):
+                with self._lock:
+                    self.hits += 1
+                return values, is_active
+            with self._lock:
+                self._entries.pop(sub, None)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, sub: str, values: dict, is_active: bool):
+        if self.ttl <= 0:
+            return
+        entry = (values, is_active, self._version(sub), time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[sub] = entry
+
+    def invalidate(self, pk):
+        """Descarta la entrada local y, si aplica, sube el sello compartido."""
+        sub = str(pk)
+        with self._lock:
+            self._entries.pop(sub, None)
+            self.invalidations += 1
+
+        if self.shared:
+            key = self._version_key(sub)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ─── Métricas ────────
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "ttl": self.ttl,
+                "shared": self.shared,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidar_principal(pk):
+    principal_cache.invalidate(pk)
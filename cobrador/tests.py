@@ -1,3 +1,101 @@
+import jwt
 from django.test import TestCase
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
 
-# Create your tests here.
+from .auth import ClaimsPrincipal, JWTAuthentication, JWTClaimsAuthentication
+from .jwt_utils import create_access_token
+from .models import Cobrador
+from .principal_cache import principal_cache
+
+
+class AuthMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Cobra", apellidos="Dor", email="auth@test.mx",
+            usuario="auth", password="secreto123", role=Cobrador.ROLE_COBRADOR,
+        )
+
+    def setUp(self):
+        principal_cache.clear()
+        self.addCleanup(principal_cache.clear)
+        self.factory = APIRequestFactory()
+
+    def _token(self, **claims):
+        return create_access_token({"sub": self.cobrador.pk, **claims})
+
+    def _request(self, metodo="get", token=None):
+        token = token or self._token(usuario=self.cobrador.usuario, role=self.cobrador.role)
+        return getattr(self.factory, metodo)("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class JWTAuthenticationTests(AuthMixin, TestCase):
+    """Cobrador del token con cache de principals; tokens inválidos se rechazan."""
+
+    def _falla(self, mensaje, token):
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, mensaje):
+            JWTAuthentication().authenticate(self._request(token=token))
+
+    def test_acepta_y_reutiliza_el_principal(self):
+        user, _ = JWTAuthentication().authenticate(self._request())
+        self.assertIsInstance(user, Cobrador)
+        self.assertEqual(user.pk, self.cobrador.pk)
+
+        with self.assertNumQueries(0):
+            otro, _ = JWTAuthentication().authenticate(self._request())
+        self.assertIsNot(otro, user)  # instancia propia por request
+        self.assertGreaterEqual(principal_cache.stats()["hits"], 1)
+
+    def test_sin_cabecera_no_autentica(self):
+        self.assertIsNone(JWTAuthentication().authenticate(self.factory.get("/")))
+
+    def test_rechaza_tokens_invalidos(self):
+        self._falla("Token expirado.", create_access_token({"sub": self.cobrador.pk}, minutes=-1))
+        self._falla("Firma inválida", jwt.encode({"sub": str(self.cobrador.pk)}, "otra-clave", algorithm="HS256"))
+        self._falla("Token malformado.", "no-es-un-jwt")
+        self._falla("Token sin 'sub'.", create_access_token({"usuario": "auth"}))
+        self._falla("Cobrador no encontrado.", create_access_token({"sub": 999999}))
+
+    def test_rechaza_cuenta_desactivada(self):
+        self.cobrador.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cobrador.save()
+        self._falla("Cuenta desactivada.", self._token())
+
+
+class JWTClaimsAuthenticationTests(AuthMixin, TestCase):
+    """Lecturas con ClaimsPrincipal: rol y estado vigentes, no los del token."""
+
+    def test_lectura_sin_instanciar_cobrador(self):
+        user, _ = JWTClaimsAuthentication().authenticate(self._request())
+        self.assertIsInstance(user, ClaimsPrincipal)
+        self.assertEqual((user.pk, user.role), (self.cobrador.pk, Cobrador.ROLE_COBRADOR))
+
+        # Con la entrada en el cache ya no hay consulta
+        with self.assertNumQueries(0):
+            JWTClaimsAuthentication().authenticate(self._request())
+
+        # Escrituras resuelven el Cobrador completo
+        user, _ = JWTClaimsAuthentication().authenticate(self._request("post"))
+        self.assertIsInstance(user, Cobrador)
+
+    def test_baja_en_otro_worker_se_rechaza(self):
+        # UPDATE directo: como un cambio hecho por otro worker (sin invalidar este cache)
+        Cobrador.objects.filter(pk=self.cobrador.pk).update(is_active=False)
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, "Cuenta desactivada."):
+            JWTClaimsAuthentication().authenticate(self._request())
+
+    def test_cambio_de_rol_no_usa_el_claim(self):
+        Cobrador.objects.filter(pk=self.cobrador.pk).update(role=Cobrador.ROLE_SECRETARIO)
+        token = self._token(usuario="auth", role=Cobrador.ROLE_ADMIN)  # claim viejo o alterado
+        user, _ = JWTClaimsAuthentication().authenticate(self._request(token=token))
+        self.assertEqual(user.role, Cobrador.ROLE_SECRETARIO)
+
+    def test_cambio_guardado_invalida_la_entrada(self):
+        JWTClaimsAuthentication().authenticate(self._request())
+        self.cobrador.role = Cobrador.ROLE_SECRETARIO
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cobrador.save()
+        user, _ = JWTClaimsAuthentication().authenticate(self._request())
+        self.assertEqual(user.role, Cobrador.ROLE_SECRETARIO)
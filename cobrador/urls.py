@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import SignupView,LoginView, MeView,AdminCreateUserView, CobradorEstadoView
-from .views import CobradorListView
+from .views import CobradorListView, PrincipalCacheStatsView
 
 
 urlpatterns = [
@@ -16,4 +16,7 @@ urlpatterns = [
 
     path('auth/cobradores/<int:pk>/estado/', CobradorEstadoView.as_view(), name='cobrador-estado'),
 
+    #métricas del cache de principals (debug)
+    path('auth/principal-cache/', PrincipalCacheStatsView.as_view(), name='cobrador-principal-cache'),
+
 ] 
\ No newline at end of file
@@ -6,6 +6,7 @@ from .serializers import (
     LoginSerializer, SignupSerializer, AdminCreateUserSerializer, CobradorPublicSerializer)
 from .models import Cobrador
 from .jwt_utils import create_access_token
+from .principal_cache import principal_cache
 from .permissions import Roles
 from rest_framework.exceptions import NotFound
 
@@ -90,7 +91,7 @@ class CobradorEstadoView(APIView):
     Solo SUPERVISOR puede cambiar el estado.
     (Si quieres que admin también, cambia Roles("supervisor") por Roles("admin", "supervisor"))
     """
-    permission_classes = [IsAuthenticated, Roles("presidente, admin")]
+    permission_classes = [IsAuthenticated, Roles("presidente", "admin")]
     def patch(self, request, pk):
         try:
             cobrador = Cobrador.objects.get(pk=pk)
@@ -127,6 +128,17 @@ class CobradorEstadoView(APIView):
             status=status.HTTP_200_OK,
         )
 
+class PrincipalCacheStatsView(APIView):
+    """
+    GET /auth/principal-cache/
+    Hits / misses del cache de principals de JWTAuthentication.
+    Los contadores son por proceso (cada worker de gunicorn lleva los suyos).
+    """
+    permission_classes = [IsAuthenticated, Roles("admin")]
+
+    def get(self, request):
+        return Response(principal_cache.stats(), status=status.HTTP_200_OK)
+
 
 # ---- Ejemplos de vistas protegidas por rol ----
 """"class AdminDashboardView(APIView):
@@ -0,0 +1,138 @@
+# corte/almacenamiento.py
+"""
+Cliente S3 (DigitalOcean Spaces) compartido y caché de URLs firmadas para
+los PDFs de corte.
+
+Las vistas de PDF creaban un boto3.client() en cada llamada: cargar los
+modelos de botocore cuesta cientos de ms por petición. Aquí:
+
+- cliente(): un solo cliente por proceso, creado la primera vez que se usa
+  (los clientes de boto3 son thread-safe; la creación se protege con un
+  lock). Usa AWS_S3_ENDPOINT_URL, el mismo endpoint que django-storages
+  usa para subir los PDFs.
+- url_firmada(ruta): LRU por proceso {ruta: (url, vence)}. Firmar es local
+  (HMAC), pero las vistas de lote y los listados piden la misma ruta muchas
+  veces; la URL se reutiliza hasta URL_MARGEN segundos antes de vencer,
+  así el cliente siempre recibe al menos ese margen de validez.
+
+- post_firmado(ruta) / cabecera(ruta): subida directa del PDF firmado al
+  bucket (POST firmado con política de tamaño y tipo) y su verificación
+  con HEAD antes de asignarlo al corte, sin pasar el archivo por Django.
+
+Configuración en settings.SPACES_SETTINGS.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.signals import setting_changed
+
+UrlFirmada = namedtuple("UrlFirmada", ["url", "vence"])  # vence: epoch (segundos)
+
+_lock = threading.Lock()
+_cliente = None
+_urls = OrderedDict()
+
+
+def _conf(key, default):
+    return getattr(settings, "SPACES_SETTINGS", {}).get(key, default)
+
+
+def cliente():
+    global _cliente
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                # Sesión propia: la sesión por defecto de boto3 no es thread-safe
+                _cliente = boto3.session.Session().client(
+                    "s3",
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                    region_name=getattr(settings, "AWS_S3_REGION_NAME", None),
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    config=Config(signature_version="s3v4"),
+                )
+    return _cliente
+
+
+def url_firmada(ruta):
+    """UrlFirmada(url, vence) para GET del objeto `ruta`, reutilizada si sigue vigente."""
+    ahora = time.time()
+    with _lock:
+        firmada = _urls.get(ruta)
+        if firmada and firmada.vence - _conf("URL_MARGEN", 300) > ahora:
+            _urls.move_to_end(ruta)
+            return firmada
+
+    expiracion = _conf("URL_EXPIRACION", 3600)
+    url = cliente().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": ruta},
+        ExpiresIn=expiracion,
+    )
+    firmada = UrlFirmada(url, ahora + expiracion)
+    with _lock:
+        _urls[ruta] = firmada
+        _urls.move_to_end(ruta)
+        while len(_urls) > _conf("URL_CACHE_MAX", 2048):
+            _urls.popitem(last=False)
+    return firmada
+
+
+CONTENT_TYPE_PDF = "application/pdf"
+
+
+def tamano_max():
+    return _conf("PDF_TAMANO_MAX", 15 * 1024 * 1024)
+
+
+def post_firmado(ruta):
+    """
+    {"url", "fields", "expira_en"} para que el navegador suba `ruta` directo
+    al bucket con un POST multipart. La política limita tamaño y Content-Type.
+    """
+    campos = {"acl": settings.AWS_DEFAULT_ACL, "Content-Type": CONTENT_TYPE_PDF}
+    expiracion = _conf("SUBIDA_EXPIRACION", 900)
+    firmado = cliente().generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=ruta,
+        Fields=campos,
+        Conditions=[
+            {"acl": settings.AWS_DEFAULT_ACL},
+            {"Content-Type": CONTENT_TYPE_PDF},
+            ["content-length-range", 1, tamano_max()],
+        ],
+        ExpiresIn=expiracion,
+    )
+    return {**firmado, "expira_en": expiracion}
+
+
+def cabecera(ruta):
+    """HEAD del objeto: {"tamano", "content_type"} o None si no existe."""
+    try:
+        respuesta = cliente().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=ruta)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return {"tamano": respuesta["ContentLength"], "content_type": respuesta.get("ContentType")}
+
+
+def reiniciar():
+    """Descarta cliente y URLs (cambio de credenciales o de endpoint)."""
+    global _cliente
+    with _lock:
+        _cliente = None
+        _urls.clear()
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting.startswith("AWS_") or setting == "SPACES_SETTINGS":
+        reiniciar()
+
+
+setting_changed.connect(_on_setting_changed, dispatch_uid="corte-almacenamiento")
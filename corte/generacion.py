@@ -0,0 +1,102 @@
+# corte/generacion.py
+"""
+Generación de cortes (public.corte_caja_jr / public.corte_caja_sr) sin
+duplicados.
+
+Cada llamada a la función de Postgres inserta un folio nuevo y recorre todos
+los pagos del rango: un doble clic o un reintento del front dejaba dos cortes
+iguales y dos barridos completos.
+
+- clave(): identifica la petición (tipo, tesorero, fechas, cobrador/equipo).
+  Se guarda en el corte junto con los movimientos que devolvió la función.
+- Las peticiones con la misma clave se serializan con
+  pg_advisory_xact_lock(hashtext(clave)): la segunda espera a que la primera
+  confirme en lugar de correr la función en paralelo.
+- Ya con el lock, si hay un corte sin validar con esa clave generado hace
+  menos de CORTE_SETTINGS["REUTILIZAR_SEGUNDOS"], se devuelve ese folio con
+  sus movimientos guardados y la función no se vuelve a llamar.
+- Los movimientos solo sirven dentro de esa ventana: cada generación borra
+  los de los cortes que ya salieron de ella (y sin ventana no se guardan),
+  así el JSON no se queda en cada fila de la tabla.
+
+Los movimientos se guardan en la BD y no en la caché: sin CACHES
+compartido, cada worker tendría la suya y el reintento que cae en otro
+worker generaría otro folio.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CorteCajaJr, CorteCajaSr
+
+
+def _conf(key, default):
+    return getattr(settings, "CORTE_SETTINGS", {}).get(key, default)
+
+
+def clave(tipo, tesorero_id, fecha_inicio, fecha_fin, filtro_id=None):
+    """"jr:<tesorero>:<inicio>:<fin>:<cobrador>" / "sr:<tesorero>:<inicio>:<fin>:<equipo>"."""
+    return f"{tipo}:{tesorero_id}:{fecha_inicio.isoformat()}:{fecha_fin.isoformat()}:{filtro_id or ''}"
+
+
+def _bloquear(llave):
+    # Fuera de PostgreSQL no hay advisory locks (las escrituras ya van en serie)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [llave])
+
+
+def _ejecutar(funcion, params):
+    """Llama a public.<funcion>(...) y devuelve su JSON {corte_info, movimientos}."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT public.{funcion}(%s, %s, %s, %s)", params)
+        return cursor.fetchone()[0]
+
+
+def _generar(modelo, funcion, llave, params):
+    """(corte, movimientos, reutilizado)."""
+    with transaction.atomic():
+        _bloquear(llave)
+
+        ventana = _conf("REUTILIZAR_SEGUNDOS", 120)
+        limite = timezone.now() - timedelta(seconds=ventana)
+        modelo.objects.filter(movimientos__isnull=False, fecha_generacion__lt=limite).update(movimientos=None)
+        if ventana:
+            reciente = (
+                modelo.objects
+                .filter(
+                    clave_generacion=llave,
+                    validado=False,
+                    fecha_generacion__gte=limite,
+                )
+                .order_by("-fecha_generacion")
+                .first()
+            )
+            if reciente is not None:
+                return reciente, reciente.movimientos, True
+
+        resultado = _ejecutar(funcion, params)
+        movimientos = resultado["movimientos"]
+        folio = resultado["corte_info"]["folio_corte"]
+        modelo.objects.filter(folio_corte=folio).update(
+            clave_generacion=llave, movimientos=movimientos if ventana else None,
+        )
+        return modelo.objects.get(folio_corte=folio), movimientos, False
+
+
+def generar_jr(tesorero_id, fecha_inicio, fecha_fin, cobrador_id=None):
+    llave = clave("jr", tesorero_id, fecha_inicio, fecha_fin, cobrador_id)
+    return _generar(
+        CorteCajaJr, "corte_caja_jr", llave,
+        [fecha_inicio, fecha_fin, tesorero_id, cobrador_id],
+    )
+
+
+def generar_sr(tesorero_id, fecha_inicio, fecha_fin, equipo_id):
+    llave = clave("sr", tesorero_id, fecha_inicio, fecha_fin, equipo_id)
+    return _generar(
+        CorteCajaSr, "corte_caja_sr", llave,
+        [fecha_inicio, fecha_fin, tesorero_id, equipo_id],
+    )
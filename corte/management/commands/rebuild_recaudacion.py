@@ -0,0 +1,112 @@
+# Ubicación: corte/management/commands/rebuild_recaudacion.py
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from corte import recaudacion
+from pagos.models import Pago
+from pagos_cargos.models import PagoCargos
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye recaudacion_diaria desde pagos y pagos_cargos (backfill "
+        "inicial o después de importar). Con --verificar solo reporta las "
+        "diferencias; sale con error si encuentra alguna."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=date.fromisoformat,
+                            help="Primer día (YYYY-MM-DD); default: el pago más antiguo.")
+        parser.add_argument("--hasta", type=date.fromisoformat,
+                            help="Último día (YYYY-MM-DD); default: el pago más reciente.")
+        parser.add_argument("--cobrador", type=int, action="append", dest="cobradores",
+                            help="Limitar a un id_cobrador (se puede repetir).")
+        parser.add_argument("--dias", type=int, default=31,
+                            help="Días por transacción (default 31).")
+        parser.add_argument("--verificar", action="store_true",
+                            help="No escribe: compara la tabla contra los datos crudos.")
+        parser.add_argument("--corregir", action="store_true",
+                            help="Con --verificar, recalcula solo los días con diferencias.")
+        parser.add_argument("--mostrar", type=int, default=20,
+                            help="Máximo de diferencias a imprimir (default 20).")
+
+    def handle(self, *args, **opts):
+        if opts["corregir"] and not opts["verificar"]:
+            raise CommandError("--corregir solo aplica junto con --verificar.")
+        if opts["dias"] <= 0:
+            raise CommandError("--dias debe ser mayor que 0.")
+
+        inicio = time.monotonic()
+        if opts["verificar"]:
+            self._verificar(opts)
+        else:
+            filas = self._reconstruir(opts)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {filas} filas de recaudacion_diaria reconstruidas "
+                f"en {time.monotonic() - inicio:.1f}s"
+            ))
+
+    def _rangos(self, opts):
+        """(desde, hasta) de `--dias` días, en orden."""
+        desde, hasta = opts["desde"], opts["hasta"]
+        if desde is None or hasta is None:
+            extremos = [
+                qs.aggregate(primero=Min("fecha_pago"), ultimo=Max("fecha_pago"))
+                for qs in (Pago.objects.all(), PagoCargos.objects.all())
+            ]
+            primeros = [e["primero"] for e in extremos if e["primero"]]
+            ultimos = [e["ultimo"] for e in extremos if e["ultimo"]]
+            if not primeros:
+                return
+            desde = desde or min(primeros)
+            hasta = hasta or max(ultimos)
+        while desde <= hasta:
+            fin = min(desde + timedelta(days=opts["dias"] - 1), hasta)
+            yield desde, fin
+            desde = fin + timedelta(days=1)
+
+    def _reconstruir(self, opts):
+        filas = 0
+        for desde, hasta in self._rangos(opts):
+            with transaction.atomic():
+                filas += recaudacion.recalcular(desde, hasta, opts["cobradores"])
+            self.stdout.write(f"  hasta {hasta}: {filas} filas")
+        return filas
+
+    def _verificar(self, opts):
+        diferencias = []
+        for desde, hasta in self._rangos(opts):
+            diferencias += recaudacion.verificar(desde, hasta, opts["cobradores"])
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("✔ recaudacion_diaria coincide con los datos crudos"))
+            return
+
+        for d in diferencias[:opts["mostrar"]]:
+            (n_esperado, total_esperado), (n_tabla, total_tabla) = d["esperado"], d["tabla"]
+            self.stdout.write(
+                f"  {d['fecha']} cobrador {d['cobrador_id']} {d['tipo']}: "
+                f"esperado {n_esperado} pagos / {total_esperado}, "
+                f"tabla {n_tabla} pagos / {total_tabla}"
+            )
+        if len(diferencias) > opts["mostrar"]:
+            self.stdout.write(f"  … y {len(diferencias) - opts['mostrar']} más")
+
+        dias = sorted({(d["fecha"], d["cobrador_id"]) for d in diferencias})
+        if opts["corregir"]:
+            with transaction.atomic():
+                recaudacion.recalcular(dias=dias)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {len(diferencias)} diferencias corregidas en {len(dias)} días"
+            ))
+            return
+
+        raise CommandError(
+            f"{len(diferencias)} diferencias en {len(dias)} días; "
+            "corre rebuild_recaudacion --verificar --corregir o rebuild_recaudacion."
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corte', '0006_alter_cortecajajr_validado_por'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cortecajajr',
+            name='clave_generacion',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='cortecajajr',
+            name='movimientos',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cortecajasr',
+            name='clave_generacion',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='cortecajasr',
+            name='movimientos',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def llenar_recaudacion(apps, schema_editor):
+    # Mismo cálculo que `manage.py rebuild_recaudacion`: sin esto los totales
+    # de los días cerrados salen en cero hasta que alguien lo corra (la
+    # migración ya corre dentro de una transacción)
+    from corte import recaudacion
+
+    recaudacion.recalcular()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobrador', '0006_alter_cobrador_role'),
+        ('corte', '0007_generacion'),
+        ('pagos', '0005_clave_idempotencia'),
+        ('pagos_cargos', '0005_alter_pagocargos_fecha_pago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecaudacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('tarifa', 'Tarifa'), ('cargo', 'Cargo')], max_length=10)),
+                ('num_pagos', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cobrador', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recaudacion_diaria', to='cobrador.cobrador')),
+            ],
+            options={
+                'db_table': 'recaudacion_diaria',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'cobrador', 'tipo'), name='recaudacion_diaria_unica')],
+            },
+        ),
+        migrations.RunPython(llenar_recaudacion, migrations.RunPython.noop),
+    ]
@@ -83,6 +83,10 @@ class CorteCajaJr(models.Model):
         limit_choices_to={"role": Cobrador.ROLE_TESORERO_SR},
     )
 
+    # ─── Generación (ver corte/generacion.py) ─────────────────────────────────
+    clave_generacion = models.CharField(max_length=100, null=True, blank=True, editable=False, db_index=True)
+    movimientos      = models.JSONField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"Corte Jr #{self.folio_corte} — {self.cobrador} [{self.fecha_inicio} / {self.fecha_fin}]"
 
@@ -154,6 +158,9 @@ class CorteCajaSr(models.Model):
         limit_choices_to={"role": Cobrador.ROLE_TESORERO_SR},
     )
 
+    clave_generacion = models.CharField(max_length=100, null=True, blank=True, editable=False, db_index=True)
+    movimientos      = models.JSONField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"Corte Sr #{self.folio_corte} — {self.equipo} [{self.fecha_inicio} / {self.fecha_fin}]"
 
@@ -164,3 +171,39 @@ class CorteCajaSr(models.Model):
         verbose_name_plural = "Cortes de Caja Sr"
 
 
+
+
+#### Recaudación diaria (ver corte/recaudacion.py) ####
+class RecaudacionDiaria(models.Model):
+    """
+    Totales de cobranza por día x cobrador x tipo, mantenidos en la misma
+    transacción que cada pago para no volver a sumar pagos / pagos_cargos
+    renglón por renglón en cada corte.
+    - tarifa: pagos (monto_recibido) con esa fecha_pago.
+    - cargo:  pagos_cargos (monto_recibido) con esa fecha_pago.
+    """
+    TIPO_TARIFA = "tarifa"
+    TIPO_CARGO  = "cargo"
+    TIPO_CHOICES = [
+        (TIPO_TARIFA, "Tarifa"),
+        (TIPO_CARGO, "Cargo"),
+    ]
+
+    fecha    = models.DateField()
+    cobrador = models.ForeignKey(Cobrador, on_delete=models.PROTECT, related_name="recaudacion_diaria")
+    tipo     = models.CharField(max_length=10, choices=TIPO_CHOICES)
+
+    num_pagos      = models.PositiveIntegerField(default=0)
+    total          = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fecha} — {self.cobrador_id} [{self.tipo}] {self.total}"
+
+    class Meta:
+        db_table = "recaudacion_diaria"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fecha", "cobrador", "tipo"], name="recaudacion_diaria_unica"
+            ),
+        ]
@@ -0,0 +1,190 @@
+# corte/recaudacion.py
+"""
+Recaudación diaria pre-agregada (tabla recaudacion_diaria: día x cobrador x
+tipo, con número de pagos y total).
+
+Los cortes sumaban pagos y pagos_cargos renglón por renglón para cualquier
+rango de fechas: un corte mensual o anual recorría todos los pagos del
+periodo. Aquí:
+
+- registrar_pago() / registrar_pagos_cargo(): en la misma transacción que
+  el pago (PagoCreateSerializer.registrar, también en /pago/bulk/, y
+  PagarCargoView) suman a su fila con INSERT ... ON CONFLICT DO UPDATE
+  (incremento atómico: dos cobros simultáneos no se pisan).
+- recalcular(): reescribe el alcance desde los datos crudos. Lo usan las
+  ediciones y bajas de pagos y el importador.
+- totales(): los días cerrados (antes de hoy) salen de la tabla y solo el
+  día abierto (hoy en adelante) de pagos / pagos_cargos, así el costo crece
+  con los días del rango y no con los pagos.
+
+La migración 0008 llena la tabla al crearla; `manage.py rebuild_recaudacion`
+la reconstruye y con --verificar solo reporta diferencias.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, DateField, Q, Sum
+from django.utils import timezone
+
+from pagos.models import Pago
+from pagos_cargos.models import PagoCargos
+from .models import RecaudacionDiaria
+
+TARIFA = RecaudacionDiaria.TIPO_TARIFA
+CARGO  = RecaudacionDiaria.TIPO_CARGO
+CEROS  = (0, Decimal("0"))  # (num_pagos, total)
+
+
+def _fecha(valor):
+    # Misma conversión que al guardar un DateField (datetime aware -> fecha local)
+    return DateField().to_python(valor)
+
+
+def _fuentes():
+    return ((TARIFA, Pago.objects.all()), (CARGO, PagoCargos.objects.all()))
+
+
+def _alcance(qs, campo_fecha, desde=None, hasta=None, cobrador_ids=None, dias=None):
+    if desde is not None:
+        qs = qs.filter(**{f"{campo_fecha}__gte": desde})
+    if hasta is not None:
+        qs = qs.filter(**{f"{campo_fecha}__lte": hasta})
+    if cobrador_ids is not None:
+        qs = qs.filter(cobrador_id__in=cobrador_ids)
+    if dias is not None:
+        filtro = Q(pk__in=[])
+        for fecha, cobrador_id in dias:
+            filtro |= Q(**{campo_fecha: fecha, "cobrador_id": cobrador_id})
+        qs = qs.filter(filtro)
+    return qs
+
+
+def calcular(desde=None, hasta=None, cobrador_ids=None, dias=None):
+    """{(fecha, cobrador_id, tipo): (num_pagos, total)} desde los datos crudos; una consulta por tipo."""
+    totales = {}
+    for tipo, qs in _fuentes():
+        filas = (
+            _alcance(qs, "fecha_pago", desde, hasta, cobrador_ids, dias)
+            .order_by()
+            .values("fecha_pago", "cobrador_id")
+            .annotate(n=Count("pk"), total=Sum("monto_recibido"))
+        )
+        for f in filas:
+            totales[(f["fecha_pago"], f["cobrador_id"], tipo)] = (f["n"], Decimal(f["total"] or 0))
+    return totales
+
+
+def recalcular(desde=None, hasta=None, cobrador_ids=None, dias=None, lote=1000):
+    """
+    Reescribe las filas del alcance (rango de fechas, cobradores o pares
+    (fecha, cobrador); None = todo) desde los datos crudos. Debe llamarse
+    dentro de transaction.atomic(). Devuelve el número de filas escritas.
+    """
+    if dias is not None:
+        dias = {(_fecha(fecha), cobrador_id) for fecha, cobrador_id in dias}
+    totales = calcular(desde, hasta, cobrador_ids, dias)
+
+    # Los días que se quedaron sin pagos desaparecen
+    _alcance(RecaudacionDiaria.objects.all(), "fecha", desde, hasta, cobrador_ids, dias).delete()
+    RecaudacionDiaria.objects.bulk_create(
+        [
+            RecaudacionDiaria(fecha=fecha, cobrador_id=cobrador_id, tipo=tipo, num_pagos=n, total=total)
+            for (fecha, cobrador_id, tipo), (n, total) in totales.items()
+        ],
+        batch_size=lote,
+        update_conflicts=True,
+        unique_fields=["fecha", "cobrador", "tipo"],
+        update_fields=["num_pagos", "total", "actualizado_en"],
+    )
+    return len(totales)
+
+
+def verificar(desde=None, hasta=None, cobrador_ids=None):
+    """
+    Compara la tabla contra los datos crudos sin escribir. Devuelve una lista
+    de {"fecha", "cobrador_id", "tipo", "esperado", "tabla"} con (num_pagos, total).
+    """
+    esperado = calcular(desde, hasta, cobrador_ids)
+    actual = {
+        (f.fecha, f.cobrador_id, f.tipo): (f.num_pagos, f.total)
+        for f in _alcance(RecaudacionDiaria.objects.all(), "fecha", desde, hasta, cobrador_ids)
+    }
+    diferencias = []
+    for fecha, cobrador_id, tipo in sorted(esperado.keys() | actual.keys()):
+        clave = (fecha, cobrador_id, tipo)
+        if esperado.get(clave, CEROS) != actual.get(clave, CEROS):
+            diferencias.append({
+                "fecha": fecha, "cobrador_id": cobrador_id, "tipo": tipo,
+                "esperado": esperado.get(clave, CEROS), "tabla": actual.get(clave, CEROS),
+            })
+    return diferencias
+
+
+# ─── Incrementos en las escrituras ──────────────────────────────────────────
+
+def _sumar(fecha, cobrador_id, tipo, num_pagos, total):
+    q = connection.ops.quote_name
+    tabla = q(RecaudacionDiaria._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} (fecha, cobrador_id, tipo, num_pagos, total, actualizado_en) "
+            f"VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT (fecha, cobrador_id, tipo) DO UPDATE SET "
+            f"num_pagos = {tabla}.num_pagos + EXCLUDED.num_pagos, "
+            f"total = {tabla}.total + EXCLUDED.total, "
+            f"actualizado_en = EXCLUDED.actualizado_en",
+            [
+                connection.ops.adapt_datefield_value(_fecha(fecha)),
+                cobrador_id,
+                tipo,
+                num_pagos,
+                connection.ops.adapt_decimalfield_value(Decimal(total), 14, 2),
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+            ],
+        )
+
+
+def registrar_pago(pago):
+    """Después de crear el Pago de tarifa."""
+    _sumar(pago.fecha_pago, pago.cobrador_id, TARIFA, 1, pago.monto_recibido)
+
+
+def registrar_pagos_cargo(pagos):
+    """`pagos`: PagoCargos recién creados en una misma operación (mismo día y cobrador)."""
+    if pagos:
+        total = sum((p.monto_recibido for p in pagos), Decimal("0"))
+        _sumar(pagos[0].fecha_pago, pagos[0].cobrador_id, CARGO, len(pagos), total)
+
+
+# ─── Lectura ─────────────────────────────────────────────────────────────────
+
+def totales(desde, hasta, cobrador_ids=None, hoy=None):
+    """
+    {"tarifa": {"num_pagos", "total"}, "cargo": {...}, "gran_total"} de
+    [desde, hasta]. Días antes de `hoy` desde recaudacion_diaria; `hoy` en
+    adelante desde los pagos.
+    """
+    hoy = hoy or timezone.localdate()
+    suma = {TARIFA: list(CEROS), CARGO: list(CEROS)}
+
+    cerrado_hasta = min(hasta, hoy - timedelta(days=1))
+    if desde <= cerrado_hasta:
+        filas = (
+            _alcance(RecaudacionDiaria.objects.all(), "fecha", desde, cerrado_hasta, cobrador_ids)
+            .order_by()
+            .values("tipo")
+            .annotate(n=Sum("num_pagos"), total=Sum("total"))
+        )
+        for f in filas:
+            suma[f["tipo"]][0] += f["n"] or 0
+            suma[f["tipo"]][1] += f["total"] or Decimal("0")
+
+    if hasta >= hoy:
+        for (_, _, tipo), (n, total) in calcular(max(desde, hoy), hasta, cobrador_ids).items():
+            suma[tipo][0] += n
+            suma[tipo][1] += total
+
+    resultado = {tipo: {"num_pagos": n, "total": total} for tipo, (n, total) in suma.items()}
+    resultado["gran_total"] = suma[TARIFA][1] + suma[CARGO][1]
+    return resultado
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from botocore.stub import Stubber
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cobrador.jwt_utils import create_access_token
+from cobrador.models import Cobrador
+from cobrador.principal_cache import principal_cache
+
+from calles.models import Calle
+from equipos.models import Equipo
+
+from . import almacenamiento
+from .models import CorteCajaJr, CorteCajaSr, RecaudacionDiaria
+
+S3_PRUEBA = {
+    "AWS_ACCESS_KEY_ID": "clave",
+    "AWS_SECRET_ACCESS_KEY": "secreto",
+    "AWS_STORAGE_BUCKET_NAME": "sicap-pdfs",
+    "AWS_S3_ENDPOINT_URL": "https://sfo3.digitaloceanspaces.com",
+    "AWS_DEFAULT_ACL": "private",
+    "SPACES_SETTINGS": {
+        "URL_EXPIRACION": 3600, "URL_MARGEN": 300, "URL_CACHE_MAX": 2, "LOTE_MAX": 3,
+        "SUBIDA_EXPIRACION": 900, "PDF_TAMANO_MAX": 1024,
+    },
+}
+
+
+@override_settings(**S3_PRUEBA)
+class UrlFirmadaTests(TestCase):
+    """Cliente S3 único por proceso y URLs firmadas reutilizadas hasta cerca de vencer."""
+
+    def test_cliente_compartido_con_endpoint_configurado(self):
+        self.assertIs(almacenamiento.cliente(), almacenamiento.cliente())
+        url = almacenamiento.url_firmada("cortes_jr/2026/1/corte_jr_1.pdf").url
+        self.assertTrue(url.startswith("https://sfo3.digitaloceanspaces.com/sicap-pdfs/cortes_jr/"))
+
+    def test_reutiliza_hasta_el_margen_y_lru(self):
+        with mock.patch("corte.almacenamiento.time.time", return_value=1_000_000):
+            primera = almacenamiento.url_firmada("a.pdf")
+        self.assertEqual(primera.vence, 1_003_600)
+
+        with mock.patch("corte.almacenamiento.time.time", return_value=1_003_299):
+            self.assertIs(almacenamiento.url_firmada("a.pdf"), primera)
+            almacenamiento.url_firmada("b.pdf")
+        with mock.patch("corte.almacenamiento.time.time", return_value=1_003_300):
+            self.assertIsNot(almacenamiento.url_firmada("a.pdf"), primera)
+
+            # URL_CACHE_MAX = 2: "b.pdf" es la menos reciente y sale
+            almacenamiento.url_firmada("c.pdf")
+            self.assertEqual(list(almacenamiento._urls), ["a.pdf", "c.pdf"])
+
+
+@override_settings(**S3_PRUEBA)
+class CortePdfLoteTests(TestCase):
+    """GET /api/corte/jr/ver-pdfs/?folios=: varias URLs firmadas en una llamada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jr, cls.otro_jr = [
+            Cobrador.objects.create(
+                nombre="Tesorero", apellidos=f"Jr {n}", email=f"jr{n}@test.mx",
+                usuario=f"tesorero_jr{n}", password="secreto123", role=Cobrador.ROLE_TESORERO_JR,
+            )
+            for n in range(2)
+        ]
+        hoy = date(2026, 1, 15)
+        cls.cortes = [
+            CorteCajaJr.objects.create(
+                fecha_inicio=hoy, fecha_fin=hoy, cobrador=cobrador,
+                pdf=f"cortes_jr/2026/1/corte_jr_{n}.pdf" if con_pdf else None,
+            )
+            for n, (cobrador, con_pdf) in enumerate(
+                [(cls.jr, True), (cls.jr, True), (cls.jr, False), (cls.otro_jr, True)]
+            )
+        ]
+
+    def setUp(self):
+        # Los pks se reciclan entre pruebas: que otras no hereden el rol tesorero_jr
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.jr.pk})
+        )
+
+    def _ver(self, folios):
+        return self.client.get("/api/corte/jr/ver-pdfs/", {"folios": folios})
+
+    def test_firma_los_visibles_y_reporta_los_demas(self):
+        uno, dos, sin_pdf, ajeno = [c.folio_corte for c in self.cortes]
+        r = self._ver(f"{uno},{dos}")
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual([c["folio_corte"] for c in r.json()["resultados"]], [uno, dos])
+        self.assertIn("corte_jr_1.pdf", r.json()["resultados"][1]["pdf_url"])
+
+        r = self._ver(f"{sin_pdf},{ajeno},999999")
+        self.assertEqual(r.json()["resultados"], [])
+        self.assertEqual(
+            [e["detail"] for e in r.json()["errores"]],
+            ["Este corte no tiene PDF subido.", "No tienes permiso para ver este PDF.",
+             "Corte no encontrado."],
+        )
+
+    def test_valida_la_lista(self):
+        self.assertEqual(self._ver("").status_code, 400)
+        self.assertEqual(self._ver("1,x").status_code, 400)
+        self.assertEqual(self._ver("1,2,3,4").status_code, 400)  # LOTE_MAX = 3
+
+
+@override_settings(**S3_PRUEBA)
+class SubidaDirectaPdfTests(TestCase):
+    """POST firmado directo al bucket y confirmación con HEAD (S3 simulado con Stubber)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jr = Cobrador.objects.create(
+            nombre="Tesorero", apellidos="Jr", email="jr@test.mx",
+            usuario="tesorero_jr", password="secreto123", role=Cobrador.ROLE_TESORERO_JR,
+        )
+        hoy = date(2026, 1, 15)
+        cls.corte = CorteCajaJr.objects.create(fecha_inicio=hoy, fecha_fin=hoy, cobrador=cls.jr)
+        cls.validado = CorteCajaJr.objects.create(
+            fecha_inicio=hoy, fecha_fin=hoy, cobrador=cls.jr, validado=True,
+        )
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.jr.pk})
+        )
+        self.s3 = Stubber(almacenamiento.cliente())
+        self.s3.activate()
+        self.addCleanup(self.s3.deactivate)
+
+    def _url(self, corte, paso):
+        return f"/api/corte/jr/{corte.folio_corte}/pdf/{paso}/"
+
+    def _head(self, llave, **respuesta):
+        self.s3.add_response(
+            "head_object", respuesta,
+            {"Bucket": "sicap-pdfs", "Key": llave},
+        )
+
+    def test_firma_post_con_politica_de_tamano_y_tipo(self):
+        r = self.client.post(self._url(self.corte, "subida"))
+        self.assertEqual(r.status_code, 200, r.content)
+        datos = r.json()
+        self.assertEqual(
+            datos["key"],
+            f"cortes_jr/{self.corte.fecha_generacion.year}/{self.corte.fecha_generacion.month}"
+            f"/corte_jr_{self.corte.folio_corte}.pdf",
+        )
+        self.assertEqual(datos["url"], "https://sfo3.digitaloceanspaces.com/sicap-pdfs")
+        self.assertEqual(datos["fields"]["key"], datos["key"])
+        self.assertEqual(datos["fields"]["Content-Type"], "application/pdf")
+        self.assertEqual(datos["expira_en"], "15 minutos")
+
+        politica = json.loads(base64.b64decode(datos["fields"]["policy"]))
+        self.assertIn(["content-length-range", 1, 1024], politica["conditions"])
+        self.assertIn({"Content-Type": "application/pdf"}, politica["conditions"])
+
+        self.assertEqual(self.client.post(self._url(self.validado, "subida")).status_code, 400)
+
+    def test_confirmar_verifica_el_objeto_y_asigna_pdf(self):
+        llave = self.client.post(self._url(self.corte, "subida")).json()["key"]
+
+        self.s3.add_client_error("head_object", "404", http_status_code=404)
+        self._head(llave, ContentLength=2048, ContentType="application/pdf")
+        self._head(llave, ContentLength=10, ContentType="image/png")
+        self._head(llave, ContentLength=512, ContentType="application/pdf")
+
+        for detalle in ("súbelo primero", "tamaño", "no es un PDF"):
+            r = self.client.post(self._url(self.corte, "confirmar"))
+            self.assertEqual(r.status_code, 400)
+            self.assertIn(detalle, r.json()["detail"])
+        self.corte.refresh_from_db()
+        self.assertFalse(self.corte.pdf)
+
+        r = self.client.post(self._url(self.corte, "confirmar"))
+        self.assertEqual(r.status_code, 200, r.content)
+        self.corte.refresh_from_db()
+        self.assertEqual(self.corte.pdf.name, llave)
+        self.s3.assert_no_pending_responses()
+
+    def test_solo_el_dueno_del_corte(self):
+        otro = Cobrador.objects.create(
+            nombre="Otro", apellidos="Jr", email="otro-jr@test.mx",
+            usuario="otro_jr", password="secreto123", role=Cobrador.ROLE_TESORERO_JR,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": otro.pk}))
+        for paso in ("subida", "confirmar"):
+            r = self.client.post(self._url(self.corte, paso))
+            self.assertEqual(r.status_code, 403)
+            self.assertEqual(r.json()["detail"], "No puedes modificar un corte que no es tuyo.")
+
+
+class CorteListadoTests(TestCase):
+    """GET /api/corte/sr/: paginado, filtrable y con consultas constantes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sr, cls.jr = [
+            Cobrador.objects.create(
+                nombre="Tesorero", apellidos=usuario, email=f"{usuario}@test.mx",
+                usuario=usuario, password="secreto123", role=role,
+            )
+            for usuario, role in [
+                ("sr", Cobrador.ROLE_TESORERO_SR),
+                ("jr", Cobrador.ROLE_TESORERO_JR),
+            ]
+        ]
+        cls.equipo = Equipo.objects.create(
+            nombre_equipo="Norte", calle=Calle.objects.create(nombre_calle="Hidalgo"),
+            fecha_asignacion=date(2026, 1, 1),
+        )
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.sr.pk})
+        )
+
+    def _cortes(self, cantidad, dia=15, **extra):
+        for _ in range(cantidad):
+            CorteCajaSr.objects.create(
+                fecha_inicio=date(2026, 1, dia), fecha_fin=date(2026, 1, dia),
+                tesorero_sr=self.sr, tesorero_jr=self.jr, equipo=self.equipo,
+                validado=True, validado_por=self.sr, **extra,
+            )
+
+    def _consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            r = self.client.get("/api/corte/sr/")
+        self.assertEqual(r.status_code, 200, r.content)
+        return len(consultas), len(r.json()["results"])
+
+    def test_consultas_constantes_sin_importar_los_renglones(self):
+        self._cortes(1)
+        self._consultas()  # calienta el caché del principal JWT
+        pocas = self._consultas()
+        self._cortes(9)
+        muchas = self._consultas()
+        self.assertEqual((pocas[1], muchas[1]), (1, 10))
+        self.assertEqual(pocas[0], muchas[0])
+
+    def test_filtros_y_paginacion(self):
+        self._cortes(2, dia=10)
+        self._cortes(1, dia=20)
+        r = self.client.get("/api/corte/sr/", {"fecha_desde": "2026-01-15"})
+        self.assertEqual(len(r.json()["results"]), 1)
+        self.assertEqual(r.json()["results"][0]["equipo_nombre"], "Norte")
+        r = self.client.get("/api/corte/sr/", {"equipo": self.equipo.pk, "validado": "false"})
+        self.assertEqual(r.json()["results"], [])
+
+        with mock.patch("sicap_backend.pagination.KeysetPagination.page_size", 2), \
+                mock.patch("sicap_backend.pagination.estimar_conteo") as estimar:
+            r = self.client.get("/api/corte/sr/")
+            self.assertEqual(len(r.json()["results"]), 2)
+            self.assertEqual(r.json()["count"], 3)  # exacto: la tabla de cortes es chica
+            self.assertFalse(estimar.called)
+            r = self.client.get(r.json()["next"])
+        self.assertEqual(len(r.json()["results"]), 1)
+
+
+class GenerarCorteTests(TestCase):
+    """POST /api/corte/jr/generar/: peticiones idénticas reutilizan el folio reciente."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jr = Cobrador.objects.create(
+            nombre="Tesorero", apellidos="Jr", email="jr@test.mx",
+            usuario="tesorero_jr", password="secreto123", role=Cobrador.ROLE_TESORERO_JR,
+        )
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.jr.pk})
+        )
+        # public.corte_caja_jr solo existe en PostgreSQL: inserta el folio como ella
+        parche = mock.patch("corte.generacion._ejecutar", side_effect=self._corte_caja_jr)
+        self.ejecutar = parche.start()
+        self.addCleanup(parche.stop)
+
+    def _corte_caja_jr(self, funcion, params):
+        fecha_inicio, fecha_fin, tesorero_id, _ = params
+        corte = CorteCajaJr.objects.create(
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, cobrador_id=tesorero_id,
+        )
+        return {
+            "corte_info": {"folio_corte": corte.folio_corte},
+            "movimientos": [{"id_pago": 1, "monto": "150.00"}],
+        }
+
+    def _generar(self, **extra):
+        datos = {"fecha_inicio": "2026-01-01", "fecha_fin": "2026-01-31", **extra}
+        return self.client.post("/api/corte/jr/generar/", datos, format="json")
+
+    def test_reintento_reutiliza_el_folio(self):
+        primero = self._generar()
+        self.assertEqual(primero.status_code, 201, primero.content)
+        segundo = self._generar()
+        self.assertEqual(segundo.status_code, 200)
+        self.assertEqual(segundo.json()["corte"]["folio_corte"], primero.json()["corte"]["folio_corte"])
+        self.assertEqual(segundo.json()["movimientos"], [{"id_pago": 1, "monto": "150.00"}])
+        self.assertEqual(self.ejecutar.call_count, 1)
+
+        # Otro cobrador, o el corte ya validado: se genera uno nuevo
+        self.assertEqual(self._generar(cobrador_id="7").status_code, 201)
+        CorteCajaJr.objects.update(validado=True)
+        self.assertEqual(self._generar().status_code, 201)
+        self.assertEqual(self.ejecutar.call_count, 3)
+
+        self.assertEqual(self._generar(fecha_fin="31/01/2026").status_code, 400)
+
+    def test_movimientos_solo_dentro_de_la_ventana(self):
+        viejo = self._generar().json()["corte"]["folio_corte"]
+        CorteCajaJr.objects.filter(folio_corte=viejo).update(
+            fecha_generacion=timezone.now() - timedelta(minutes=10),
+        )
+        nuevo = self._generar().json()["corte"]["folio_corte"]
+        self.assertNotEqual(nuevo, viejo)
+        self.assertIsNone(CorteCajaJr.objects.get(folio_corte=viejo).movimientos)
+        self.assertIsNotNone(CorteCajaJr.objects.get(folio_corte=nuevo).movimientos)
+
+        # El listado no trae la columna
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get("/api/corte/jr/").status_code, 200)
+        self.assertNotIn("movimientos", " ".join(q["sql"] for q in consultas))
+
+    @override_settings(CORTE_SETTINGS={"REUTILIZAR_SEGUNDOS": 0})
+    def test_sin_ventana_siempre_genera(self):
+        self._generar()
+        self.assertEqual(self._generar().status_code, 201)
+        self.assertEqual(CorteCajaJr.objects.count(), 2)
+        self.assertFalse(CorteCajaJr.objects.filter(movimientos__isnull=False).exists())
+
+
+class RecaudacionViewTests(TestCase):
+    """GET /api/corte/recaudacion/: totales del rango desde recaudacion_diaria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.presidente = Cobrador.objects.create(
+            nombre="Pre", apellidos="Sidente", email="presidente@test.mx",
+            usuario="presidente", password="secreto123", role=Cobrador.ROLE_PRESIDENTE,
+        )
+        for dia, total in ((1, "100.00"), (2, "250.50")):
+            RecaudacionDiaria.objects.create(
+                fecha=date(2026, 1, dia), cobrador=cls.presidente,
+                tipo=RecaudacionDiaria.TIPO_TARIFA, num_pagos=2, total=Decimal(total),
+            )
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.presidente.pk})
+        )
+
+    def test_totales_del_rango(self):
+        r = self.client.get(
+            "/api/corte/recaudacion/", {"fecha_inicio": "2026-01-01", "fecha_fin": "2026-01-31"}
+        )
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(r.json()["num_pagos_normales"], 4)
+        self.assertEqual(Decimal(r.json()["gran_total"]), Decimal("350.50"))
+
+        r = self.client.get("/api/corte/recaudacion/", {"fecha_inicio": "2026-01-31", "fecha_fin": "2026-01-01"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_tesorero_jr_solo_ve_lo_suyo(self):
+        jr = Cobrador.objects.create(
+            nombre="Teso", apellidos="Jr", email="jr-recaudacion@test.mx",
+            usuario="jr-recaudacion", password="secreto123", role=Cobrador.ROLE_TESORERO_JR,
+        )
+        RecaudacionDiaria.objects.create(
+            fecha=date(2026, 1, 3), cobrador=jr,
+            tipo=RecaudacionDiaria.TIPO_TARIFA, num_pagos=1, total=Decimal("40.00"),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": jr.pk}))
+        rango = {"fecha_inicio": "2026-01-01", "fecha_fin": "2026-01-31"}
+        for extra in ({}, {"cobrador_id": self.presidente.pk}):
+            r = self.client.get("/api/corte/recaudacion/", {**rango, **extra})
+            self.assertEqual(r.status_code, 200, r.content)
+            self.assertEqual(r.json()["num_pagos_normales"], 1)
+            self.assertEqual(Decimal(r.json()["gran_total"]), Decimal("40.00"))
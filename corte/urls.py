@@ -19,10 +19,22 @@ from .views import (CorteView,
                     ##consultar pdf
                     CorteCajaJrPdfView,
                     CorteCajaSrPdfView,
+                    CorteCajaJrPdfLoteView,
+                    CorteCajaSrPdfLoteView,
+
+                    ##subida directa del pdf
+                    SubidaPdfCorteJrView,
+                    ConfirmarPdfCorteJrView,
+                    SubidaPdfCorteSrView,
+                    ConfirmarPdfCorteSrView,
+
+                    ##totales pre-agregados
+                    RecaudacionView,
 )
 urlpatterns = [
     # Esto crea la ruta: http://localhost:8000/api/corte/generar/
     path('generar/', CorteView.as_view(), name='generar-corte'),
+    path('recaudacion/', RecaudacionView.as_view(), name='corte-recaudacion'),
     # Rutas para Tesorero Jr
     path('jr/', CorteCajaJrListView.as_view(), name='corte-jr-list-create'),
     path('jr/generar/', CorteCajaJrGenerarView.as_view(), name='corte-jr-generar'),
@@ -40,4 +52,12 @@ urlpatterns = [
     ##ruta de consulta pdf 
     path("jr/<int:folio>/ver-pdf/",  CorteCajaJrPdfView.as_view(), name="corte-jr-ver-pdf"),
     path("sr/<int:folio>/ver-pdf/",  CorteCajaSrPdfView.as_view(), name="corte-sr-ver-pdf"),
+    path("jr/ver-pdfs/",             CorteCajaJrPdfLoteView.as_view(), name="corte-jr-ver-pdfs"),
+    path("sr/ver-pdfs/",             CorteCajaSrPdfLoteView.as_view(), name="corte-sr-ver-pdfs"),
+
+    ##subida directa al bucket (firmar + confirmar)
+    path("jr/<int:folio>/pdf/subida/",    SubidaPdfCorteJrView.as_view(),    name="corte-jr-pdf-subida"),
+    path("jr/<int:folio>/pdf/confirmar/", ConfirmarPdfCorteJrView.as_view(), name="corte-jr-pdf-confirmar"),
+    path("sr/<int:folio>/pdf/subida/",    SubidaPdfCorteSrView.as_view(),    name="corte-sr-pdf-subida"),
+    path("sr/<int:folio>/pdf/confirmar/", ConfirmarPdfCorteSrView.as_view(), name="corte-sr-pdf-confirmar"),
 ]
\ No newline at end of file
@@ -1,13 +1,17 @@
 import json
+import time
 from django.conf import settings
 from django.db import connection, DatabaseError
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import django_filters
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.views import APIView
 from rest_framework.response import Response      
 from rest_framework.permissions import IsAuthenticated 
-from rest_framework import status, permissions
+from rest_framework import generics, status, permissions
 
-from equipos.models import Equipo
+from equipos.models import Equipo, EquipoCobrador
 
 # Asegúrate de importar tu modelo correctamente
 from cobrador.models import Cobrador 
@@ -19,12 +23,15 @@ from .serializers import (CorteSerializer
 from .models import CorteCajaJr, CorteCajaSr
 from equipos.models import Equipo
 from cobrador.permissions import Roles
+from sicap_backend.pagination import KeysetPagination
+
 
 
+from . import generacion, recaudacion
 
 ### pdf consultar 
-import boto3
-from botocore.config import Config
+from . import almacenamiento
+from .almacenamiento import url_firmada
 
 """
 class CorteView(APIView):
@@ -190,11 +197,22 @@ class CorteView(APIView):
 
 
 ####-------Corte Jr -------####
+def _fechas(fecha_inicio, fecha_fin):
+    """(date, date) o None si alguna no es YYYY-MM-DD válida."""
+    try:
+        fechas = (parse_date(str(fecha_inicio)), parse_date(str(fecha_fin)))
+    except ValueError:
+        return None
+    return None if None in fechas else fechas
+
+
 class CorteCajaJrGenerarView(APIView):
     """
     POST /corte/jr/generar/
     Corre la función Postgres y devuelve el JSON al front.
     El front genera el PDF con esa información.
+    Una petición idéntica reciente devuelve el mismo folio sin volver a
+    correr la función (200 en lugar de 201; ver generacion.py).
     """
     permission_classes = [permissions.IsAuthenticated, Roles("tesorero_jr")]
 
@@ -209,20 +227,24 @@ class CorteCajaJrGenerarView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        fechas = _fechas(fecha_inicio, fecha_fin)
+        if fechas is None:
+            return Response(
+                {"detail": "fecha_inicio y fecha_fin deben tener formato YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT public.corte_caja_jr(%s, %s, %s, %s)",
-                    [fecha_inicio, fecha_fin, request.user.id_cobrador, cobrador_id],
-                )
-                resultado = cursor.fetchone()[0]
-
-            corte_info  = resultado["corte_info"]
-            movimientos = resultado["movimientos"]
-            folio_corte = corte_info["folio_corte"]
-
-            corte = CorteCajaJr.objects.get(folio_corte=folio_corte)
+            cobrador_id = int(cobrador_id) if cobrador_id not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "cobrador_id debe ser un entero."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        try:
+            corte, movimientos, reutilizado = generacion.generar_jr(
+                request.user.id_cobrador, *fechas, cobrador_id,
+            )
         except Exception as e:
             return Response(
                 {"detail": str(e)},
@@ -234,7 +256,7 @@ class CorteCajaJrGenerarView(APIView):
                 "corte":       CorteCajaJrSerializer(corte).data,
                 "movimientos": movimientos,
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_200_OK if reutilizado else status.HTTP_201_CREATED,
         )
 
 
@@ -310,24 +332,49 @@ class ValidarCorteJrView(APIView):
         return Response(CorteCajaJrSerializer(corte).data)
 
 
-class CorteCajaJrListView(APIView):
+class CortePeriodoFilter(django_filters.FilterSet):
+    """?fecha_desde= / ?fecha_hasta=: cortes cuyo periodo cae dentro del rango."""
+    fecha_desde = django_filters.DateFilter(field_name="fecha_inicio", lookup_expr="gte")
+    fecha_hasta = django_filters.DateFilter(field_name="fecha_fin", lookup_expr="lte")
+    validado    = django_filters.BooleanFilter()
+
+
+class CorteCajaJrFilter(CortePeriodoFilter):
+    # NumberFilter y no ModelChoiceFilter: no valida el id con otra consulta
+    tesorero = django_filters.NumberFilter(field_name="cobrador_id")
+    equipo   = django_filters.NumberFilter(field_name="cobrador__equipo_asignado__equipo_id")
+
+    class Meta:
+        model  = CorteCajaJr
+        fields = ["fecha_desde", "fecha_hasta", "validado", "tesorero", "equipo"]
+
+
+class CorteCajaJrListView(generics.ListAPIView):
     """
     GET /corte/jr/
     Tesorero Jr: solo sus cortes.
     Tesorero Sr / Admin / Presidente: todos.
+
+    Filtros: ?fecha_desde= ?fecha_hasta= ?validado= ?tesorero= ?equipo=
+    Paginado por cursor (KeysetPagination); los nombres salen del
+    select_related, sin una consulta por renglón.
     """
     permission_classes = [
         permissions.IsAuthenticated,
         Roles("tesorero_jr", "tesorero_sr", "admin", "presidente"),
     ]
+    serializer_class = CorteCajaJrSerializer
+    filter_backends  = [DjangoFilterBackend]
+    filterset_class  = CorteCajaJrFilter
+    ordering         = ["-fecha_generacion", "-folio_corte"]
+    pagination_class = KeysetPagination
+    conteo_paginacion = KeysetPagination.CONTEO_EXACTO  # pocos cortes: COUNT(*) barato
 
-    def get(self, request):
-        if request.user.role == "tesorero_jr":
-            qs = CorteCajaJr.objects.filter(cobrador=request.user)
-        else:
-            qs = CorteCajaJr.objects.all()
-
-        return Response(CorteCajaJrSerializer(qs, many=True).data)
+    def get_queryset(self):
+        qs = CorteCajaJr.objects.select_related("cobrador", "validado_por").defer("movimientos")
+        if self.request.user.role == "tesorero_jr":
+            qs = qs.filter(cobrador=self.request.user)
+        return qs
 
 
 class CorteCajaJrDetalleView(APIView):
@@ -359,6 +406,7 @@ class CorteCajaSrGenerarView(APIView):
     """
     POST /corte/sr/generar/
     El Tesorero Sr busca el equipo por nombre y genera el corte.
+    Peticiones idénticas recientes reutilizan el folio, como en /corte/jr/generar/.
     """
     permission_classes = [permissions.IsAuthenticated, Roles("tesorero_sr")]
 
@@ -385,20 +433,17 @@ class CorteCajaSrGenerarView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT public.corte_caja_sr(%s, %s, %s, %s)",
-                    [fecha_inicio, fecha_fin, request.user.id_cobrador, equipo.id_equipo],
-                )
-                resultado = cursor.fetchone()[0]
-
-            corte_info  = resultado["corte_info"]
-            movimientos = resultado["movimientos"]
-            folio_corte = corte_info["folio_corte"]
-
-            corte = CorteCajaSr.objects.get(folio_corte=folio_corte)
+        fechas = _fechas(fecha_inicio, fecha_fin)
+        if fechas is None:
+            return Response(
+                {"detail": "fecha_inicio y fecha_fin deben tener formato YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        try:
+            corte, movimientos, reutilizado = generacion.generar_sr(
+                request.user.id_cobrador, *fechas, equipo.id_equipo,
+            )
         except Exception as e:
             return Response(
                 {"detail": str(e)},
@@ -410,7 +455,7 @@ class CorteCajaSrGenerarView(APIView):
                 "corte":       CorteCajaSrSerializer(corte).data,
                 "movimientos": movimientos,
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_200_OK if reutilizado else status.HTTP_201_CREATED,
         )
 
 
@@ -494,13 +539,6 @@ class ValidarCorteSrView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        comprobante_url = ''
-        if corte.pdf:
-            try:
-                comprobante_url = generar_url_firmada(corte.pdf.name)
-            except Exception:
-                comprobante_url = ''
-
         Transaccion.objects.create(
             cuenta        = cuenta,
             tipo          = 'ingreso',
@@ -514,24 +552,45 @@ class ValidarCorteSrView(APIView):
         return Response(CorteCajaSrSerializer(corte).data)
 
 
-class CorteCajaSrListView(APIView):
+class CorteCajaSrFilter(CortePeriodoFilter):
+    tesorero    = django_filters.NumberFilter(field_name="tesorero_sr_id")
+    tesorero_jr = django_filters.NumberFilter(field_name="tesorero_jr_id")
+    equipo      = django_filters.NumberFilter(field_name="equipo_id")
+
+    class Meta:
+        model  = CorteCajaSr
+        fields = ["fecha_desde", "fecha_hasta", "validado", "tesorero", "tesorero_jr", "equipo"]
+
+
+class CorteCajaSrListView(generics.ListAPIView):
     """
     GET /corte/sr/
     Tesorero Sr: solo sus cortes.
     Admin / Presidente: todos.
+
+    Filtros: ?fecha_desde= ?fecha_hasta= ?validado= ?tesorero= ?tesorero_jr= ?equipo=
+    Paginado por cursor, como /corte/jr/.
     """
     permission_classes = [
         permissions.IsAuthenticated,
         Roles("tesorero_sr", "admin", "presidente"),
     ]
-
-    def get(self, request):
-        if request.user.role == "tesorero_sr":
-            qs = CorteCajaSr.objects.filter(tesorero_sr=request.user)
-        else:
-            qs = CorteCajaSr.objects.all()
-
-        return Response(CorteCajaSrSerializer(qs, many=True).data)
+    serializer_class = CorteCajaSrSerializer
+    filter_backends  = [DjangoFilterBackend]
+    filterset_class  = CorteCajaSrFilter
+    ordering         = ["-fecha_generacion", "-folio_corte"]
+    pagination_class = KeysetPagination
+    conteo_paginacion = KeysetPagination.CONTEO_EXACTO  # pocos cortes: COUNT(*) barato
+
+    def get_queryset(self):
+        qs = (
+            CorteCajaSr.objects
+            .select_related("tesorero_sr", "tesorero_jr", "equipo", "validado_por")
+            .defer("movimientos")
+        )
+        if self.request.user.role == "tesorero_sr":
+            qs = qs.filter(tesorero_sr=self.request.user)
+        return qs
 
 
 class CorteCajaSrDetalleView(APIView):
@@ -562,28 +621,14 @@ class CorteCajaSrDetalleView(APIView):
 
 
 #### cosultar pdf 
-def generar_url_firmada(ruta_pdf: str, expiracion: int = 3600) -> str:
-    """
-    Genera una URL temporal para ver el PDF.
-    expiracion: segundos que dura la URL (default 1 hora)
-    """
-    s3_client = boto3.client(
-        "s3",
-        endpoint_url       = "https://nyc3.digitaloceanspaces.com",
-        aws_access_key_id  = settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key = settings.AWS_SECRET_ACCESS_KEY,
-        config             = Config(signature_version="s3v4"),
-    )
-
-    url = s3_client.generate_presigned_url(
-        "get_object",
-        Params={
-            "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
-            "Key":    ruta_pdf,
-        },
-        ExpiresIn=expiracion,
-    )
-    return url
+def _respuesta_pdf(folio, corte):
+    firmada = url_firmada(corte.pdf.name)
+    minutos = max(0, int(firmada.vence - time.time())) // 60
+    return {
+        "folio_corte": folio,
+        "pdf_url":     firmada.url,
+        "expira_en":   f"{minutos} minutos",
+    }
 
 
 class CorteCajaJrPdfView(APIView):
@@ -615,13 +660,7 @@ class CorteCajaJrPdfView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        url = generar_url_firmada(corte.pdf.name)
-
-        return Response({
-            "folio_corte": folio,
-            "pdf_url":     url,
-            "expira_en":   "1 hora",
-        })
+        return Response(_respuesta_pdf(folio, corte))
 
 class CorteCajaSrPdfView(APIView):
     """
@@ -652,10 +691,263 @@ class CorteCajaSrPdfView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        url = generar_url_firmada(corte.pdf.name)
+        return Response(_respuesta_pdf(folio, corte))
+
+
+class CortePdfLoteMixin:
+    """
+    GET .../ver-pdfs/?folios=1,2,3
+    URLs firmadas de varios cortes en una llamada: una consulta para los
+    cortes y firmas desde el LRU de cada proceso (almacenamiento.url_firmada).
+    Los folios que no se pueden ver (no existen, sin PDF, sin permiso) van
+    en "errores" con el mismo detalle que la vista individual.
+    """
+    modelo = None
+
+    def puede_ver(self, request, corte):
+        return True
+
+    def get(self, request):
+        try:
+            folios = [int(f) for f in request.query_params.get("folios", "").split(",") if f.strip()]
+        except ValueError:
+            return Response(
+                {"detail": "folios debe ser una lista de números separados por coma."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        folios = list(dict.fromkeys(folios))
+        lote_max = getattr(settings, "SPACES_SETTINGS", {}).get("LOTE_MAX", 100)
+        if not folios or len(folios) > lote_max:
+            return Response(
+                {"detail": f"Indica entre 1 y {lote_max} folios."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cortes = self.modelo.objects.in_bulk(folios)
+        resultados, errores = [], []
+        for folio in folios:
+            corte = cortes.get(folio)
+            if corte is None:
+                errores.append({"folio_corte": folio, "detail": "Corte no encontrado."})
+            elif not self.puede_ver(request, corte):
+                errores.append({"folio_corte": folio, "detail": "No tienes permiso para ver este PDF."})
+            elif not corte.pdf:
+                errores.append({"folio_corte": folio, "detail": "Este corte no tiene PDF subido."})
+            else:
+                resultados.append(_respuesta_pdf(folio, corte))
+
+        return Response({"resultados": resultados, "errores": errores})
+
+
+class CorteCajaJrPdfLoteView(CortePdfLoteMixin, APIView):
+    """
+    GET /corte/jr/ver-pdfs/?folios=
+    Tesorero Jr solo ve sus propios cortes.
+    """
+    modelo = CorteCajaJr
+    permission_classes = [
+        permissions.IsAuthenticated,
+        Roles("tesorero_jr", "tesorero_sr", "admin", "presidente"),
+    ]
+
+    def puede_ver(self, request, corte):
+        return request.user.role != "tesorero_jr" or corte.cobrador_id == request.user.pk
+
+
+class CorteCajaSrPdfLoteView(CortePdfLoteMixin, APIView):
+    """
+    GET /corte/sr/ver-pdfs/?folios=
+    Tesorero Sr: solo sus propios cortes. Admin / Presidente: cualquiera.
+    """
+    modelo = CorteCajaSr
+    permission_classes = [
+        permissions.IsAuthenticated,
+        Roles("tesorero_sr", "admin", "presidente"),
+    ]
 
+    def puede_ver(self, request, corte):
+        return request.user.role != "tesorero_sr" or corte.tesorero_sr_id == request.user.pk
+
+
+#### subida directa del pdf firmado
+class SubidaDirectaMixin:
+    """
+    Subida del PDF firmado directo al bucket, en dos pasos, sin que el
+    archivo pase por un worker de Django:
+
+    POST .../<folio>/pdf/subida/     URL y campos de un POST firmado para la
+                                     llave de upload_corte_*_pdf.
+    POST .../<folio>/pdf/confirmar/  HEAD del objeto (existe, application/pdf,
+                                     tamaño permitido) y asigna `pdf`.
+
+    La llave sale del modelo, no del cliente: solo se puede confirmar el
+    PDF de ese corte. PATCH .../pdf/ sigue disponible.
+
+    `campo_dueno` es el campo del corte con el id del único usuario que
+    puede subir su PDF.
+    """
+    modelo = None
+    serializer_salida = None
+    campo_dueno = None
+
+    def es_dueno(self, request, corte):
+        return getattr(corte, self.campo_dueno) == request.user.pk
+
+    def _corte(self, request, folio):
+        """(corte, None) o (None, Response de error) con las reglas de SubirPdf*View."""
+        try:
+            corte = self.modelo.objects.get(folio_corte=folio)
+        except self.modelo.DoesNotExist:
+            return None, Response({"detail": "Corte no encontrado."}, status=404)
+
+        if not self.es_dueno(request, corte):
+            return None, Response(
+                {"detail": "No puedes modificar un corte que no es tuyo."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if corte.validado:
+            return None, Response(
+                {"detail": "No puedes modificar un corte ya validado."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return corte, None
+
+    @staticmethod
+    def _llave(corte):
+        return corte._meta.get_field("pdf").generate_filename(corte, "corte.pdf")
+
+
+class SubidaPdfMixin(SubidaDirectaMixin):
+
+    def post(self, request, folio):
+        corte, error = self._corte(request, folio)
+        if error:
+            return error
+
+        llave = self._llave(corte)
+        firmado = almacenamiento.post_firmado(llave)
         return Response({
             "folio_corte": folio,
-            "pdf_url":     url,
-            "expira_en":   "1 hora",
-        })
\ No newline at end of file
+            "key":         llave,
+            "url":         firmado["url"],
+            "fields":      firmado["fields"],
+            "tamano_max":  almacenamiento.tamano_max(),
+            "expira_en":   f"{firmado['expira_en'] // 60} minutos",
+        })
+
+
+class ConfirmarPdfMixin(SubidaDirectaMixin):
+
+    def post(self, request, folio):
+        corte, error = self._corte(request, folio)
+        if error:
+            return error
+
+        llave = self._llave(corte)
+        objeto = almacenamiento.cabecera(llave)
+        if objeto is None:
+            return Response(
+                {"detail": "No se encontró el PDF en el almacenamiento; súbelo primero."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if objeto["content_type"] != almacenamiento.CONTENT_TYPE_PDF:
+            return Response(
+                {"detail": "El archivo subido no es un PDF."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not 0 < objeto["tamano"] <= almacenamiento.tamano_max():
+            return Response(
+                {"detail": "El PDF está vacío o excede el tamaño permitido."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        corte.pdf.name = llave
+        corte.save(update_fields=["pdf"])
+        return Response(self.serializer_salida(corte).data)
+
+
+class _CorteJrPdfDirecto:
+    modelo = CorteCajaJr
+    serializer_salida = CorteCajaJrSerializer
+    permission_classes = [permissions.IsAuthenticated, Roles("tesorero_jr")]
+    campo_dueno = "cobrador_id"
+
+
+class _CorteSrPdfDirecto:
+    modelo = CorteCajaSr
+    serializer_salida = CorteCajaSrSerializer
+    permission_classes = [permissions.IsAuthenticated, Roles("tesorero_sr")]
+    campo_dueno = "tesorero_sr_id"
+
+
+class SubidaPdfCorteJrView(_CorteJrPdfDirecto, SubidaPdfMixin, APIView):
+    """POST /corte/jr/<folio>/pdf/subida/"""
+
+
+class ConfirmarPdfCorteJrView(_CorteJrPdfDirecto, ConfirmarPdfMixin, APIView):
+    """POST /corte/jr/<folio>/pdf/confirmar/"""
+
+
+class SubidaPdfCorteSrView(_CorteSrPdfDirecto, SubidaPdfMixin, APIView):
+    """POST /corte/sr/<folio>/pdf/subida/"""
+
+
+class ConfirmarPdfCorteSrView(_CorteSrPdfDirecto, ConfirmarPdfMixin, APIView):
+    """POST /corte/sr/<folio>/pdf/confirmar/"""
+
+
+#### recaudación pre-agregada
+class RecaudacionView(APIView):
+    """
+    GET /corte/recaudacion/?fecha_inicio=&fecha_fin=[&cobrador_id=|&equipo=]
+    Totales de tarifa y cargos del rango desde recaudacion_diaria: días
+    cerrados desde la tabla, solo hoy desde los pagos (ver recaudacion.py).
+    Con ?equipo= suma a los miembros activos del equipo. Un tesorero_jr solo
+    ve lo suyo, como en el listado de cortes Jr.
+    """
+    permission_classes = [
+        permissions.IsAuthenticated,
+        Roles("tesorero_jr", "tesorero_sr", "admin", "presidente"),
+    ]
+
+    def get(self, request):
+        fechas = _fechas(request.query_params.get("fecha_inicio"), request.query_params.get("fecha_fin"))
+        if fechas is None or fechas[0] > fechas[1]:
+            return Response(
+                {"detail": "fecha_inicio y fecha_fin (YYYY-MM-DD, inicio <= fin) son requeridos."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            cobrador_id = request.query_params.get("cobrador_id")
+            equipo_id = request.query_params.get("equipo")
+            cobrador_id = int(cobrador_id) if cobrador_id else None
+            equipo_id = int(equipo_id) if equipo_id else None
+        except ValueError:
+            return Response(
+                {"detail": "cobrador_id y equipo deben ser enteros."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cobrador_ids = None
+        if request.user.role == "tesorero_jr":
+            cobrador_ids = [request.user.pk]
+        elif cobrador_id is not None:
+            cobrador_ids = [cobrador_id]
+        elif equipo_id is not None:
+            cobrador_ids = list(
+                EquipoCobrador.objects.filter(equipo_id=equipo_id, activo=True)
+                .values_list("cobrador_id", flat=True)
+            )
+
+        totales = recaudacion.totales(*fechas, cobrador_ids)
+        return Response({
+            "fecha_inicio":         fechas[0],
+            "fecha_fin":            fechas[1],
+            "total_pagos_normales": totales["tarifa"]["total"],
+            "num_pagos_normales":   totales["tarifa"]["num_pagos"],
+            "total_pagos_cargos":   totales["cargo"]["total"],
+            "num_pagos_cargos":     totales["cargo"]["num_pagos"],
+            "gran_total":           totales["gran_total"],
+        })
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CuentahabientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cuentahabientes'
+
+    def ready(self):
+        from . import autocompletar, contratos, materialized
+        materialized.conectar_signals()
+        autocompletar.conectar_signals()
+        contratos.conectar_signals()
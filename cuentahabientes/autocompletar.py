@@ -0,0 +1,125 @@
+# cuentahabientes/autocompletar.py
+"""
+Autocompletado de ventanilla: GET /cuentahabientes/autocomplete/?q=
+
+Cada tecla del cajero es una petición, así que la respuesta no pasa por el
+listado (paginación, conteo, serializer completo):
+
+- Solo dígitos: prefijo de numero_contrato, resuelto como rangos sobre el
+  índice único ("20" → [20, 21) ∪ [200, 210) ∪ [2000, 2100) ...).
+- Texto: prefijo del nombre normalizado (minúsculas, sin acentos) sobre
+  "nombres ap am" o "ap am nombres", con índices text_pattern_ops
+  (migración 0022). Fuera de PostgreSQL cae a istartswith por columna.
+- Un SELECT con LIMIT y .values_list(); el resultado se guarda en caché
+  por prefijo normalizado durante AUTOCOMPLETE_SETTINGS["TTL"] segundos.
+  Altas, bajas y cambios de nombre/calle invalidan con un sello de versión
+  (los pagos, que solo tocan saldo/deuda, no).
+"""
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+
+from .busqueda import MAX_DIGITOS_CONTRATO, NombreBusqueda, rangos_contrato
+from .models import Cuentahabiente
+
+_VERSION_KEY = "autocomplete:version"
+CAMPOS_NOMBRE = {"nombres", "ap", "am", "calle", "calle_fk", "numero_contrato"}
+
+
+def _conf(key, default):
+    return getattr(settings, "AUTOCOMPLETE_SETTINGS", {}).get(key, default)
+
+
+def limite_max():
+    return _conf("LIMITE_MAX", 25)
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con espacios colapsados (como sicap_busqueda)."""
+    sin_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+    return " ".join(sin_acentos.lower().split())
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, 1, None)
+        version = cache.get(_VERSION_KEY, 1)
+    return version
+
+
+def invalidar():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.add(_VERSION_KEY, 1, None)
+
+
+def _filtro_nombre(queryset, termino):
+    if connections[queryset.db].vendor == "postgresql":
+        return queryset.alias(
+            _nombre=NombreBusqueda("nombres", "ap", "am"),
+            _apellidos=NombreBusqueda("ap", "am", "nombres"),
+        ).filter(Q(_nombre__startswith=termino) | Q(_apellidos__startswith=termino))
+    palabra = termino.split()[0]
+    return queryset.filter(
+        Q(nombres__istartswith=palabra) | Q(ap__istartswith=palabra) | Q(am__istartswith=palabra)
+    )
+
+
+def calcular(termino, limite):
+    queryset = Cuentahabiente.objects.all()
+    if termino.isdigit():
+        if len(termino) > MAX_DIGITOS_CONTRATO:
+            return []
+        queryset = queryset.filter(rangos_contrato(termino)).order_by("numero_contrato")
+    else:
+        queryset = _filtro_nombre(queryset, termino).order_by("ap", "am", "nombres", "pk")
+
+    filas = queryset.values_list(
+        "id_cuentahabiente", "numero_contrato", "nombres", "ap", "am",
+        Coalesce("calle", "calle_fk__nombre_calle"),
+    )[:limite]
+    return [
+        {
+            "id": pk,
+            "numero_contrato": contrato,
+            "nombre": f"{nombres} {ap} {am}",
+            "calle": calle,
+        }
+        for pk, contrato, nombres, ap, am, calle in filas
+    ]
+
+
+def autocompletar(q, limite=None):
+    """Lista de {id, numero_contrato, nombre, calle}; [] si el término es muy corto."""
+    termino = normalizar(q or "")
+    limite = max(1, min(limite or _conf("LIMITE", 10), limite_max()))
+    if not termino or (not termino.isdigit() and len(termino) < _conf("MIN_CARACTERES", 2)):
+        return []
+
+    clave = f"autocomplete:{_version()}:{limite}:{termino}"
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular(termino, limite)
+        cache.set(clave, resultado, _conf("TTL", 30))
+    return resultado
+
+
+def on_cuentahabiente_cambio(sender, update_fields=None, **kwargs):
+    # Los pagos y el cierre solo guardan saldo_pendiente / deuda
+    if update_fields and not CAMPOS_NOMBRE & set(update_fields):
+        return
+    transaction.on_commit(invalidar)
+
+
+def conectar_signals():
+    post_save.connect(on_cuentahabiente_cambio, sender=Cuentahabiente, dispatch_uid="autocomplete-save")
+    post_delete.connect(on_cuentahabiente_cambio, sender=Cuentahabiente, dispatch_uid="autocomplete-delete")
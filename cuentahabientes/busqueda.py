@@ -0,0 +1,137 @@
+# cuentahabientes/busqueda.py
+"""
+Búsqueda de cuentahabientes con pg_trgm + unaccent (ventanilla).
+
+SearchFilter compila a ORs de ILIKE '%x%', que no usan índices y recorren
+el padrón completo con su JOIN a colonia. En PostgreSQL este backend:
+
+1. Si el término es un número y existe ese numero_contrato, devuelve solo
+   esa cuenta (búsqueda por índice único, sin ranking). Si no existe, los
+   contratos que empiezan con ese número (rangos_contrato(), por rangos del
+   entero) siguen entrando y van primero.
+2. Si no, filtra con el operador de similitud por palabra de pg_trgm
+   (`término <% campo`) sobre expresiones normalizadas con
+   sicap_busqueda() (minúsculas y sin acentos), que tienen índice GIN
+   (migración 0021 y vistas materializadas), y ordena por similitud.
+   Los campos de `busqueda_contiene` (teléfono) se comparan con LIKE, que
+   el mismo índice trigram acelera.
+
+Fuera de PostgreSQL, o con términos de menos de MIN_TRIGRAM caracteres,
+se comporta como SearchFilter normal (search_fields del viewset), con los
+prefijos de contrato primero si el término es un número.
+
+El resultado queda ordenado por `similitud` (desc) y pk: OrdenBusquedaFilter
+no lo pisa y KeysetPagination pagina esas búsquedas por OFFSET, porque la
+similitud no sirve de llave de cursor.
+
+Atributos del viewset:
+    busqueda_contrato = "numero_contrato"
+    busqueda_trigram  = [NombreBusqueda("nombres", "ap", "am"), Busqueda("colonia__nombre_colonia")]
+    busqueda_contiene = ["telefono"]
+"""
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, Q, TextField, Value, When
+from django.db.models.functions import Greatest
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+MIN_TRIGRAM = 3
+MAX_DIGITOS_CONTRATO = 9  # IntegerField
+
+class Busqueda(Func):
+    """
+    sicap_busqueda(campo): minúsculas y sin acentos. Es una función SQL
+    IMMUTABLE (migración 0021) porque unaccent() solo es STABLE y no se
+    puede indexar directo.
+    """
+    function = "sicap_busqueda"
+    arity = 1
+    output_field = TextField()
+
+
+class NombreBusqueda(Func):
+    """sicap_nombre_busqueda(nombres, ap, am): nombre completo normalizado."""
+    function = "sicap_nombre_busqueda"
+    arity = 3
+    output_field = TextField()
+
+
+def rangos_contrato(prefijo, campo="numero_contrato"):
+    """
+    Q con los rangos del contrato (entero) que empiezan con `prefijo`: uno
+    por cada número de dígitos, así usa el índice en lugar de convertir la
+    columna a texto como __startswith.
+    """
+    base = int(prefijo)
+    rangos = Q(**{campo: base})
+    for ceros in range(1, MAX_DIGITOS_CONTRATO - len(prefijo) + 1):
+        escala = 10 ** ceros
+        rangos |= Q(**{f"{campo}__gte": base * escala, f"{campo}__lt": (base + 1) * escala})
+    return rangos
+
+
+def _es_postgres(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+class BusquedaTrigramFilter(filters.SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        termino = " ".join(self.get_search_terms(request))
+        if not termino:
+            return queryset
+
+        prefijo = None
+        campo_contrato = getattr(view, "busqueda_contrato", None)
+        if campo_contrato and termino.isdigit() and len(termino) <= MAX_DIGITOS_CONTRATO:
+            exacto = queryset.filter(**{campo_contrato: int(termino)})
+            if exacto.exists():
+                return exacto
+            prefijo = rangos_contrato(termino, campo_contrato)
+
+        expresiones = getattr(view, "busqueda_trigram", None)
+        if not expresiones or len(termino) < MIN_TRIGRAM or not _es_postgres(queryset):
+            queryset = super().filter_queryset(request, queryset, view)
+            if prefijo is None:
+                return queryset
+            return _ordenar(queryset, _prefijo_primero(prefijo))
+
+        buscado = Busqueda(Value(termino))
+        condiciones = [TrigramWordSimilar(expr, buscado) for expr in expresiones]
+        condiciones += [
+            Q(**{f"{campo}__contains": termino})
+            for campo in getattr(view, "busqueda_contiene", [])
+        ]
+        similitudes = [TrigramWordSimilarity(buscado, expr) for expr in expresiones]
+        if prefijo is not None:
+            condiciones.append(prefijo)
+            similitudes.append(_prefijo_primero(prefijo))
+        similitud = similitudes[0] if len(similitudes) == 1 else Greatest(*similitudes)
+
+        return _ordenar(queryset.filter(reduce(or_, [Q(c) for c in condiciones])), similitud)
+
+
+def _prefijo_primero(prefijo):
+    # 1.0 = similitud máxima: los contratos que empiezan con el número van primero
+    return Case(When(prefijo, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+
+def _ordenar(queryset, similitud):
+    return queryset.annotate(similitud=similitud).order_by(F("similitud").desc(), "pk")
+
+
+class OrdenBusquedaFilter(filters.OrderingFilter):
+    """
+    OrderingFilter que no pisa el orden por similitud: con ?search= y sin
+    ?ordering= deja el queryset como lo dejó BusquedaTrigramFilter.
+    """
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get(api_settings.SEARCH_PARAM):
+            return None
+        return super().get_default_ordering(view)
@@ -0,0 +1,472 @@
+# cuentahabientes/cierre.py
+"""
+Ejecución del cierre anual.
+
+Dos implementaciones con el mismo resultado:
+- "python": carga cuentas y pagos del nuevo año, calcula en un ciclo y
+  guarda con bulk_create / bulk_update.
+- "sql": todo dentro de PostgreSQL con un INSERT ... SELECT (cargos
+  CIERRE_ANUAL) y un UPDATE ... FROM (saldo_pendiente / deuda). Los
+  bloqueos de fila duran lo que tardan dos sentencias.
+
+Ambas deben llamarse dentro de transaction.atomic().
+
+Modo "lotes": el mismo cálculo que "python" pero por rangos de
+id_cuentahabiente, un lote por transacción, hasta el último id que existía
+al iniciar (CierreAnual.tope_id): las cuentas dadas de alta a medio cierre
+ya nacen con el saldo del año nuevo y no se vuelven a cerrar. El checkpoint
+(CierreAnual.ultimo_id_procesado) se guarda en la misma transacción que
+los cargos del lote: si el proceso muere, el lote a medias se revierte
+completo y al reanudar se continúa desde el último lote confirmado, sin
+duplicar cargos CIERRE_ANUAL. Los lotes no corren en el worker web: la
+API deja el cierre "en_proceso" y `manage.py procesar_cierres_anuales`
+(cron) lo avanza bajo un advisory lock.
+
+Los tres modos recalculan cuentahabiente_saldo del año nuevo en la misma
+transacción (ver saldos.py).
+
+El resumen previo (resumen_cierre) es una sola consulta agregada. En
+PostgreSQL se guarda en caché con el valor de vista_materializada_cambio_seq
+en la clave, así refleja los pagos de cualquier worker (ver abajo).
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Exists, Max, OuterRef, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from cargos.models import Cargo
+from descuento.models import Descuento
+from pagos.models import Pago
+from servicio.models import Servicio
+from . import materialized, saldos
+from .models import CierreAnual, Cuentahabiente
+
+logger = logging.getLogger(__name__)
+
+MODO_PYTHON = "python"
+MODO_SQL = "sql"
+MODO_LOTES = "lotes"
+MODOS_CIERRE = [MODO_PYTHON, MODO_SQL, MODO_LOTES]
+
+
+def _conf(key, default):
+    return getattr(settings, "CIERRE_SETTINGS", {}).get(key, default)
+
+
+def decimal_seguro(valor):
+    try:
+        if valor in (None, "", " ", "NULL"):
+            return Decimal("0")
+        return Decimal(str(valor))
+    except (InvalidOperation, ValueError):
+        return Decimal("0")
+
+
+def obtener_tarifa_cuentahabiente(cuentahabiente):
+    if not cuentahabiente.servicio:
+        return Decimal("0")
+    return decimal_seguro(cuentahabiente.servicio.costo)
+
+
+def estado_deuda_cierre(nuevo_saldo, pagos_anticipados, tarifa_real):
+    if nuevo_saldo <= Decimal("0"):
+        return "pagado"
+    if pagos_anticipados > Decimal("0") and nuevo_saldo < tarifa_real:
+        return "corriente"
+    return "adeudo"
+
+
+# ─── Implementación en Python ────────────────────────────────────────────────
+
+def _cerrar_cuentas(cuentahabientes, pagos_nuevo_anio, anio_nuevo, tipo_cierre):
+    """
+    Cargos de cierre + nuevo saldo para las cuentas recibidas (ya bloqueadas).
+    pagos_nuevo_anio: pagos de anio_nuevo de esas cuentas, más reciente primero.
+    """
+    # Sumar monto_recibido por cuentahabiente
+    # (monto_recibido ya viene con el descuento aplicado)
+    pagos_por_cuenta = {}
+    for p in pagos_nuevo_anio:
+        cid = p.cuentahabiente_id
+        pagos_por_cuenta[cid] = (
+            pagos_por_cuenta.get(cid, Decimal("0")) +
+            decimal_seguro(p.monto_recibido)
+        )
+
+    # Descuento del pago más reciente con descuento activo
+    descuento_por_cuenta = {}
+    for p in pagos_nuevo_anio:
+        cid = p.cuentahabiente_id
+        if cid not in descuento_por_cuenta:
+            if p.descuento_id and p.descuento and p.descuento.activo:
+                descuento_por_cuenta[cid] = decimal_seguro(p.descuento.porcentaje)
+
+    # ── Procesar cada cuentahabiente ─────────────────────────────────────
+    cargos_a_crear       = []
+    cuentas_a_actualizar = []
+    fecha_cargo = date(anio_nuevo, 1, 1)
+
+    for c in cuentahabientes:
+        saldo_anterior = decimal_seguro(c.saldo_pendiente)
+        tarifa_base    = obtener_tarifa_cuentahabiente(c)
+
+        # Tarifa real = base - descuento fijo (si tiene)
+        descuento_fijo = descuento_por_cuenta.get(c.id_cuentahabiente, Decimal("0"))
+        tarifa_real    = tarifa_base - descuento_fijo
+
+        # Cargo de cierre: deuda del año que cierra
+        if saldo_anterior > Decimal("0"):
+            cargos_a_crear.append(
+                Cargo(
+                    cuentahabiente=c,
+                    tipo_cargo=tipo_cierre,
+                    saldo_restante_cargo=saldo_anterior,
+                    fecha_cargo=fecha_cargo,
+                    activo=True
+                )
+            )
+
+        # Nuevo saldo = tarifa real - pagos anticipados
+        pagos_anticipados = pagos_por_cuenta.get(c.id_cuentahabiente, Decimal("0"))
+        nuevo_saldo       = tarifa_real - pagos_anticipados
+
+        c.saldo_pendiente = nuevo_saldo
+        c.deuda           = estado_deuda_cierre(nuevo_saldo, pagos_anticipados, tarifa_real)
+        cuentas_a_actualizar.append(c)
+
+    # ── Guardar en lote ──────────────────────────────────────────────────
+    if cargos_a_crear:
+        Cargo.objects.bulk_create(cargos_a_crear, batch_size=500)
+
+    Cuentahabiente.objects.bulk_update(
+        cuentas_a_actualizar,
+        ["saldo_pendiente", "deuda"],
+        batch_size=500
+    )
+
+    return {
+        "cuentas_procesadas": len(cuentas_a_actualizar),
+        "cargos_generados": len(cargos_a_crear),
+        "cuentas_con_pagos_anticipados": len(pagos_por_cuenta),
+    }
+
+
+def ejecutar_cierre_python(anio_nuevo, tipo_cierre):
+    # ── Bloquear y cargar cuentahabientes ────────────────────────────────
+    ids = list(
+        Cuentahabiente.objects.select_for_update()
+        .values_list("id_cuentahabiente", flat=True)
+    )
+    cuentahabientes = list(
+        Cuentahabiente.objects.filter(id_cuentahabiente__in=ids)
+        .select_related("servicio")
+    )
+
+    # ── Pagos anticipados del nuevo año (más reciente primero) ───────────
+    pagos_nuevo_anio = list(
+        Pago.objects.filter(anio=anio_nuevo)
+        .select_related("descuento")
+        .order_by("cuentahabiente_id", "-fecha_pago", "-id_pago")
+    )
+
+    resultado = _cerrar_cuentas(cuentahabientes, pagos_nuevo_anio, anio_nuevo, tipo_cierre)
+    saldos.recalcular(anios=[anio_nuevo], vigente=anio_nuevo)
+    return resultado
+
+
+# ─── Implementación set-based (PostgreSQL) ───────────────────────────────────
+
+def _tablas():
+    return {
+        "cuenta":    Cuentahabiente._meta.db_table,
+        "cargo":     Cargo._meta.db_table,
+        "pago":      Pago._meta.db_table,
+        "servicio":  Servicio._meta.db_table,
+        "descuento": Descuento._meta.db_table,
+    }
+
+
+def ejecutar_cierre_sql(anio_nuevo, tipo_cierre):
+    """
+    Mismo cálculo que ejecutar_cierre_python, en tres sentencias:
+    1. SELECT ... FOR UPDATE   → bloquea las cuentas y las cuenta.
+    2. INSERT ... SELECT       → cargos CIERRE_ANUAL por el saldo que queda.
+    3. UPDATE ... FROM         → saldo_pendiente / deuda del nuevo año.
+    saldo_pendiente es entero: se trunca igual que IntegerField en Python.
+    """
+    t = _tablas()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*) FROM (SELECT 1 FROM {t['cuenta']} FOR UPDATE) bloqueadas"
+        )
+        cuentas_procesadas = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"""
+            INSERT INTO {t['cargo']}
+                   (cuentahabiente_id, tipo_cargo_id, saldo_restante_cargo, fecha_cargo, activo)
+            SELECT c.id_cuentahabiente, %s, c.saldo_pendiente, %s, TRUE
+              FROM {t['cuenta']} c
+             WHERE c.saldo_pendiente > 0
+            """,
+            [tipo_cierre.pk, date(anio_nuevo, 1, 1)],
+        )
+        cargos_generados = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            WITH pagos AS (
+                SELECT cuentahabiente_id, SUM(monto_recibido) AS total
+                  FROM {t['pago']}
+                 WHERE anio = %(anio)s
+                 GROUP BY cuentahabiente_id
+            ), descuentos AS (
+                SELECT DISTINCT ON (p.cuentahabiente_id)
+                       p.cuentahabiente_id, d.porcentaje
+                  FROM {t['pago']} p
+                  JOIN {t['descuento']} d ON d.id_descuento = p.descuento_id
+                 WHERE p.anio = %(anio)s AND d.activo
+                 ORDER BY p.cuentahabiente_id, p.fecha_pago DESC, p.id_pago DESC
+            ), nuevos AS (
+                SELECT c.id_cuentahabiente,
+                       COALESCE(s.costo, 0) - COALESCE(d.porcentaje, 0) AS tarifa_real,
+                       COALESCE(p.total, 0) AS pagos_anticipados
+                  FROM {t['cuenta']} c
+                  LEFT JOIN {t['servicio']} s ON s.id_tipo_servicio = c.servicio_id
+                  LEFT JOIN pagos p           ON p.cuentahabiente_id = c.id_cuentahabiente
+                  LEFT JOIN descuentos d      ON d.cuentahabiente_id = c.id_cuentahabiente
+            )
+            UPDATE {t['cuenta']} c
+               SET saldo_pendiente = trunc(n.tarifa_real - n.pagos_anticipados),
+                   deuda = CASE
+                       WHEN n.tarifa_real - n.pagos_anticipados <= 0 THEN 'pagado'
+                       WHEN n.pagos_anticipados > 0
+                            AND n.tarifa_real - n.pagos_anticipados < n.tarifa_real THEN 'corriente'
+                       ELSE 'adeudo'
+                   END
+              FROM nuevos n
+             WHERE c.id_cuentahabiente = n.id_cuentahabiente
+            """,
+            {"anio": anio_nuevo},
+        )
+
+        cursor.execute(
+            f"SELECT count(DISTINCT cuentahabiente_id) FROM {t['pago']} WHERE anio = %s",
+            [anio_nuevo],
+        )
+        cuentas_con_pagos = cursor.fetchone()[0]
+
+    saldos.recalcular(anios=[anio_nuevo], vigente=anio_nuevo)
+    return {
+        "cuentas_procesadas": cuentas_procesadas,
+        "cargos_generados": cargos_generados,
+        "cuentas_con_pagos_anticipados": cuentas_con_pagos,
+    }
+
+
+def ejecutar_cierre(anio_nuevo, tipo_cierre, modo=MODO_PYTHON):
+    if modo == MODO_SQL:
+        return ejecutar_cierre_sql(anio_nuevo, tipo_cierre)
+    return ejecutar_cierre_python(anio_nuevo, tipo_cierre)
+
+
+# ─── Cierre por lotes (reanudable) ───────────────────────────────────────────
+
+def procesar_lote(cierre_id, tipo_cierre, tamano_lote):
+    """
+    Cierra el siguiente rango de cuentas (ultimo_id_procesado < id <= tope_id)
+    y mueve el checkpoint, todo en una transacción. Cuando ya no quedan
+    cuentas marca el cierre como ejecutado. Devuelve False si no hay nada más que hacer.
+    """
+    with transaction.atomic():
+        # El lock del CierreAnual serializa a dos procesos que intenten
+        # avanzar el mismo cierre: el segundo ve el checkpoint ya movido.
+        cierre = CierreAnual.objects.select_for_update().get(pk=cierre_id)
+        if cierre.estado != CierreAnual.ESTADO_EN_PROCESO:
+            return False
+
+        cuentas = Cuentahabiente.objects.filter(id_cuentahabiente__gt=cierre.ultimo_id_procesado)
+        if cierre.tope_id is not None:
+            cuentas = cuentas.filter(id_cuentahabiente__lte=cierre.tope_id)
+        ids = list(
+            cuentas.select_for_update()
+            .order_by("id_cuentahabiente")
+            .values_list("id_cuentahabiente", flat=True)[:tamano_lote]
+        )
+        ahora = timezone.now()
+
+        if not ids:
+            cierre.estado         = CierreAnual.ESTADO_COMPLETADO
+            cierre.ejecutado      = True
+            cierre.fecha          = date.today()
+            cierre.actualizado_en = ahora
+            cierre.save(update_fields=["estado", "ejecutado", "fecha", "actualizado_en"])
+            return False
+
+        cuentahabientes = list(
+            Cuentahabiente.objects.filter(id_cuentahabiente__in=ids)
+            .select_related("servicio")
+            .order_by("id_cuentahabiente")
+        )
+        pagos_nuevo_anio = list(
+            Pago.objects.filter(anio=cierre.anio, cuentahabiente_id__in=ids)
+            .select_related("descuento")
+            .order_by("cuentahabiente_id", "-fecha_pago", "-id_pago")
+        )
+        resultado = _cerrar_cuentas(cuentahabientes, pagos_nuevo_anio, cierre.anio, tipo_cierre)
+        saldos.recalcular(cuenta_ids=ids, anios=[cierre.anio], vigente=cierre.anio)
+
+        cierre.ultimo_id_procesado            = ids[-1]
+        cierre.cuentas_procesadas            += resultado["cuentas_procesadas"]
+        cierre.cargos_generados              += resultado["cargos_generados"]
+        cierre.cuentas_con_pagos_anticipados += resultado["cuentas_con_pagos_anticipados"]
+        cierre.lotes_procesados              += 1
+        cierre.actualizado_en                 = ahora
+        cierre.save(update_fields=[
+            "ultimo_id_procesado", "cuentas_procesadas", "cargos_generados",
+            "cuentas_con_pagos_anticipados", "lotes_procesados", "actualizado_en",
+        ])
+        return True
+
+
+def marcar_error(cierre_id, exc):
+    logger.exception("Cierre anual %s: falló un lote", cierre_id)
+    CierreAnual.objects.filter(pk=cierre_id).update(
+        estado=CierreAnual.ESTADO_ERROR,
+        error=str(exc)[:2000],
+        actualizado_en=timezone.now(),
+    )
+
+
+def ejecutar_cierre_por_lotes(cierre_id, tipo_cierre, tamano_lote=None):
+    """Procesa lotes hasta terminar. Si algo falla deja el cierre en "error"."""
+    tamano_lote = tamano_lote or _conf("TAMANO_LOTE", 500)
+    try:
+        while procesar_lote(cierre_id, tipo_cierre, tamano_lote):
+            pass
+    except Exception as exc:
+        marcar_error(cierre_id, exc)
+        raise
+
+
+def cierre_activo(cierre):
+    """True si otro proceso reportó avance hace menos de LATIDO_TIMEOUT segundos."""
+    if cierre.estado != CierreAnual.ESTADO_EN_PROCESO or not cierre.actualizado_en:
+        return False
+    edad = (timezone.now() - cierre.actualizado_en).total_seconds()
+    return edad < _conf("LATIDO_TIMEOUT", 120)
+
+
+def preparar_cierre_por_lotes(cierre, usuario, tamano_lote=None):
+    """
+    Deja el CierreAnual (ya bloqueado con select_for_update) listo para
+    procesar. Si viene de "error" o de un proceso caído conserva el
+    checkpoint y solo se reanuda.
+    """
+    ahora = timezone.now()
+    if cierre.estado == CierreAnual.ESTADO_PENDIENTE:
+        cuentas = Cuentahabiente.objects.aggregate(total=Count("pk"), tope=Max("pk"))
+        cierre.total_cuentas = cuentas["total"]
+        cierre.tope_id       = cuentas["tope"] or 0
+        cierre.iniciado_en   = ahora
+    cierre.estado         = CierreAnual.ESTADO_EN_PROCESO
+    cierre.tamano_lote    = tamano_lote or cierre.tamano_lote or _conf("TAMANO_LOTE", 500)
+    cierre.ejecutado_por  = usuario
+    cierre.error          = None
+    cierre.actualizado_en = ahora
+    cierre.save()
+    return cierre
+
+
+def _tomar(cierre_id):
+    """
+    pg_try_advisory_lock de sesión sobre el cierre: un solo proceso lo avanza
+    y, si ese proceso muere, PostgreSQL suelta el lock y la siguiente
+    corrida lo retoma desde el checkpoint.
+    """
+    if connection.vendor != "postgresql":
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [f"cierre-anual:{cierre_id}"])
+        return cursor.fetchone()[0]
+
+
+def _soltar(cierre_id):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [f"cierre-anual:{cierre_id}"])
+
+
+def procesar_cierres_pendientes(tipo_cierre):
+    """
+    Avanza hasta terminar los cierres "en_proceso" que ningún otro proceso
+    tenga tomados (los deja ahí la API en modo "lotes"). Lo corre cron con
+    `manage.py procesar_cierres_anuales`, fuera de los workers web.
+    Devuelve {anio: estado final} de los cierres que tomó.
+    """
+    procesados = {}
+    pendientes = (
+        CierreAnual.objects
+        .filter(estado=CierreAnual.ESTADO_EN_PROCESO, ejecutado=False)
+        .order_by("anio")
+        .values_list("pk", "anio", "tamano_lote")
+    )
+    for cierre_id, anio, tamano_lote in list(pendientes):
+        if not _tomar(cierre_id):
+            continue
+        try:
+            ejecutar_cierre_por_lotes(cierre_id, tipo_cierre, tamano_lote)
+        except Exception:
+            pass  # ya quedó registrado en CierreAnual.error
+        finally:
+            _soltar(cierre_id)
+        procesados[anio] = CierreAnual.objects.values_list("estado", flat=True).get(pk=cierre_id)
+    return procesados
+
+
+# ─── Resumen previo (sin ejecutar) ───────────────────────────────────────────
+
+def calcular_resumen_cierre(anio_nuevo):
+    """Resumen previo del cierre, sin ejecutar nada, en una sola consulta agregada."""
+    pago_anticipado = Pago.objects.filter(
+        anio=anio_nuevo, cuentahabiente_id=OuterRef("pk")
+    )
+    resumen = Cuentahabiente.objects.aggregate(
+        reiniciadas=Count("pk", filter=Q(saldo_pendiente=0)),
+        con_adeudo=Count("pk", filter=~Q(saldo_pendiente=0)),
+        cargo_total=Coalesce(
+            Sum("servicio__costo"),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        cuentas_con_pagos_anticipados=Count("pk", filter=Q(Exists(pago_anticipado))),
+    )
+    resumen["cargo_total"] = decimal_seguro(resumen["cargo_total"]).quantize(Decimal("0.01"))
+    return resumen
+
+
+def resumen_cierre(anio_nuevo):
+    """
+    calcular_resumen_cierre() en caché por anio_nuevo y sello de cambios.
+
+    El sello es materialized.cambio_actual(): las escrituras de pagos, cargos,
+    cierres o cuentas lo avanzan al hacer commit en cualquier worker, y el
+    siguiente llamado recalcula. CIERRE_SETTINGS["RESUMEN_CACHE_TTL"] acota lo
+    que no pasa por signals (UPDATE masivos, cambios de tarifa). Fuera de
+    PostgreSQL no hay secuencia y se calcula siempre.
+    """
+    if not materialized.es_postgres():
+        return calcular_resumen_cierre(anio_nuevo)
+    clave = f"cierre:resumen:{anio_nuevo}:{materialized.cambio_actual()}"
+    resumen = cache.get(clave)
+    if resumen is None:
+        resumen = calcular_resumen_cierre(anio_nuevo)
+        cache.set(clave, resumen, _conf("RESUMEN_CACHE_TTL", 60))
+    return resumen
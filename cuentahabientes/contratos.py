@@ -0,0 +1,147 @@
+# cuentahabientes/contratos.py
+"""
+Asignación de numero_contrato para altas (CuentahabienteSerializer.create
+e import_base_excel --generar-contratos).
+
+Antes cada alta cargaba todos los contratos >= 2000 en un set para buscar
+el primer hueco, y el importador probaba número por número con .exists():
+ambos crecen con el padrón, y dos altas simultáneas podían elegir el mismo
+número (la segunda terminaba en IntegrityError).
+
+- contrato_libre guarda los números disponibles: los huecos del padrón
+  (bajas) y un bloque de LOTE números nuevos reservado por adelantado.
+- asignar() toma el menor >= minimo con SELECT ... FOR UPDATE SKIP LOCKED
+  y lo borra en la transacción del alta: dos altas concurrentes nunca toman
+  el mismo número ni se esperan entre sí, y si el alta se revierte el
+  número vuelve a quedar libre.
+- Cuando no queda ninguno, reponer() bloquea la fila de folio_contrato y
+  agrega el siguiente bloque (una vez cada LOTE altas).
+- Un número del pool que después se asignó a mano (edición, contrato que
+  trae el Excel) se descarta al encontrarlo: una consulta por índice único.
+
+La migración 0023 llena ambas tablas desde el padrón; `manage.py
+rebuild_contratos` las recalcula si hace falta.
+"""
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete
+
+from .models import ContratoLibre, Cuentahabiente, FolioContrato
+
+SERIE = "cuentahabiente"
+MINIMO = 2000  # los contratos menores son del padrón histórico
+LOTE = 100
+
+
+def _siguiente_del_padron():
+    ultimo = Cuentahabiente.objects.aggregate(ultimo=Max("numero_contrato"))["ultimo"]
+    return max(MINIMO, (ultimo or 0) + 1)
+
+
+@transaction.atomic
+def reponer(minimo=MINIMO, lote=LOTE):
+    """Agrega al pool los siguientes `lote` números sin usar a partir del folio."""
+    folio, _ = FolioContrato.objects.select_for_update().get_or_create(
+        serie=SERIE, defaults={"siguiente": _siguiente_del_padron()}
+    )
+    inicio = folio.siguiente
+    fin = max(inicio, minimo) + lote
+    usados = set(
+        Cuentahabiente.objects
+        .filter(numero_contrato__gte=inicio, numero_contrato__lt=fin)
+        .values_list("numero_contrato", flat=True)
+    )
+    ContratoLibre.objects.bulk_create(
+        [ContratoLibre(numero=n) for n in range(inicio, fin) if n not in usados],
+        ignore_conflicts=True,
+    )
+    folio.siguiente = fin
+    folio.save(update_fields=["siguiente"])
+
+
+def asignar(minimo=MINIMO):
+    """
+    Reserva y devuelve el menor numero_contrato libre >= minimo. Llamar
+    dentro de la transacción que crea la cuenta.
+    """
+    with transaction.atomic():
+        while True:
+            libre = (
+                ContratoLibre.objects.select_for_update(skip_locked=True)
+                .filter(numero__gte=minimo)
+                .order_by("numero")
+                .first()
+            )
+            if libre is None:
+                reponer(minimo)
+                continue
+            numero = libre.numero
+            libre.delete()
+            if not Cuentahabiente.objects.filter(numero_contrato=numero).exists():
+                return numero
+
+
+def asignar_varios(cantidad, minimo=MINIMO):
+    """
+    Como asignar(), pero reserva `cantidad` números con una consulta por
+    ronda en lugar de una por número (importación masiva). Devuelve la
+    lista en orden ascendente.
+    """
+    numeros = []
+    with transaction.atomic():
+        while len(numeros) < cantidad:
+            faltan = cantidad - len(numeros)
+            libres = list(
+                ContratoLibre.objects.select_for_update(skip_locked=True)
+                .filter(numero__gte=minimo)
+                .order_by("numero")
+                .values_list("numero", flat=True)[:faltan]
+            )
+            if len(libres) < faltan:
+                reponer(minimo, lote=max(LOTE, faltan - len(libres)))
+            if not libres:
+                continue
+            ContratoLibre.objects.filter(numero__in=libres).delete()
+            usados = set(
+                Cuentahabiente.objects.filter(numero_contrato__in=libres)
+                .values_list("numero_contrato", flat=True)
+            )
+            numeros += [n for n in libres if n not in usados]
+    return sorted(numeros)
+
+
+@transaction.atomic
+def reconstruir(lote=LOTE):
+    """
+    Recalcula folio_contrato y contrato_libre desde el padrón (recorre los
+    contratos >= MINIMO una vez). Devuelve el número de huecos.
+    """
+    siguiente = _siguiente_del_padron()
+    usados = set(
+        Cuentahabiente.objects
+        .filter(numero_contrato__gte=MINIMO)
+        .values_list("numero_contrato", flat=True)
+    )
+    huecos = [n for n in range(MINIMO, siguiente) if n not in usados]
+
+    ContratoLibre.objects.all().delete()
+    ContratoLibre.objects.bulk_create(
+        [ContratoLibre(numero=n) for n in huecos + list(range(siguiente, siguiente + lote))],
+        batch_size=5000,
+    )
+    FolioContrato.objects.update_or_create(
+        serie=SERIE, defaults={"siguiente": siguiente + lote}
+    )
+    return len(huecos)
+
+
+def on_cuentahabiente_borrado(sender, instance, **kwargs):
+    # La baja libera su número, como antes (el primer hueco se reutiliza)
+    if instance.numero_contrato and instance.numero_contrato >= MINIMO:
+        ContratoLibre.objects.bulk_create(
+            [ContratoLibre(numero=instance.numero_contrato)], ignore_conflicts=True
+        )
+
+
+def conectar_signals():
+    post_delete.connect(on_cuentahabiente_borrado, sender=Cuentahabiente, dispatch_uid="contratos-delete")
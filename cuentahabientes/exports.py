@@ -0,0 +1,112 @@
+# cuentahabientes/exports.py
+import csv
+import json
+import tempfile
+from datetime import datetime
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - openpyxl viene en requirements.txt
+    Workbook = None
+
+
+class _Echo:
+    """Pseudo-buffer: csv.writer escribe aquí y devolvemos la línea tal cual."""
+
+    def write(self, value):
+        return value
+
+
+def _celda(valor):
+    """Convierte valores de la vista a algo que CSV / XLSX entiendan."""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+class ExportarMixin:
+    """
+    Agrega GET .../export/?formato=csv|xlsx a un viewset de solo lectura.
+
+    - Respeta los mismos filtros / búsqueda / orden que el listado.
+    - Lee con un cursor del lado del servidor (.iterator(chunk_size=...)) y
+      no pasa por el serializer fila por fila: memoria constante sin importar
+      el tamaño del padrón.
+    - CSV se transmite mientras se lee; XLSX se escribe con openpyxl en modo
+      write_only a un archivo temporal y se transmite desde ahí.
+    """
+    export_chunk_size = 2000
+    export_formatos = ("csv", "xlsx")
+
+    def get_export_fields(self):
+        return list(self.get_serializer().fields.keys())
+
+    def get_export_filename(self, formato):
+        tabla = self.get_serializer_class().Meta.model._meta.db_table
+        return f"{tabla}_{timezone.localtime():%Y%m%d_%H%M}.{formato}"
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request, *args, **kwargs):
+        formato = (request.query_params.get("formato") or "csv").lower()
+        if formato not in self.export_formatos:
+            return Response(
+                {"detail": f"Formato no soportado. Usa: {', '.join(self.export_formatos)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        campos = self.get_export_fields()
+        filas = (
+            self.filter_queryset(self.get_queryset())
+            .values_list(*campos)
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        nombre = self.get_export_filename(formato)
+
+        if formato == "xlsx":
+            return self._export_xlsx(campos, filas, nombre)
+        return self._export_csv(campos, filas, nombre)
+
+    def _export_csv(self, campos, filas, nombre):
+        writer = csv.writer(_Echo())
+
+        def generar():
+            yield "\ufeff"  # BOM para que Excel respete los acentos
+            yield writer.writerow(campos)
+            for fila in filas:
+                yield writer.writerow([_celda(v) for v in fila])
+
+        response = StreamingHttpResponse(generar(), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return response
+
+    def _export_xlsx(self, campos, filas, nombre):
+        if Workbook is None:
+            return Response(
+                {"detail": "Exportar a XLSX requiere openpyxl."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title="Reporte")
+        ws.append(campos)
+        for fila in filas:
+            ws.append([_celda(v) for v in fila])
+
+        archivo = tempfile.TemporaryFile()
+        wb.save(archivo)
+        archivo.seek(0)
+
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=nombre,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
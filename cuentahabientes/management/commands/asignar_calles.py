@@ -0,0 +1,105 @@
+# Ubicación: cuentahabientes/management/commands/asignar_calles.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from calles.models import Calle, clave_calle
+from cuentahabientes import autocompletar
+from cuentahabientes.materialized import on_escritura
+from cuentahabientes.models import Cuentahabiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea en el catálogo de calles las que aparecen en el texto 'calle' de "
+        "los cuentahabientes y asigna calle_fk. Los nombres se comparan "
+        "normalizados (espacios, mayúsculas y acentos). Reemplaza al script "
+        "asignar_calles.py: un bulk_create para las calles faltantes y un "
+        "UPDATE ... FROM (VALUES ...) por lote para las cuentas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Cuentas por UPDATE (default 1000).")
+
+    def handle(self, *args, **opts):
+        chunk = opts["chunk_size"]
+        if chunk <= 0:
+            raise CommandError("--chunk-size debe ser mayor que 0.")
+
+        inicio = time.monotonic()
+        with transaction.atomic():
+            # ── 1. Calle de cada cuenta, normalizada ─────────────────────
+            cuentas = []  # (id_cuentahabiente, clave, calle_fk_id actual)
+            nombres = {}  # clave -> primer nombre visto, limpio
+            filas = (
+                Cuentahabiente.objects.exclude(calle__isnull=True).exclude(calle__exact="")
+                .values_list("id_cuentahabiente", "calle", "calle_fk_id")
+                .iterator(chunk_size=chunk)
+            )
+            for pk, calle, calle_fk_id in filas:
+                nombre = " ".join(calle.split())[:100]  # max_length de Calle
+                clave = clave_calle(nombre)
+                if not clave:
+                    continue
+                nombres.setdefault(clave, nombre)
+                cuentas.append((pk, clave, calle_fk_id))
+            t_lectura = time.monotonic()
+
+            # ── 2. Calles faltantes en un solo bulk_create ───────────────
+            ids = dict(Calle.objects.filter(clave__in=nombres).values_list("clave", "id_calle"))
+            faltantes = [
+                Calle(nombre_calle=nombre, clave=clave, activo=True)
+                for clave, nombre in nombres.items() if clave not in ids
+            ]
+            Calle.objects.bulk_create(faltantes, batch_size=chunk, ignore_conflicts=True)
+            if faltantes:
+                # ignore_conflicts no devuelve pks
+                ids.update(
+                    Calle.objects.filter(clave__in=[c.clave for c in faltantes])
+                    .values_list("clave", "id_calle")
+                )
+            t_calles = time.monotonic()
+
+            # ── 3. calle_fk en UPDATE por lotes, solo las que cambian ────
+            cambios = [(pk, ids[clave]) for pk, clave, actual in cuentas if actual != ids[clave]]
+            for i in range(0, len(cambios), chunk):
+                self._actualizar(cambios[i:i + chunk])
+            if cambios:
+                # UPDATE directo: no hay post_save que avise a reportes y autocompletado
+                on_escritura(sender=Cuentahabiente)
+                transaction.on_commit(autocompletar.invalidar)
+            t_update = time.monotonic()
+
+        sin_fk = (
+            Cuentahabiente.objects.filter(calle_fk__isnull=True)
+            .exclude(calle__isnull=True).exclude(calle__exact="").count()
+        )
+
+        self.stdout.write(f"Cuentas con calle: {len(cuentas)} | Calles distintas: {len(nombres)}")
+        self.stdout.write(f"  lectura       {t_lectura - inicio:6.2f}s")
+        self.stdout.write(f"  calles        {t_calles - t_lectura:6.2f}s  ({len(faltantes)} creadas)")
+        self.stdout.write(f"  calle_fk      {t_update - t_calles:6.2f}s  ({len(cambios)} asignadas)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Listo en {time.monotonic() - inicio:.2f}s"
+        ))
+        if sin_fk:
+            self.stdout.write(self.style.WARNING(
+                f"⚠ {sin_fk} cuentahabientes con calle en texto pero sin calle_fk."
+            ))
+
+    def _actualizar(self, pares):
+        """Un UPDATE para todos los pares (id_cuentahabiente, id_calle) del lote."""
+        q = connection.ops.quote_name
+        tabla = q(Cuentahabiente._meta.db_table)
+        # CAST explícito: en PostgreSQL los parámetros de VALUES no traen tipo
+        valores = ", ".join(["(CAST(%s AS INTEGER), CAST(%s AS INTEGER))"] * len(pares))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH v (id, calle_id) AS (VALUES {valores}) "
+                f"UPDATE {tabla} SET {q('calle_fk_id')} = v.calle_id "
+                f"FROM v WHERE {tabla}.{q('id_cuentahabiente')} = v.id",
+                [valor for par in pares for valor in par],
+            )
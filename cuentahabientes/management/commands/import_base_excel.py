@@ -1,7 +1,11 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import csv
 import datetime as dt
+import json
+import time
 from decimal import Decimal
 from collections import defaultdict
 
@@ -10,7 +14,10 @@ try:
 except ImportError:
     raise CommandError("Falta openpyxl. Instala con: pip install openpyxl")
 
+from cuentahabientes import autocompletar, contratos, saldos
+from cuentahabientes.materialized import on_escritura
 from cuentahabientes.models import Cuentahabiente
+from corte import recaudacion
 from colonia.models import Colonia
 from servicio.models import Servicio
 from pagos.models import Pago
@@ -138,6 +145,185 @@ def calcular_estatus(pagos, saldo_final, fecha_actual=None):
     return "Adeudo"
 
 
+def saldo_y_estatus(datos, servicio):
+    """Saldo final (del último pago o del último saldo conocido) y estatus de la cuenta."""
+    if datos["pagos"]:
+        pagos_ordenados = sorted(
+            datos["pagos"], 
+            key=lambda p: (p["anio"], mes_a_num(p["mes"]))
+        )
+        
+        ultimo_pago = pagos_ordenados[-1]
+        
+        if ultimo_pago["saldo_pendiente"] is not None:
+            try:
+                saldo_antes = int(ultimo_pago["saldo_pendiente"])
+                pago_aplicado = ultimo_pago["monto_recibido"] + ultimo_pago["monto_descuento"]
+                saldo_final = max(0, saldo_antes - pago_aplicado)
+            except:
+                saldo_final = 0
+        else:
+            saldo_final = 0
+    else:
+        saldo_final = int(Decimal(servicio.costo))
+    
+    # Si hay un saldo conocido registrado (de filas sin pago), usarlo
+    if "ultimo_saldo_conocido" in datos and datos["ultimo_saldo_conocido"] is not None:
+        try:
+            saldo_final = int(datos["ultimo_saldo_conocido"])
+        except:
+            pass
+    
+    return saldo_final, calcular_estatus(datos["pagos"], saldo_final)
+
+
+def fecha_de_pago(pago_data):
+    """Día 15 del mes/año de la fila."""
+    try:
+        return dt.date(int(pago_data["anio"]), mes_a_num(pago_data["mes"]), 15)
+    except:
+        return dt.date.today()
+
+
+def descuento_de_pago(pago_data, desc_pp, desc_inapam):
+    """Infiere el descuento por el monto: 60 = pronto pago, 300/360 = INAPAM."""
+    monto_desc = pago_data["monto_descuento"]
+    if monto_desc == 60 and desc_pp:
+        return desc_pp
+    if monto_desc in (300, 360) and desc_inapam:
+        return desc_inapam
+    return None
+
+
+MIN_FILAS_POR_PROCESO = 5000
+# Campos de Cuentahabiente que compara --dry-run
+CAMPOS_DIFF = (
+    "nombres", "ap", "am", "calle", "numero", "telefono",
+    "colonia_id", "servicio_id", "saldo_pendiente", "deuda",
+)
+COLUMNAS_REPORTE = (
+    "accion", "numero_contrato", "nombre", "colonia", "saldo_actual", "saldo_nuevo",
+    "deuda_actual", "deuda_nueva", "cambios", "pagos_nuevos", "detalle",
+)
+
+
+def _encabezados(ws, fila_header):
+    fila = next(ws.iter_rows(min_row=fila_header, max_row=fila_header, values_only=True))
+    return [str(c or "").strip() for c in fila]
+
+
+def leer_fila(row_values, headers):
+    """
+    Interpreta una fila del Excel. None si se salta (sin nombre ni contrato,
+    o sin colonia); si no, un dict con los datos de la cuenta y del pago.
+    """
+    numero_contrato = _pick(row_values, headers, "numero_contrato", cast=int)
+    nombres = (_pick(row_values, headers, "nombres", default="") or "").strip()
+    ap = (_pick(row_values, headers, "ap", default="") or "").strip()
+    am = (_pick(row_values, headers, "am", default="") or "").strip()
+    nombre_colonia = (_pick(row_values, headers, "colonia", default="") or "").strip()
+
+    if not nombres and not ap and not numero_contrato:
+        return None
+    if not nombre_colonia:
+        return None
+
+    monto_recibido = _pick(row_values, headers, "monto_recibido", default=0)
+    try:
+        monto_recibido = int(monto_recibido or 0)
+    except:
+        monto_recibido = 0
+
+    monto_descuento = _pick(row_values, headers, "monto_descuento", default=0)
+    try:
+        monto_descuento = int(monto_descuento or 0)
+    except:
+        monto_descuento = 0
+
+    return {
+        "numero_contrato": numero_contrato,
+        "nombres": nombres,
+        "ap": ap,
+        "am": am,
+        "colonia": nombre_colonia,
+        "calle": (_pick(row_values, headers, "calle", default="S/N") or "").strip(),
+        "numero": _pick(row_values, headers, "numero", default=0, cast=int) or 0,
+        "telefono": (_pick(row_values, headers, "telefono", default="S/N") or "").strip(),
+        "mes": _pick(row_values, headers, "mes", default="Enero"),
+        "anio": _pick(row_values, headers, "anio", default=dt.date.today().year, cast=int),
+        "monto_recibido": monto_recibido,
+        "monto_descuento": monto_descuento,
+        "saldo_pendiente": _pick(row_values, headers, "saldo_pendiente", default=None),
+    }
+
+
+def leer_rango(ruta, hoja, fila_header, desde, hasta):
+    """
+    [(registro | None, error | None)] de las filas desde..hasta (hasta=None:
+    hasta el final). Abre su propio workbook para poder correr en otro proceso.
+    """
+    wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja] if hoja else wb.worksheets[0]
+        headers = _encabezados(ws, fila_header)
+        resultado = []
+        for row_values in ws.iter_rows(min_row=desde, max_row=hasta, values_only=True):
+            try:
+                resultado.append((leer_fila(row_values, headers), None))
+            except Exception as e:
+                resultado.append((None, str(e)))
+        return resultado
+    finally:
+        wb.close()
+
+
+def agrupar(registros):
+    """
+    Junta los registros (en orden de fila) por cuentahabiente: por contrato
+    si lo trae (cada contrato es único) o por nombre completo + colonia.
+    """
+    cuentahabientes_data = {}
+    for r in registros:
+        if r["numero_contrato"]:
+            clave = f"contrato_{r['numero_contrato']}"
+        else:
+            clave = f"nombre_{r['nombres'].lower()}_{r['ap'].lower()}_{r['am'].lower()}_{r['colonia'].lower()}"
+
+        if clave not in cuentahabientes_data:
+            cuentahabientes_data[clave] = {
+                "numero_contrato": r["numero_contrato"],
+                "nombres": r["nombres"],
+                "ap": r["ap"],
+                "am": r["am"],
+                "calle": r["calle"],
+                "numero": r["numero"],
+                "telefono": r["telefono"],
+                "colonia": r["colonia"],
+                "pagos": []
+            }
+        elif cuentahabientes_data[clave]["numero_contrato"] is None and r["numero_contrato"]:
+            cuentahabientes_data[clave]["numero_contrato"] = r["numero_contrato"]
+
+        # Solo es pago si al menos uno de los montos es > 0
+        if r["monto_recibido"] > 0 or r["monto_descuento"] > 0:
+            cuentahabientes_data[clave]["pagos"].append({
+                "mes": r["mes"],
+                "anio": r["anio"],
+                "monto_recibido": r["monto_recibido"],
+                "monto_descuento": r["monto_descuento"],
+                "saldo_pendiente": r["saldo_pendiente"],
+            })
+        elif r["saldo_pendiente"] is not None:
+            # Sin pago pero con saldo: el primero que aparece es el conocido
+            cuentahabientes_data[clave].setdefault("ultimo_saldo_conocido", r["saldo_pendiente"])
+    return cuentahabientes_data
+
+
+def _comparable(valor):
+    # numero es CharField en el modelo y entero en el Excel
+    return None if valor is None else str(valor)
+
+
 class Command(BaseCommand):
     help = "Importa Cuentahabientes desde Excel con múltiples pagos por persona."
 
@@ -158,12 +344,32 @@ class Command(BaseCommand):
         parser.add_argument("--base-contrato", type=int, default=10000,
                             help="Número base para generar contratos (default: 10000).")
         parser.add_argument("--dry-run", action="store_true",
-                            help="Simula sin escribir cambios.")
+                            help="No escribe: compara el archivo contra la BD y reporta "
+                                 "cuentas nuevas, saldos cambiados y pagos nuevos.")
+        parser.add_argument("--reporte", type=str, default=None,
+                            help="Con --dry-run, guarda el detalle en .json o .csv.")
+        parser.add_argument("--procesos", type=int, default=1,
+                            help="Procesos para interpretar la hoja por rangos de filas "
+                                 "(default: 1; útil en archivos muy grandes).")
+        parser.add_argument("--pipeline", action="store_true",
+                            help="Modo masivo: catálogos precargados, upsert de cuentas y "
+                                 "pagos con bulk_create (pocas consultas por lote, no por fila).")
+        parser.add_argument("--lote", type=int, default=1000,
+                            help="Tamaño de lote de --pipeline y del recálculo de saldos (default: 1000).")
 
     def handle(self, *args, **opts):
+        inicio = time.monotonic()
         ruta = Path(opts["ruta_excel"]).expanduser()
         if not ruta.exists():
             raise CommandError(f"No existe el archivo: {ruta}")
+        if opts["lote"] <= 0:
+            raise CommandError("--lote debe ser mayor que 0.")
+        if opts["procesos"] <= 0:
+            raise CommandError("--procesos debe ser mayor que 0.")
+        if opts["reporte"] and not opts["dry_run"]:
+            raise CommandError("--reporte solo aplica junto con --dry-run.")
+        if opts["reporte"] and Path(opts["reporte"]).suffix.lower() not in (".json", ".csv"):
+            raise CommandError("--reporte debe terminar en .json o .csv.")
 
         hoja = opts["hoja"]
         fila_header = opts["fila_header"]
@@ -188,122 +394,48 @@ class Command(BaseCommand):
         desc_pp = Descuento.objects.filter(nombre_descuento__iexact="Promoción Anual").first()
         desc_inapam = Descuento.objects.filter(nombre_descuento__iexact="INAPAM").first()
 
-        # Abre el Excel
-        wb = openpyxl.load_workbook(ruta, data_only=True)
-        ws = wb[hoja] if hoja else wb.worksheets[0]
-        headers = [str(c or "").strip() for c in next(ws.iter_rows(min_row=fila_header, max_row=fila_header, values_only=True))]
-        
+        # === PASO 1: AGRUPAR DATOS POR CUENTAHABIENTE ===
+        registros, headers = self._leer(ruta, hoja, fila_header, opts["procesos"])
         self.stdout.write(self.style.WARNING(f"Headers detectados: {headers}"))
 
-        # === PASO 1: AGRUPAR DATOS POR CUENTAHABIENTE ===
-        cuentahabientes_data = {}
-        filas_procesadas = 0
+        filas_procesadas = len(registros)
         filas_saltadas = 0
-        
-        for row_values in ws.iter_rows(min_row=fila_header + 1, values_only=True):
-            filas_procesadas += 1
-            try:
-                numero_contrato = _pick(row_values, headers, "numero_contrato", cast=int)
-                nombres = (_pick(row_values, headers, "nombres", default="") or "").strip()
-                ap = (_pick(row_values, headers, "ap", default="") or "").strip()
-                am = (_pick(row_values, headers, "am", default="") or "").strip()
-                nombre_colonia = (_pick(row_values, headers, "colonia", default="") or "").strip()
-
-                if filas_procesadas == 1:
-                    self.stdout.write(self.style.WARNING(
-                        f"Primera fila - Contrato: {numero_contrato}, "
-                        f"Nombre: {nombres}, AP: {ap}, Colonia: {nombre_colonia}"
-                    ))
-
-                if not nombres and not ap and not numero_contrato:
-                    filas_saltadas += 1
-                    continue
-                if not nombre_colonia:
-                    filas_saltadas += 1
-                    continue
-
-                # Crear clave única para identificar al cuentahabiente
-                # Si tiene número de contrato, usarlo como clave principal (cada contrato es único)
-                # Si no tiene contrato, agrupar por nombre completo
-                if numero_contrato:
-                    clave = f"contrato_{numero_contrato}"
-                else:
-                    clave = f"nombre_{nombres.lower().strip()}_{ap.lower().strip()}_{am.lower().strip()}_{nombre_colonia.lower().strip()}"
-
-                if clave not in cuentahabientes_data:
-                    cuentahabientes_data[clave] = {
-                        "numero_contrato": numero_contrato,
-                        "nombres": nombres,
-                        "ap": ap,
-                        "am": am,
-                        "calle": (_pick(row_values, headers, "calle", default="S/N") or "").strip(),
-                        "numero": _pick(row_values, headers, "numero", default=0, cast=int) or 0,
-                        "telefono": (_pick(row_values, headers, "telefono", default="S/N") or "").strip(),
-                        "colonia": nombre_colonia,
-                        "pagos": []
-                    }
-                else:
-                    # Si ya existe pero no tenía número de contrato y ahora sí
-                    if cuentahabientes_data[clave]["numero_contrato"] is None and numero_contrato:
-                        cuentahabientes_data[clave]["numero_contrato"] = numero_contrato
-
-                monto_recibido = _pick(row_values, headers, "monto_recibido", default=0)
-                try:
-                    monto_recibido = int(monto_recibido or 0)
-                except:
-                    monto_recibido = 0
-
-                monto_descuento = _pick(row_values, headers, "monto_descuento", default=0)
-                try:
-                    monto_descuento = int(monto_descuento or 0)
-                except:
-                    monto_descuento = 0
-
-                # Solo agregar si realmente hay un pago (al menos uno de los dos debe ser > 0)
-                if monto_recibido > 0 or monto_descuento > 0:
-                    mes = _pick(row_values, headers, "mes", default="Enero")
-                    anio = _pick(row_values, headers, "anio", default=dt.date.today().year, cast=int)
-                    saldo_pendiente = _pick(row_values, headers, "saldo_pendiente", default=None)
-                    
-                    cuentahabientes_data[clave]["pagos"].append({
-                        "mes": mes,
-                        "anio": anio,
-                        "monto_recibido": monto_recibido,
-                        "monto_descuento": monto_descuento,
-                        "saldo_pendiente": saldo_pendiente
-                    })
-                else:
-                    # Si no hay pago pero hay saldo_pendiente, guardarlo para cálculo final
-                    saldo_pendiente = _pick(row_values, headers, "saldo_pendiente", default=None)
-                    if saldo_pendiente is not None and clave in cuentahabientes_data:
-                        # Actualizar el saldo más reciente conocido
-                        if "ultimo_saldo_conocido" not in cuentahabientes_data[clave]:
-                            cuentahabientes_data[clave]["ultimo_saldo_conocido"] = saldo_pendiente
-
-            except Exception as e:
-                self.stderr.write(self.style.WARNING(f"[Lectura fila {filas_procesadas}] Error: {e}"))
-                continue
+        for num, (registro, error) in enumerate(registros, start=1):
+            if error:
+                self.stderr.write(self.style.WARNING(f"[Lectura fila {num}] Error: {error}"))
+            elif registro is None:
+                filas_saltadas += 1
+            elif num == 1:
+                self.stdout.write(self.style.WARNING(
+                    f"Primera fila - Contrato: {registro['numero_contrato']}, "
+                    f"Nombre: {registro['nombres']}, AP: {registro['ap']}, "
+                    f"Colonia: {registro['colonia']}"
+                ))
+        cuentahabientes_data = agrupar(r for r, _ in registros if r is not None)
 
         self.stdout.write(self.style.WARNING(
             f"Filas procesadas: {filas_procesadas}, Saltadas: {filas_saltadas}, "
             f"Cuentahabientes únicos encontrados: {len(cuentahabientes_data)}"
         ))
 
+        if dry:
+            self._diff(cuentahabientes_data, servicio, opts)
+            self._reportar_velocidad(filas_procesadas, inicio)
+            return
+
+        if opts["pipeline"]:
+            self._pipeline(cuentahabientes_data, servicio, cobrador, desc_pp, desc_inapam, opts)
+            self._reportar_velocidad(filas_procesadas, inicio)
+            return
+
         # === PASO 2: PROCESAR CUENTAHABIENTES ÚNICOS ===
         creados = 0
         actualizados = 0
         pagos_creados = 0
         errores = 0
         contratos_generados = 0
-
-        if generar_contratos:
-            ultimo_contrato = Cuentahabiente.objects.filter(
-                numero_contrato__isnull=False
-            ).order_by('-numero_contrato').values_list('numero_contrato', flat=True).first()
-            
-            proximo_contrato = max(base_contrato, (ultimo_contrato or 0) + 1) if ultimo_contrato else base_contrato
-        else:
-            proximo_contrato = None
+        cuenta_ids = []
+        fechas_pagos = []
 
         with transaction.atomic():
             try:
@@ -319,38 +451,7 @@ class Command(BaseCommand):
                             errores += 1
                             continue
 
-                        # Calcular saldo final
-                        saldo_final = None
-                        
-                        if datos["pagos"]:
-                            pagos_ordenados = sorted(
-                                datos["pagos"], 
-                                key=lambda p: (p["anio"], mes_a_num(p["mes"]))
-                            )
-                            
-                            ultimo_pago = pagos_ordenados[-1]
-                            
-                            if ultimo_pago["saldo_pendiente"] is not None:
-                                try:
-                                    saldo_antes = int(ultimo_pago["saldo_pendiente"])
-                                    pago_aplicado = ultimo_pago["monto_recibido"] + ultimo_pago["monto_descuento"]
-                                    saldo_final = max(0, saldo_antes - pago_aplicado)
-                                except:
-                                    saldo_final = 0
-                            else:
-                                saldo_final = 0
-                        else:
-                            saldo_final = int(Decimal(servicio.costo))
-                        
-                        # Si hay un saldo conocido registrado (de filas sin pago), usarlo
-                        if "ultimo_saldo_conocido" in datos and datos["ultimo_saldo_conocido"] is not None:
-                            try:
-                                saldo_final = int(datos["ultimo_saldo_conocido"])
-                            except:
-                                pass
-                        
-                        # Calcular estatus
-                        estatus = calcular_estatus(datos["pagos"], saldo_final)
+                        saldo_final, estatus = saldo_y_estatus(datos, servicio)
 
                         # Crear o actualizar cuentahabiente
                         if numero_contrato:
@@ -371,26 +472,22 @@ class Command(BaseCommand):
                             )
                         else:
                             if generar_contratos:
-                                while Cuentahabiente.objects.filter(numero_contrato=proximo_contrato).exists():
-                                    proximo_contrato += 1
-                                
-                                ch, created = Cuentahabiente.objects.update_or_create(
-                                    numero_contrato=proximo_contrato,
-                                    defaults={
-                                        "nombres": datos["nombres"],
-                                        "ap": datos["ap"],
-                                        "am": datos["am"],
-                                        "calle": datos["calle"],
-                                        "numero": datos["numero"],
-                                        "telefono": datos["telefono"],
-                                        "colonia": colonia,
-                                        "servicio": servicio,
-                                        "saldo_pendiente": saldo_final,
-                                        "deuda": estatus,
-                                    }
+                                # Número libre del pool (contratos.py), sin probar uno por uno
+                                ch = Cuentahabiente.objects.create(
+                                    numero_contrato=contratos.asignar(base_contrato),
+                                    nombres=datos["nombres"],
+                                    ap=datos["ap"],
+                                    am=datos["am"],
+                                    calle=datos["calle"],
+                                    numero=datos["numero"],
+                                    telefono=datos["telefono"],
+                                    colonia=colonia,
+                                    servicio=servicio,
+                                    saldo_pendiente=saldo_final,
+                                    deuda=estatus,
                                 )
+                                created = True
                                 contratos_generados += 1
-                                proximo_contrato += 1
                             else:
                                 ch = Cuentahabiente.objects.filter(
                                     nombres__iexact=datos["nombres"],
@@ -429,26 +526,13 @@ class Command(BaseCommand):
                             creados += 1
                         else:
                             actualizados += 1
+                        cuenta_ids.append(ch.pk)
 
                         # Crear pagos
                         if crear_pagos:
                             for pago_data in datos["pagos"]:
-                                try:
-                                    fecha_pago = dt.date(
-                                        int(pago_data["anio"]), 
-                                        mes_a_num(pago_data["mes"]), 
-                                        15
-                                    )
-                                except:
-                                    fecha_pago = dt.date.today()
-
-                                descuento = None
-                                monto_desc = pago_data["monto_descuento"]
-                                if monto_desc == 60 and desc_pp:
-                                    descuento = desc_pp
-                                elif monto_desc in (300, 360) and desc_inapam:
-                                    descuento = desc_inapam
-
+                                fecha_pago = fecha_de_pago(pago_data)
+                                descuento = descuento_de_pago(pago_data, desc_pp, desc_inapam)
                                 mes_texto = str(pago_data["mes"]).strip().capitalize()
 
                                 # Verificar si ya existe este pago para evitar duplicados
@@ -472,14 +556,19 @@ class Command(BaseCommand):
                                         anio=int(pago_data["anio"]),
                                     )
                                     pagos_creados += 1
+                                    fechas_pagos.append(fecha_pago)
 
                     except Exception as e:
                         errores += 1
                         self.stderr.write(self.style.WARNING(f"[Procesamiento] Error: {e}"))
                         continue
 
-                if dry:
-                    transaction.set_rollback(True)
+                # cuentahabiente_saldo de las cuentas tocadas, como en --pipeline
+                for i in range(0, len(cuenta_ids), opts["lote"]):
+                    saldos.recalcular(cuenta_ids=cuenta_ids[i:i + opts["lote"]])
+                # recaudacion_diaria de los días con pagos nuevos, como en --pipeline
+                if fechas_pagos:
+                    recaudacion.recalcular(min(fechas_pagos), max(fechas_pagos), [cobrador.pk], lote=opts["lote"])
 
             except Exception as e:
                 transaction.set_rollback(True)
@@ -492,4 +581,311 @@ class Command(BaseCommand):
             msg += f" | Contratos generados: {contratos_generados}"
         msg += f" | Errores: {errores}"
         
-        self.stdout.write(self.style.SUCCESS(msg))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(msg))
+        self._reportar_velocidad(filas_procesadas, inicio)
+
+    def _leer(self, ruta, hoja, fila_header, procesos):
+        """
+        (registros, headers): un (registro | None, error | None) por fila, en
+        orden. Con --procesos > 1 y archivos grandes, cada proceso interpreta
+        un rango de filas y los resultados se concatenan en orden.
+        """
+        wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            ws = wb[hoja] if hoja else wb.worksheets[0]
+            headers = _encabezados(ws, fila_header)
+            ultima = ws.max_row  # dimensión declarada en el archivo; puede faltar
+        finally:
+            wb.close()
+
+        primera = fila_header + 1
+        total = (ultima or 0) - fila_header
+        procesos = min(procesos, total // MIN_FILAS_POR_PROCESO)
+        if procesos <= 1:
+            return leer_rango(ruta, hoja, fila_header, primera, None), headers
+
+        tamano = -(-total // procesos)
+        desde = [primera + i * tamano for i in range(procesos)]
+        # El último rango llega al final aunque la dimensión declarada esté mal
+        hasta = [d + tamano - 1 for d in desde[:-1]] + [None]
+        n = len(desde)
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            partes = pool.map(leer_rango, [ruta] * n, [hoja] * n, [fila_header] * n, desde, hasta)
+            registros = [r for parte in partes for r in parte]
+        return registros, headers
+
+    # === --dry-run ===
+
+    def _diff(self, cuentahabientes_data, servicio, opts):
+        """
+        Qué haría la importación, calculado en memoria contra mapas
+        precargados (colonias, cuentas por contrato, llaves de pagos). Solo
+        lee de la BD.
+        """
+        colonias = {c.nombre_colonia.lower(): c for c in Colonia.objects.all()}
+        actuales = {
+            fila["numero_contrato"]: fila
+            for fila in Cuentahabiente.objects.values("id_cuentahabiente", "numero_contrato", *CAMPOS_DIFF)
+        }
+        claves_pagos = set()
+        if opts["crear_pagos"]:
+            ids = [
+                actuales[d["numero_contrato"]]["id_cuentahabiente"]
+                for d in cuentahabientes_data.values() if d["numero_contrato"] in actuales
+            ]
+            for i in range(0, len(ids), opts["lote"]):
+                claves_pagos.update(
+                    Pago.objects.filter(cuentahabiente_id__in=ids[i:i + opts["lote"]])
+                    .values_list("cuentahabiente_id", "mes", "anio", "monto_recibido", "monto_descuento")
+                )
+
+        filas = []
+        for clave, datos in cuentahabientes_data.items():
+            contrato = datos["numero_contrato"]
+            fila = dict.fromkeys(COLUMNAS_REPORTE)
+            fila.update(
+                numero_contrato=contrato, colonia=datos["colonia"], cambios={}, pagos_nuevos=0,
+                nombre=f"{datos['nombres']} {datos['ap']} {datos['am']}".strip(),
+            )
+            filas.append(fila)
+
+            colonia = colonias.get(datos["colonia"].lower())
+            if colonia is None:
+                fila.update(accion="error", detalle=f"Colonia '{datos['colonia']}' no existe.")
+                continue
+            if not contrato and not opts["generar_contratos"]:
+                fila.update(accion="error", detalle="Sin contrato (usa --generar-contratos).")
+                continue
+
+            saldo_final, estatus = saldo_y_estatus(datos, servicio)
+            nuevo = {
+                "nombres": datos["nombres"], "ap": datos["ap"], "am": datos["am"],
+                "calle": datos["calle"], "numero": datos["numero"], "telefono": datos["telefono"],
+                "colonia_id": colonia.pk, "servicio_id": servicio.pk,
+                "saldo_pendiente": saldo_final, "deuda": estatus,
+            }
+            fila.update(saldo_nuevo=saldo_final, deuda_nueva=estatus)
+
+            actual = actuales.get(contrato) if contrato else None
+            if actual is None:
+                fila.update(accion="nueva", detalle="" if contrato else "Contrato por asignar.")
+                cuenta = clave
+            else:
+                fila["cambios"] = {
+                    campo: [actual[campo], nuevo[campo]]
+                    for campo in CAMPOS_DIFF
+                    if _comparable(actual[campo]) != _comparable(nuevo[campo])
+                }
+                fila.update(
+                    accion="actualizada" if fila["cambios"] else "sin_cambios",
+                    saldo_actual=actual["saldo_pendiente"], deuda_actual=actual["deuda"],
+                )
+                cuenta = actual["id_cuentahabiente"]
+
+            if opts["crear_pagos"]:
+                for pago_data in datos["pagos"]:
+                    llave = (
+                        cuenta, str(pago_data["mes"]).strip().capitalize(), int(pago_data["anio"]),
+                        pago_data["monto_recibido"], pago_data["monto_descuento"],
+                    )
+                    if llave not in claves_pagos:
+                        claves_pagos.add(llave)
+                        fila["pagos_nuevos"] += 1
+
+        resumen = {
+            "filas": len(filas),
+            "cuentas_nuevas": sum(f["accion"] == "nueva" for f in filas),
+            "cuentas_actualizadas": sum(f["accion"] == "actualizada" for f in filas),
+            "saldos_cambiados": sum("saldo_pendiente" in f["cambios"] for f in filas),
+            "sin_cambios": sum(f["accion"] == "sin_cambios" for f in filas),
+            "pagos_nuevos": sum(f["pagos_nuevos"] for f in filas),
+            "errores": sum(f["accion"] == "error" for f in filas),
+        }
+        for fila in filas:
+            if fila["accion"] == "error":
+                self.stderr.write(self.style.ERROR(f"{fila['nombre']}: {fila['detalle']}"))
+
+        if opts["reporte"]:
+            self._escribir_reporte(Path(opts["reporte"]).expanduser(), resumen, filas)
+            self.stdout.write(f"Reporte: {opts['reporte']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"DRY-RUN (sin cambios en la BD). Nuevas: {resumen['cuentas_nuevas']}, "
+            f"Actualizadas: {resumen['cuentas_actualizadas']} "
+            f"(saldo: {resumen['saldos_cambiados']}), Sin cambios: {resumen['sin_cambios']} | "
+            f"Pagos nuevos: {resumen['pagos_nuevos']} | Errores: {resumen['errores']}"
+        ))
+
+    def _escribir_reporte(self, ruta, resumen, filas):
+        if ruta.suffix.lower() == ".json":
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump({"resumen": resumen, "cuentas": filas}, f,
+                          ensure_ascii=False, indent=2, default=str)
+            return
+
+        # utf-8-sig para que Excel respete los acentos
+        with open(ruta, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNAS_REPORTE)
+            writer.writeheader()
+            for fila in filas:
+                cambios = "; ".join(
+                    f"{campo}: {antes} -> {despues}" for campo, (antes, despues) in fila["cambios"].items()
+                )
+                writer.writerow({**fila, "cambios": cambios})
+
+    def _reportar_velocidad(self, filas, inicio):
+        segundos = time.monotonic() - inicio
+        self.stdout.write(
+            f"{filas} filas en {segundos:.1f}s ({filas / max(segundos, 1e-6):,.0f} filas/s)"
+        )
+
+    # === MODO --pipeline ===
+
+    def _pipeline(self, cuentahabientes_data, servicio, cobrador, desc_pp, desc_inapam, opts):
+        """
+        Mismo resultado que el paso 2 fila por fila, con un número de
+        consultas que depende de los lotes y no de las filas:
+        - colonias y contratos existentes se precargan en dicts;
+        - las cuentas se escriben con bulk_create(update_conflicts=True)
+          sobre numero_contrato, y las que no traen contrato reciben uno
+          de contratos.asignar_varios();
+        - los pagos se deduplican contra un set de llaves precargado
+          (cuenta, mes, año, montos) y se insertan con bulk_create.
+        bulk_create no dispara post_save: al final se recalcula
+        cuentahabiente_saldo de las cuentas tocadas y se avisa a reportes
+        y cachés, como en pagos_cargos.
+        """
+        lote = opts["lote"]
+        colonias = {c.nombre_colonia.lower(): c for c in Colonia.objects.all()}
+        existentes = dict(Cuentahabiente.objects.values_list("numero_contrato", "pk"))
+
+        errores = 0
+        cuentas = []  # (Cuentahabiente, datos)
+        sin_contrato = []
+        for datos in cuentahabientes_data.values():
+            colonia = colonias.get(datos["colonia"].lower())
+            if colonia is None:
+                self.stderr.write(self.style.ERROR(f"Colonia '{datos['colonia']}' no existe."))
+                errores += 1
+                continue
+            if not datos["numero_contrato"] and not opts["generar_contratos"]:
+                # numero_contrato es obligatorio y único en el modelo
+                self.stderr.write(self.style.ERROR(
+                    f"Sin contrato: {datos['nombres']} {datos['ap']} {datos['am']} "
+                    f"(usa --generar-contratos)."
+                ))
+                errores += 1
+                continue
+
+            saldo_final, estatus = saldo_y_estatus(datos, servicio)
+            ch = Cuentahabiente(
+                numero_contrato=datos["numero_contrato"],
+                nombres=datos["nombres"],
+                ap=datos["ap"],
+                am=datos["am"],
+                calle=datos["calle"],
+                numero=datos["numero"],
+                telefono=datos["telefono"],
+                colonia=colonia,
+                servicio=servicio,
+                saldo_pendiente=saldo_final,
+                deuda=estatus,
+            )
+            cuentas.append((ch, datos))
+            if not ch.numero_contrato:
+                sin_contrato.append(ch)
+
+        with transaction.atomic():
+            for ch, numero in zip(
+                sin_contrato, contratos.asignar_varios(len(sin_contrato), opts["base_contrato"])
+            ):
+                ch.numero_contrato = numero
+
+            # Un mismo contrato no puede ir dos veces en un INSERT ... ON CONFLICT;
+            # como con update_or_create fila por fila, gana el último y los
+            # pagos de ambos van a la misma cuenta
+            por_contrato = {}
+            for ch, datos in cuentas:
+                anterior = por_contrato.get(ch.numero_contrato)
+                if anterior:
+                    datos = {**datos, "pagos": anterior[1]["pagos"] + datos["pagos"]}
+                por_contrato[ch.numero_contrato] = (ch, datos)
+            cuentas = list(por_contrato.values())
+
+            creados = sum(1 for ch, _ in cuentas if ch.numero_contrato not in existentes)
+            Cuentahabiente.objects.bulk_create(
+                [ch for ch, _ in cuentas],
+                batch_size=lote,
+                update_conflicts=True,
+                unique_fields=["numero_contrato"],
+                update_fields=[
+                    "nombres", "ap", "am", "calle", "numero", "telefono",
+                    "colonia", "servicio", "saldo_pendiente", "deuda",
+                ],
+            )
+            # No todos los backends devuelven la pk de las filas actualizadas
+            numeros = [ch.numero_contrato for ch, _ in cuentas]
+            ids = {}
+            for i in range(0, len(numeros), lote):
+                ids.update(
+                    Cuentahabiente.objects.filter(numero_contrato__in=numeros[i:i + lote])
+                    .values_list("numero_contrato", "pk")
+                )
+            for ch, _ in cuentas:
+                ch.pk = ids[ch.numero_contrato]
+
+            pagos_creados = 0
+            if opts["crear_pagos"]:
+                pagos_creados = self._pagos_pipeline(cuentas, cobrador, desc_pp, desc_inapam, lote)
+
+            cuenta_ids = [ch.pk for ch, _ in cuentas]
+            for i in range(0, len(cuenta_ids), lote):
+                saldos.recalcular(cuenta_ids=cuenta_ids[i:i + lote])
+            if cuentas:
+                on_escritura(sender=Cuentahabiente)
+                transaction.on_commit(autocompletar.invalidar)
+
+        msg = f"OK (pipeline). Cuentahabientes únicos: {len(cuentahabientes_data)} | "
+        msg += f"Creados: {creados}, Actualizados: {len(cuentas) - creados} | "
+        msg += f"Pagos: {pagos_creados}"
+        if opts["generar_contratos"]:
+            msg += f" | Contratos generados: {len(sin_contrato)}"
+        msg += f" | Errores: {errores}"
+        self.stdout.write(self.style.SUCCESS(msg))
+
+    def _pagos_pipeline(self, cuentas, cobrador, desc_pp, desc_inapam, lote):
+        cuenta_ids = [ch.pk for ch, _ in cuentas]
+        vistos = set()
+        for i in range(0, len(cuenta_ids), lote):
+            vistos.update(
+                Pago.objects.filter(cuentahabiente_id__in=cuenta_ids[i:i + lote])
+                .values_list("cuentahabiente_id", "mes", "anio", "monto_recibido", "monto_descuento")
+            )
+
+        nuevos = []
+        for ch, datos in cuentas:
+            for pago_data in datos["pagos"]:
+                mes_texto = str(pago_data["mes"]).strip().capitalize()
+                llave = (
+                    ch.pk, mes_texto, int(pago_data["anio"]),
+                    pago_data["monto_recibido"], pago_data["monto_descuento"],
+                )
+                # También descarta repetidos dentro del mismo archivo
+                if llave in vistos:
+                    continue
+                vistos.add(llave)
+                nuevos.append(Pago(
+                    descuento=descuento_de_pago(pago_data, desc_pp, desc_inapam),
+                    cobrador=cobrador,
+                    cuentahabiente_id=ch.pk,
+                    fecha_pago=fecha_de_pago(pago_data),
+                    monto_recibido=pago_data["monto_recibido"],
+                    monto_descuento=pago_data["monto_descuento"],
+                    mes=mes_texto,
+                    anio=int(pago_data["anio"]),
+                ))
+        Pago.objects.bulk_create(nuevos, batch_size=lote)
+        if nuevos:
+            fechas = [p.fecha_pago for p in nuevos]
+            recaudacion.recalcular(min(fechas), max(fechas), [cobrador.pk], lote=lote)
+        return len(nuevos)
\ No newline at end of file
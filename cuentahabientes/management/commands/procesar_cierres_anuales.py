@@ -0,0 +1,34 @@
+# Ubicación: cuentahabientes/management/commands/procesar_cierres_anuales.py
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from cargos.models import TipoCargo
+from cuentahabientes.cierre import procesar_cierres_pendientes
+from cuentahabientes.models import CierreAnual
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los cierres anuales por lotes que la API dejó en 'en_proceso'. "
+        "Pensado para cron / systemd timer; cada cierre se toma con un advisory "
+        "lock, así que dos corridas a la vez no se estorban."
+    )
+
+    def handle(self, *args, **opts):
+        tipo_cierre, _ = TipoCargo.objects.get_or_create(
+            nombre="CIERRE_ANUAL",
+            defaults={"monto": Decimal("0.00"), "automatico": True}
+        )
+        procesados = procesar_cierres_pendientes(tipo_cierre)
+        if not procesados:
+            self.stdout.write("Sin cierres pendientes.")
+        for anio, estado in procesados.items():
+            if estado == CierreAnual.ESTADO_COMPLETADO:
+                self.stdout.write(self.style.SUCCESS(f"✔ Cierre {anio} completado"))
+            else:
+                self.stderr.write(self.style.ERROR(
+                    f"✘ Cierre {anio}: {estado} (ver CierreAnual.error; se reanuda desde la API "
+                    f"o con reanudar_cierre_anual)"
+                ))
@@ -0,0 +1,66 @@
+# Ubicación: cuentahabientes/management/commands/reanudar_cierre_anual.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cargos.models import TipoCargo
+from cuentahabientes.cierre import (
+    cierre_activo, marcar_error, preparar_cierre_por_lotes, procesar_lote,
+)
+from cuentahabientes.models import CierreAnual
+
+
+class Command(BaseCommand):
+    help = (
+        "Reanuda en primer plano un cierre anual por lotes desde su último "
+        "checkpoint (p. ej. después de que se reinició el servidor)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("anio", type=int, help="Año nuevo del cierre (CierreAnual.anio).")
+        parser.add_argument("--tamano-lote", type=int, default=None,
+                            help="Cuentas por lote (por defecto el que ya tenía el cierre).")
+        parser.add_argument("--forzar", action="store_true",
+                            help="Reanudar aunque otro proceso haya reportado avance recientemente.")
+
+    def handle(self, *args, **opts):
+        anio = opts["anio"]
+
+        with transaction.atomic():
+            cierre = CierreAnual.objects.select_for_update().filter(anio=anio).first()
+            if cierre is None:
+                raise CommandError(
+                    f"No hay cierre registrado para {anio}. Inícialo desde la API con modo 'lotes'."
+                )
+            if cierre.ejecutado:
+                raise CommandError(f"El cierre {anio} ya fue ejecutado.")
+            if cierre_activo(cierre) and not opts["forzar"]:
+                raise CommandError(
+                    f"El cierre {anio} reportó avance hace poco; usa --forzar si sabes que está detenido."
+                )
+            tipo_cierre = TipoCargo.objects.get(nombre="CIERRE_ANUAL")
+            preparar_cierre_por_lotes(cierre, cierre.ejecutado_por, opts["tamano_lote"])
+
+        self.stdout.write(
+            f"Reanudando cierre {anio} desde id_cuentahabiente > {cierre.ultimo_id_procesado} "
+            f"({cierre.cuentas_procesadas}/{cierre.total_cuentas} cuentas, lotes de {cierre.tamano_lote})"
+        )
+
+        inicio = time.monotonic()
+        try:
+            while procesar_lote(cierre.pk, tipo_cierre, cierre.tamano_lote):
+                cierre.refresh_from_db()
+                self.stdout.write(
+                    f"  lote {cierre.lotes_procesados}: {cierre.cuentas_procesadas}/"
+                    f"{cierre.total_cuentas} cuentas, {cierre.cargos_generados} cargos"
+                )
+        except Exception as exc:
+            marcar_error(cierre.pk, exc)
+            raise
+
+        cierre.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Cierre {anio} {cierre.estado} en {time.monotonic() - inicio:.1f}s: "
+            f"{cierre.cuentas_procesadas} cuentas, {cierre.cargos_generados} cargos"
+        ))
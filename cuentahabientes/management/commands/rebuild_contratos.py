@@ -0,0 +1,28 @@
+# Ubicación: cuentahabientes/management/commands/rebuild_contratos.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cuentahabientes import contratos
+from cuentahabientes.models import ContratoLibre, FolioContrato
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula folio_contrato y contrato_libre desde el padrón: huecos de "
+        "numero_contrato >= 2000 y el siguiente bloque de números nuevos. "
+        "Útil después de cargar cuentas con SQL directo o de renumerar contratos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=contratos.LOTE,
+                            help=f"Números nuevos a reservar (default {contratos.LOTE}).")
+
+    def handle(self, *args, **opts):
+        if opts["lote"] <= 0:
+            raise CommandError("--lote debe ser mayor que 0.")
+        huecos = contratos.reconstruir(lote=opts["lote"])
+        folio = FolioContrato.objects.get(serie=contratos.SERIE)
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {huecos} huecos; {ContratoLibre.objects.count()} números libres; "
+            f"folio siguiente = {folio.siguiente}"
+        ))
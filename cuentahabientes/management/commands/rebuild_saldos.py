@@ -0,0 +1,105 @@
+# Ubicación: cuentahabientes/management/commands/rebuild_saldos.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cuentahabientes import saldos
+from cuentahabientes.models import Cuentahabiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye cuentahabiente_saldo desde pagos, pagos_cargos y cargos "
+        "(backfill inicial o después de importar). Con --verificar solo "
+        "reporta las diferencias; sale con error si encuentra alguna."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--anio", type=int, action="append", dest="anios",
+                            help="Limitar a un año (se puede repetir).")
+        parser.add_argument("--cuenta", type=int, action="append", dest="cuentas",
+                            help="Limitar a un id_cuentahabiente (se puede repetir).")
+        parser.add_argument("--lote", type=int, default=2000,
+                            help="Cuentas por transacción (default 2000).")
+        parser.add_argument("--verificar", action="store_true",
+                            help="No escribe: compara la tabla contra los datos crudos.")
+        parser.add_argument("--corregir", action="store_true",
+                            help="Con --verificar, recalcula solo las cuentas con diferencias.")
+        parser.add_argument("--mostrar", type=int, default=20,
+                            help="Máximo de diferencias a imprimir (default 20).")
+
+    def handle(self, *args, **opts):
+        if opts["corregir"] and not opts["verificar"]:
+            raise CommandError("--corregir solo aplica junto con --verificar.")
+        if opts["lote"] <= 0:
+            raise CommandError("--lote debe ser mayor que 0.")
+
+        inicio = time.monotonic()
+        if opts["verificar"]:
+            self._verificar(opts)
+        else:
+            filas = self._reconstruir(opts)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {filas} filas de cuentahabiente_saldo reconstruidas "
+                f"en {time.monotonic() - inicio:.1f}s"
+            ))
+
+    def _lotes(self, opts):
+        """Rangos de id_cuentahabiente, en orden."""
+        qs = Cuentahabiente.objects.order_by("id_cuentahabiente")
+        if opts["cuentas"]:
+            qs = qs.filter(pk__in=opts["cuentas"])
+        ultimo = 0
+        while True:
+            ids = list(
+                qs.filter(id_cuentahabiente__gt=ultimo)
+                .values_list("id_cuentahabiente", flat=True)[:opts["lote"]]
+            )
+            if not ids:
+                return
+            yield ids
+            ultimo = ids[-1]
+
+    def _reconstruir(self, opts):
+        filas = 0
+        for ids in self._lotes(opts):
+            with transaction.atomic():
+                # Mismo lock que toma el alta de pagos: no pisar un pago en curso
+                list(Cuentahabiente.objects.select_for_update().filter(pk__in=ids).values_list("pk"))
+                filas += saldos.recalcular(cuenta_ids=ids, anios=opts["anios"])
+            self.stdout.write(f"  hasta id_cuentahabiente {ids[-1]}: {filas} filas")
+        return filas
+
+    def _verificar(self, opts):
+        diferencias = []
+        for ids in self._lotes(opts):
+            diferencias += saldos.verificar(cuenta_ids=ids, anios=opts["anios"])
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("✔ cuentahabiente_saldo coincide con los datos crudos"))
+            return
+
+        for d in diferencias[:opts["mostrar"]]:
+            detalle = ", ".join(
+                f"{campo}: esperado {esperado} / tabla {actual}"
+                for campo, (esperado, actual) in d["campos"].items()
+            )
+            self.stdout.write(f"  cuenta {d['cuentahabiente_id']} año {d['anio']}: {detalle}")
+        if len(diferencias) > opts["mostrar"]:
+            self.stdout.write(f"  … y {len(diferencias) - opts['mostrar']} más")
+
+        cuentas = sorted({d["cuentahabiente_id"] for d in diferencias})
+        if opts["corregir"]:
+            with transaction.atomic():
+                list(Cuentahabiente.objects.select_for_update().filter(pk__in=cuentas).values_list("pk"))
+                saldos.recalcular(cuenta_ids=cuentas, anios=opts["anios"])
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {len(diferencias)} diferencias corregidas en {len(cuentas)} cuentas"
+            ))
+            return
+
+        raise CommandError(
+            f"{len(diferencias)} diferencias en {len(cuentas)} cuentas; "
+            "corre rebuild_saldos --verificar --corregir o rebuild_saldos."
+        )
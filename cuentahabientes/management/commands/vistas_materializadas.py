@@ -0,0 +1,85 @@
+# Ubicación: cuentahabientes/management/commands/vistas_materializadas.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cuentahabientes.materialized import (
+    VISTAS_MATERIALIZADAS, es_postgres, materializar, refrescar, revertir, tipo_relacion,
+)
+from cuentahabientes.models import VistaMaterializadaEstado
+
+
+class Command(BaseCommand):
+    help = (
+        "Administra las vistas de reporte materializadas: convertir, revertir, "
+        "refrescar o mostrar su estado."
+    )
+
+    def add_arguments(self, parser):
+        accion = parser.add_mutually_exclusive_group()
+        accion.add_argument("--crear", action="store_true",
+                            help="Convierte las vistas en MATERIALIZED VIEW.")
+        accion.add_argument("--revertir", action="store_true",
+                            help="Regresa las vistas materializadas a vistas normales.")
+        accion.add_argument("--refrescar", action="store_true",
+                            help="Ejecuta REFRESH MATERIALIZED VIEW (CONCURRENTLY por defecto).")
+        parser.add_argument("--vista", action="append", choices=sorted(VISTAS_MATERIALIZADAS),
+                            help="Limita la acción a esta vista (se puede repetir).")
+        parser.add_argument("--solo-stale", action="store_true",
+                            help="Con --refrescar, solo las vistas marcadas como stale.")
+        parser.add_argument("--sin-concurrently", action="store_true",
+                            help="Con --refrescar, bloquea lecturas pero no requiere índice único.")
+
+    def handle(self, *args, **opts):
+        if not es_postgres():
+            raise CommandError("Las vistas materializadas requieren PostgreSQL.")
+
+        vistas = opts["vista"] or list(VISTAS_MATERIALIZADAS)
+
+        if opts["crear"]:
+            for nombre in vistas:
+                cambio = materializar(nombre)
+                self._reportar(nombre, "materializada" if cambio else "sin cambios")
+
+        elif opts["revertir"]:
+            for nombre in vistas:
+                cambio = revertir(nombre)
+                self._reportar(nombre, "revertida" if cambio else "sin cambios")
+
+        elif opts["refrescar"]:
+            if opts["solo_stale"]:
+                stale = set(
+                    VistaMaterializadaEstado.objects
+                    .filter(materializada=True, stale_since__isnull=False)
+                    .values_list("nombre", flat=True)
+                )
+                vistas = [v for v in vistas if v in stale]
+
+            for nombre in vistas:
+                inicio = time.monotonic()
+                ok = refrescar(nombre, concurrently=not opts["sin_concurrently"])
+                duracion = time.monotonic() - inicio
+                self._reportar(
+                    nombre,
+                    f"refrescada en {duracion:.2f}s" if ok else "ocupada (otro proceso la refresca)",
+                )
+
+        estados = {
+            e.nombre: e for e in VistaMaterializadaEstado.objects.filter(nombre__in=vistas)
+        }
+        self.stdout.write("\nEstado:")
+        with connection.cursor() as cursor:
+            for nombre in vistas:
+                tipo = {"v": "vista", "m": "materializada", None: "no existe"}.get(
+                    tipo_relacion(cursor, nombre), "otro"
+                )
+                e = estados.get(nombre)
+                stale = e.stale_since.isoformat() if e and e.stale_since else "-"
+                refresco = e.refrescada_en.isoformat() if e and e.refrescada_en else "-"
+                self.stdout.write(
+                    f"  {nombre:<24} {tipo:<14} stale desde: {stale:<32} refrescada: {refresco}"
+                )
+
+    def _reportar(self, nombre, msg):
+        self.stdout.write(self.style.SUCCESS(f"✔ {nombre}: {msg}"))
@@ -0,0 +1,279 @@
+# cuentahabientes/materialized.py
+"""
+Capa de reportes sobre MATERIALIZED VIEWs.
+
+Las vistas pesadas (joins + agregados JSON) se convierten así:
+    ALTER VIEW <vista> RENAME TO <vista>_base;
+    CREATE MATERIALIZED VIEW <vista> AS SELECT * FROM <vista>_base;
+    CREATE UNIQUE INDEX ... ON <vista> (<llave>);
+
+Los modelos de models_views.py no cambian (siguen apuntando a <vista>).
+
+Cada escritura en pagos, pagos de cargos, cargos o cierres:
+- avanza la secuencia vista_materializada_cambio_seq (nextval no bloquea ni
+  espera el commit de otros: no hay una fila caliente que todos actualicen);
+- marca stale_since solo en la transición de "al día" a "stale"
+  (WHERE stale_since IS NULL), así que mientras la vista ya está stale las
+  escrituras no tocan vista_materializada_estado.
+
+El REFRESH ... CONCURRENTLY no corre dentro de los workers web: lo hace cron
+con `manage.py vistas_materializadas --refrescar --solo-stale` (ver
+render.yaml). Al terminar guarda el valor de la secuencia que cubrió; si
+avanzó mientras corría, la vista sigue stale para la siguiente pasada.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import VistaMaterializadaEstado
+
+
+# nombre de la vista -> llave única (requerida por CONCURRENTLY) e índices extra
+VISTAS_MATERIALIZADAS = {
+    "vista_pagos":            {"unique": ["id"],                "indices": [["numero_contrato", "anio"]]},
+    "vista_deudores":         {"unique": ["id_cuentahabiente"], "indices": [["monto_total"]]},
+    "r_cuentahabientes":      {"unique": ["id_cuentahabiente"], "indices": [["numero_contrato"]],
+                               # GIN pg_trgm para BusquedaTrigramFilter (ver busqueda.py)
+                               "trgm": ["sicap_busqueda(nombre)", "sicap_busqueda(calle)",
+                                        "sicap_busqueda(nombre_colonia)", "telefono"]},
+    "estado_cuenta_new":      {"unique": ["id"],                "indices": [["numero_contrato", "anio"]]},
+    "reporte_cargos":         {"unique": ["id"],                "indices": [["numero_contrato", "fecha_cargo"]]},
+    "reporte_padron_general": {"unique": ["id"],                "indices": [["numero_contrato", "anio_reporte"]]},
+}
+
+SECUENCIA_CAMBIOS = "vista_materializada_cambio_seq"
+
+HEADER_STALE_SINCE = "X-Stale-Since"
+HEADER_REFRESHED_AT = "X-Refreshed-At"
+
+
+def _conf(key, default):
+    return getattr(settings, "MATVIEW_SETTINGS", {}).get(key, default)
+
+
+def es_postgres(conn=None) -> bool:
+    return (conn or connection).vendor == "postgresql"
+
+
+def tipo_relacion(cursor, nombre):
+    """'v' = vista, 'm' = materializada, None = no existe."""
+    cursor.execute(
+        "SELECT relkind FROM pg_class "
+        "WHERE relname = %s AND relnamespace = 'public'::regnamespace",
+        [nombre],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+# ─── Conversión ──────────────────────────────────────────────────────────────
+
+def materializar(nombre, conn=None):
+    """Convierte la vista en materializada. Devuelve True si hubo cambio."""
+    conn = conn or connection
+    conf = VISTAS_MATERIALIZADAS[nombre]
+    with conn.cursor() as cursor:
+        tipo = tipo_relacion(cursor, nombre)
+        if tipo == "m":
+            # Ya materializada: solo asegura índices agregados después
+            _indices_trgm(cursor, nombre, conf)
+        if tipo != "v":
+            return False
+
+        cursor.execute(f'ALTER VIEW public."{nombre}" RENAME TO "{nombre}_base"')
+        cursor.execute(
+            f'CREATE MATERIALIZED VIEW public."{nombre}" AS SELECT * FROM public."{nombre}_base"'
+        )
+        cursor.execute(
+            f'CREATE UNIQUE INDEX "{nombre}_mv_uniq" ON public."{nombre}" '
+            f'({", ".join(conf["unique"])})'
+        )
+        for i, columnas in enumerate(conf["indices"]):
+            cursor.execute(
+                f'CREATE INDEX "{nombre}_mv_idx{i}" ON public."{nombre}" ({", ".join(columnas)})'
+            )
+        _indices_trgm(cursor, nombre, conf)
+        cursor.execute(
+            """
+            INSERT INTO vista_materializada_estado (nombre, materializada, refrescada_en)
+            VALUES (%s, TRUE, now())
+            ON CONFLICT (nombre) DO UPDATE
+               SET materializada = TRUE, stale_since = NULL, refrescada_en = now()
+            """,
+            [nombre],
+        )
+    return True
+
+
+def _indices_trgm(cursor, nombre, conf):
+    """Índices GIN pg_trgm; requieren la migración 0021 (pg_trgm, sicap_busqueda)."""
+    if not conf.get("trgm"):
+        return
+    cursor.execute("SELECT to_regprocedure('sicap_busqueda(text)') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return
+    for i, expresion in enumerate(conf["trgm"]):
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{nombre}_mv_trgm{i}" ON public."{nombre}" '
+            f"USING gin (({expresion}) gin_trgm_ops)"
+        )
+
+
+def revertir(nombre, conn=None):
+    """Regresa la vista a su forma original. Devuelve True si hubo cambio."""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if tipo_relacion(cursor, nombre) != "m":
+            return False
+        cursor.execute(f'DROP MATERIALIZED VIEW public."{nombre}"')
+        cursor.execute(f'ALTER VIEW public."{nombre}_base" RENAME TO "{nombre}"')
+        cursor.execute(
+            "UPDATE vista_materializada_estado "
+            "SET materializada = FALSE, stale_since = NULL WHERE nombre = %s",
+            [nombre],
+        )
+    return True
+
+
+# ─── Refresco ────────────────────────────────────────────────────────────────
+
+# Último valor entregado por la secuencia (0 si nunca se ha llamado nextval)
+_SQL_CAMBIO = (
+    f"(SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SECUENCIA_CAMBIOS})"
+)
+
+
+def cambio_actual(conn=None):
+    """
+    Valor actual de la secuencia de cambios. Lo ven todos los workers y sube
+    con cada escritura de pagos, cargos, cierres o cuentas: sirve de sello
+    para cachés derivados de esas tablas (ver cierre.resumen_cierre).
+    """
+    with (conn or connection).cursor() as cursor:
+        cursor.execute(f"SELECT {_SQL_CAMBIO}")
+        return cursor.fetchone()[0]
+
+
+def refrescar(nombre, concurrently=True, conn=None):
+    """
+    REFRESH de una vista. Usa un advisory lock para que dos workers no
+    refresquen la misma vista al mismo tiempo. Devuelve False si otro proceso
+    ya la está refrescando.
+    """
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [f"matview:{nombre}"])
+        if not cursor.fetchone()[0]:
+            return False
+        try:
+            cursor.execute(f"SELECT now(), {_SQL_CAMBIO}")
+            inicio, cambio = cursor.fetchone()
+
+            modo = "CONCURRENTLY " if concurrently else ""
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {modo}public."{nombre}"')
+
+            # Si llegaron cambios mientras corría el REFRESH, sigue stale desde 'inicio'.
+            cursor.execute(
+                f"""
+                UPDATE vista_materializada_estado
+                   SET refrescada_en     = %s,
+                       cambio_refrescado = %s,
+                       stale_since       = CASE WHEN {_SQL_CAMBIO} > %s THEN %s ELSE NULL END
+                 WHERE nombre = %s
+                """,
+                [inicio, cambio, cambio, inicio, nombre],
+            )
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [f"matview:{nombre}"])
+    return True
+
+
+def refrescar_pendientes(conn=None):
+    """Refresca todas las vistas materializadas marcadas como stale."""
+    pendientes = list(
+        VistaMaterializadaEstado.objects
+        .filter(materializada=True, stale_since__isnull=False)
+        .values_list("nombre", flat=True)
+    )
+    return [nombre for nombre in pendientes if refrescar(nombre, conn=conn)]
+
+
+def _marcar_stale():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT nextval('{SECUENCIA_CAMBIOS}')")
+        cursor.execute(
+            """
+            UPDATE vista_materializada_estado
+               SET stale_since = now()
+             WHERE materializada AND stale_since IS NULL
+            """
+        )
+
+
+def on_escritura(sender, **kwargs):
+    """Receiver de post_save / post_delete de los modelos que alimentan los reportes."""
+    if not es_postgres():
+        return
+    transaction.on_commit(_marcar_stale)
+
+
+def conectar_signals():
+    from cargos.models import Cargo
+    from pagos.models import Pago
+    from pagos_cargos.models import PagoCargos
+    from .models import CierreAnual, Cuentahabiente
+
+    for modelo in (Pago, PagoCargos, Cargo, CierreAnual, Cuentahabiente):
+        uid = f"matview-{modelo._meta.label_lower}"
+        post_save.connect(on_escritura, sender=modelo, dispatch_uid=f"{uid}-save")
+        post_delete.connect(on_escritura, sender=modelo, dispatch_uid=f"{uid}-delete")
+
+
+# ─── Viewsets ────────────────────────────────────────────────────────────────
+
+_estados = {}  # tabla -> (expira, (stale_since, refrescada_en) | None)
+
+
+def estado_vista(tabla):
+    """
+    (stale_since, refrescada_en) de la vista, o None si no está materializada.
+    Se guarda en memoria MATVIEW_SETTINGS["ESTADO_CACHE_TTL"] segundos: las
+    cabeceras son informativas y no ameritan una consulta por respuesta.
+    """
+    ahora = time.monotonic()
+    guardado = _estados.get(tabla)
+    if guardado and guardado[0] > ahora:
+        return guardado[1]
+    estado = (
+        VistaMaterializadaEstado.objects
+        .filter(nombre=tabla, materializada=True)
+        .values_list("stale_since", "refrescada_en")
+        .first()
+    )
+    _estados[tabla] = (ahora + _conf("ESTADO_CACHE_TTL", 5), estado)
+    return estado
+
+
+class VistaMaterializadaMixin:
+    """
+    Agrega X-Stale-Since / X-Refreshed-At a las respuestas de los viewsets
+    que leen de una vista materializada (estado cacheado, ver estado_vista).
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        tabla = self.get_serializer_class().Meta.model._meta.db_table
+        if tabla not in VISTAS_MATERIALIZADAS or not es_postgres():
+            return response
+
+        estado = estado_vista(tabla)
+        if estado:
+            stale_since, refrescada_en = estado
+            if stale_since:
+                response[HEADER_STALE_SINCE] = stale_since.isoformat()
+            if refrescada_en:
+                response[HEADER_REFRESHED_AT] = refrescada_en.isoformat()
+        return response
@@ -0,0 +1,112 @@
+from django.db import migrations, models
+
+# Copia congelada de materialized.py al momento de esta migración (no se
+# importa el código de la app: puede cambiar después).
+# nombre de la vista -> llave única (requerida por CONCURRENTLY) e índices extra
+VISTAS = {
+    "vista_pagos":            {"unique": ["id"],                "indices": [["numero_contrato", "anio"]]},
+    "vista_deudores":         {"unique": ["id_cuentahabiente"], "indices": [["monto_total"]]},
+    "r_cuentahabientes":      {"unique": ["id_cuentahabiente"], "indices": [["numero_contrato"]]},
+    "estado_cuenta_new":      {"unique": ["id"],                "indices": [["numero_contrato", "anio"]]},
+    "reporte_cargos":         {"unique": ["id"],                "indices": [["numero_contrato", "fecha_cargo"]]},
+    "reporte_padron_general": {"unique": ["id"],                "indices": [["numero_contrato", "anio_reporte"]]},
+}
+
+# Contador de escrituras para las vistas materializadas (materialized.py):
+# nextval no toma locks de fila, así las escrituras no se pelean una fila
+# de vista_materializada_estado.
+SECUENCIA = "vista_materializada_cambio_seq"
+
+
+def crear_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SECUENCIA}")
+
+
+def borrar_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SECUENCIA}")
+
+
+def _tipo_relacion(cursor, nombre):
+    cursor.execute(
+        "SELECT relkind FROM pg_class "
+        "WHERE relname = %s AND relnamespace = 'public'::regnamespace",
+        [nombre],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def materializar_vistas(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for nombre, conf in VISTAS.items():
+            if _tipo_relacion(cursor, nombre) != "v":
+                continue
+            cursor.execute(f'ALTER VIEW public."{nombre}" RENAME TO "{nombre}_base"')
+            cursor.execute(
+                f'CREATE MATERIALIZED VIEW public."{nombre}" AS SELECT * FROM public."{nombre}_base"'
+            )
+            cursor.execute(
+                f'CREATE UNIQUE INDEX "{nombre}_mv_uniq" ON public."{nombre}" '
+                f'({", ".join(conf["unique"])})'
+            )
+            for i, columnas in enumerate(conf["indices"]):
+                cursor.execute(
+                    f'CREATE INDEX "{nombre}_mv_idx{i}" ON public."{nombre}" ({", ".join(columnas)})'
+                )
+            cursor.execute(
+                """
+                INSERT INTO vista_materializada_estado (nombre, materializada, refrescada_en)
+                VALUES (%s, TRUE, now())
+                ON CONFLICT (nombre) DO UPDATE
+                   SET materializada = TRUE, stale_since = NULL, refrescada_en = now()
+                """,
+                [nombre],
+            )
+
+
+def revertir_vistas(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for nombre in VISTAS:
+            if _tipo_relacion(cursor, nombre) != "m":
+                continue
+            cursor.execute(f'DROP MATERIALIZED VIEW public."{nombre}"')
+            cursor.execute(f'ALTER VIEW public."{nombre}_base" RENAME TO "{nombre}"')
+            cursor.execute(
+                "UPDATE vista_materializada_estado "
+                "SET materializada = FALSE, stale_since = NULL WHERE nombre = %s",
+                [nombre],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentahabientes', '0016_merge_20260402_0002'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VistaMaterializadaEstado',
+            fields=[
+                ('nombre', models.CharField(max_length=63, primary_key=True, serialize=False)),
+                ('materializada', models.BooleanField(default=False)),
+                ('stale_since', models.DateTimeField(blank=True, null=True)),
+                ('cambio_refrescado', models.BigIntegerField(default=0)),
+                ('refrescada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'vista_materializada_estado',
+            },
+        ),
+        migrations.RunPython(crear_secuencia, borrar_secuencia),
+        # Solo convierte las vistas que existan en la BD (no-op en BDs nuevas / de prueba)
+        migrations.RunPython(materializar_vistas, revertir_vistas),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+
+def marcar_ejecutados(apps, schema_editor):
+    CierreAnual = apps.get_model("cuentahabientes", "CierreAnual")
+    CierreAnual.objects.filter(ejecutado=True).update(estado="completado")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentahabientes', '0017_vistamaterializadaestado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierreanual',
+            name='actualizado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='cargos_generados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='cuentas_con_pagos_anticipados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='cuentas_procesadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='iniciado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='lotes_procesados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='tamano_lote',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='tope_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='total_cuentas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cierreanual',
+            name='ultimo_id_procesado',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(marcar_ejecutados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def llenar_saldos(apps, schema_editor):
+    # Mismo cálculo que `manage.py rebuild_saldos`: sin esto
+    # /estado-cuenta-resumen/ sale vacío hasta que alguien lo corra
+    from cuentahabientes import saldos
+
+    saldos.recalcular()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentahabientes', '0018_cierreanual_progreso'),
+        ('cargos', '0010_cargo_descripcion'),
+        ('pagos', '0004_rename_coment_pago_comentarios'),
+        ('pagos_cargos', '0005_alter_pagocargos_fecha_pago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuentahabienteSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('num_pagos', models.PositiveIntegerField(default=0)),
+                ('total_pagado_cargos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cargos_pendientes', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ultimo_pago', models.DateField(blank=True, null=True)),
+                ('saldo_pendiente', models.IntegerField(blank=True, null=True)),
+                ('estatus', models.CharField(blank=True, max_length=20, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cuentahabiente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='cuentahabientes.cuentahabiente')),
+            ],
+            options={
+                'db_table': 'cuentahabiente_saldo',
+                'indexes': [models.Index(fields=['anio', 'estatus'], name='ch_saldo_anio_estatus_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cuentahabiente', 'anio'), name='cuentahabiente_saldo_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# unaccent() es STABLE: para poder indexar se envuelve en funciones IMMUTABLE
+# con el diccionario calificado (patrón recomendado por PostgreSQL).
+FUNCIONES = """
+CREATE OR REPLACE FUNCTION sicap_busqueda(texto text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, texto)) $$;
+
+CREATE OR REPLACE FUNCTION sicap_nombre_busqueda(nombres text, ap text, am text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT sicap_busqueda(coalesce(nombres, '') || ' ' || coalesce(ap, '') || ' ' || coalesce(am, '')) $$;
+"""
+
+
+def _tablas(apps, schema_editor):
+    q = schema_editor.quote_name
+    return (
+        q(apps.get_model("cuentahabientes", "Cuentahabiente")._meta.db_table),
+        q(apps.get_model("colonia", "Colonia")._meta.db_table),
+    )
+
+
+def crear(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    cuenta, colonia = _tablas(apps, schema_editor)
+    schema_editor.execute(FUNCIONES)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS cuentahabiente_nombre_trgm ON {cuenta} "
+        f"USING gin (sicap_nombre_busqueda(nombres, ap, am) gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS cuentahabiente_telefono_trgm ON {cuenta} "
+        f"USING gin (telefono gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS colonia_nombre_trgm ON {colonia} "
+        f"USING gin (sicap_busqueda(nombre_colonia) gin_trgm_ops)"
+    )
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for indice in ("cuentahabiente_nombre_trgm", "cuentahabiente_telefono_trgm", "colonia_nombre_trgm"):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {indice}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS sicap_nombre_busqueda(text, text, text)")
+    schema_editor.execute("DROP FUNCTION IF EXISTS sicap_busqueda(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('colonia', '0001_initial'),
+        ('cuentahabientes', '0020_cuentahabientesaldo'),
+    ]
+
+    operations = [
+        # Ambas operaciones no hacen nada fuera de PostgreSQL
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(crear, borrar),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Prefijos del autocompletado (autocompletar.py): LIKE 'abc%' sobre el
+# nombre normalizado en ambos órdenes. text_pattern_ops permite usar el
+# índice con LIKE sin importar la collation de la BD.
+INDICES = {
+    "cuentahabiente_nombre_prefijo": "sicap_nombre_busqueda(nombres, ap, am)",
+    "cuentahabiente_apellidos_prefijo": "sicap_nombre_busqueda(ap, am, nombres)",
+}
+
+
+def crear(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    tabla = schema_editor.quote_name(apps.get_model("cuentahabientes", "Cuentahabiente")._meta.db_table)
+    for nombre, expresion in INDICES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} (({expresion}) text_pattern_ops)"
+        )
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nombre in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentahabientes', '0021_busqueda_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, borrar),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+
+MINIMO = 2000
+LOTE = 100
+
+
+def llenar(apps, schema_editor):
+    """Huecos del padrón >= MINIMO y el primer bloque de números nuevos (contratos.py)."""
+    Cuentahabiente = apps.get_model("cuentahabientes", "Cuentahabiente")
+    FolioContrato = apps.get_model("cuentahabientes", "FolioContrato")
+    ContratoLibre = apps.get_model("cuentahabientes", "ContratoLibre")
+
+    usados = set(
+        Cuentahabiente.objects.filter(numero_contrato__gte=MINIMO)
+        .values_list("numero_contrato", flat=True)
+    )
+    siguiente = max([MINIMO - 1, *usados]) + 1
+    libres = [n for n in range(MINIMO, siguiente) if n not in usados]
+    libres += range(siguiente, siguiente + LOTE)
+    ContratoLibre.objects.bulk_create(
+        [ContratoLibre(numero=n) for n in libres], batch_size=5000
+    )
+    FolioContrato.objects.create(serie="cuentahabiente", siguiente=siguiente + LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentahabientes', '0022_autocomplete_prefijos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContratoLibre',
+            fields=[
+                ('numero', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'contrato_libre',
+            },
+        ),
+        migrations.CreateModel(
+            name='FolioContrato',
+            fields=[
+                ('serie', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('siguiente', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'folio_contrato',
+            },
+        ),
+        migrations.RunPython(llenar, migrations.RunPython.noop),
+    ]
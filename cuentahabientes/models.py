@@ -35,6 +35,17 @@ def __str__(self):
     return f"{self.nombres} {self.ap} {self.am}"
 
 class CierreAnual(models.Model):
+    ESTADO_PENDIENTE  = "pendiente"
+    ESTADO_EN_PROCESO = "en_proceso"
+    ESTADO_COMPLETADO = "completado"
+    ESTADO_ERROR      = "error"
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_EN_PROCESO, 'En proceso'),
+        (ESTADO_COMPLETADO, 'Completado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
     anio = models.IntegerField(unique=True)
     ejecutado = models.BooleanField(default=False)
     fecha = models.DateField(auto_now_add=True)
@@ -44,5 +55,106 @@ class CierreAnual(models.Model):
         related_name="cierres_anuales"
     )
 
+    # ── Progreso del cierre por lotes (checkpoint por lote) ──
+    estado = models.CharField(max_length=12, choices=ESTADOS, default=ESTADO_PENDIENTE)
+    ultimo_id_procesado = models.IntegerField(default=0)  # último id_cuentahabiente ya cerrado
+    tope_id = models.IntegerField(null=True, blank=True)  # último id_cuentahabiente al iniciar
+    total_cuentas = models.PositiveIntegerField(default=0)
+    cuentas_procesadas = models.PositiveIntegerField(default=0)
+    cargos_generados = models.PositiveIntegerField(default=0)
+    cuentas_con_pagos_anticipados = models.PositiveIntegerField(default=0)
+    lotes_procesados = models.PositiveIntegerField(default=0)
+    tamano_lote = models.PositiveIntegerField(null=True, blank=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
     class Meta:
-        db_table = "cierre_anual"
\ No newline at end of file
+        db_table = "cierre_anual"
+
+class CuentahabienteSaldo(models.Model):
+    """
+    Resumen por cuenta y año, mantenido en la misma transacción que cada
+    escritura (ver cuentahabientes/saldos.py) para no recalcular desde
+    pagos / pagos_cargos / cargos en cada lectura.
+    - total_pagado / num_pagos: pagos de tarifa con ese `anio`.
+    - total_pagado_cargos:      pagos de cargos con fecha_pago en ese año.
+    - cargos_pendientes:        saldo de cargos activos con fecha_cargo en ese año.
+    - saldo_pendiente / estatus: foto de la cuenta; en el año vigente siguen
+                                 a la cuenta, en años cerrados quedan como
+                                 estaban al cierre.
+    """
+    cuentahabiente = models.ForeignKey(
+        Cuentahabiente, on_delete=models.CASCADE, related_name="saldos"
+    )
+    anio = models.IntegerField()
+    total_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    num_pagos = models.PositiveIntegerField(default=0)
+    total_pagado_cargos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cargos_pendientes = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ultimo_pago = models.DateField(null=True, blank=True)
+    saldo_pendiente = models.IntegerField(null=True, blank=True)
+    estatus = models.CharField(max_length=20, null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "cuentahabiente_saldo"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cuentahabiente", "anio"], name="cuentahabiente_saldo_unico"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["anio", "estatus"], name="ch_saldo_anio_estatus_idx"),
+        ]
+
+class VistaMaterializadaEstado(models.Model):
+    """
+    Estado de las vistas de reporte convertidas a MATERIALIZED VIEW.
+    - stale_since:       primer cambio (pagos, cargos, cierres) aún no reflejado.
+    - cambio_refrescado: valor de vista_materializada_cambio_seq que cubrió el
+                         último REFRESH; si la secuencia avanzó mientras
+                         corría, la vista sigue stale.
+    """
+    nombre = models.CharField(max_length=63, primary_key=True)
+    materializada = models.BooleanField(default=False)
+    stale_since = models.DateTimeField(null=True, blank=True)
+    cambio_refrescado = models.BigIntegerField(default=0)
+    refrescada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "vista_materializada_estado"
+
+    def __str__(self):
+        return self.nombre
+
+
+class FolioContrato(models.Model):
+    """
+    Siguiente numero_contrato nunca entregado (contratos.py). Una sola fila
+    por serie; se bloquea con SELECT ... FOR UPDATE solo al reponer el pool
+    de ContratoLibre, no en cada alta.
+    """
+    serie = models.CharField(max_length=20, primary_key=True)
+    siguiente = models.IntegerField()
+
+    class Meta:
+        db_table = "folio_contrato"
+
+    def __str__(self):
+        return f"{self.serie}: {self.siguiente}"
+
+
+class ContratoLibre(models.Model):
+    """
+    Números de contrato disponibles: huecos del padrón (bajas) y el bloque
+    reservado por adelantado desde FolioContrato. Cada alta toma el menor
+    con SELECT ... FOR UPDATE SKIP LOCKED y lo borra.
+    """
+    numero = models.IntegerField(primary_key=True)
+
+    class Meta:
+        db_table = "contrato_libre"
+
+    def __str__(self):
+        return str(self.numero)
@@ -0,0 +1,299 @@
+# cuentahabientes/saldos.py
+"""
+Resumen denormalizado por cuenta y año (tabla cuentahabiente_saldo).
+
+Se mantiene en la misma transacción que la escritura que lo cambia:
+- Pago de tarifa (PagoCreateSerializer.registrar, también en /pago/bulk/):
+  suma al año del pago y actualiza la foto de saldo/estatus.
+- Pago de cargos (PagarCargoView): suma al año de fecha_pago y descuenta
+  cargos_pendientes del año de cada cargo.
+- Alta/edición de cuenta, CRUD de cargos y ediciones de pagos
+  (SaldosMixin): recalculan la cuenta desde pagos / pagos_cargos / cargos
+  (el saldo inicial de un cargo puede venir de la BD, no del objeto en
+  memoria).
+- Cierre anual (python, sql y lotes): recalcula el año nuevo de las cuentas
+  cerradas.
+- Reconstrucción: la migración 0020 llena la tabla al crearla,
+  `manage.py rebuild_saldos` la reconstruye y con --verificar solo reporta
+  diferencias contra los datos crudos.
+
+Los incrementos son UPDATE con F(); si la fila (cuenta, año) todavía no
+existe se recalcula desde los datos crudos, que ya incluyen la escritura
+en curso. Ese recálculo escribe totales absolutos, así que los pagos
+(PagoCreateSerializer y PagarCargoView) bloquean antes la cuenta con
+select_for_update: dos primeras escrituras de la misma cuenta no se pisan.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractYear, Greatest
+from django.utils import timezone
+
+from cargos.models import Cargo
+from pagos.models import Pago
+from pagos_cargos.models import PagoCargos
+from .models import CierreAnual, Cuentahabiente, CuentahabienteSaldo
+
+CAMPOS_TOTALES = [
+    "total_pagado", "num_pagos", "total_pagado_cargos", "cargos_pendientes", "ultimo_pago",
+]
+CAMPOS_ESTADO = ["saldo_pendiente", "estatus"]
+
+CEROS = {
+    "total_pagado": Decimal("0"),
+    "num_pagos": 0,
+    "total_pagado_cargos": Decimal("0"),
+    "cargos_pendientes": Decimal("0"),
+    "ultimo_pago": None,
+}
+
+
+def leer_cierres():
+    """
+    {anio: ejecutado} de los cierres ejecutados (True) o a medias, por lotes
+    en proceso o con error (False). Los pagos la leen dentro de su
+    transacción, con la cuenta ya bloqueada.
+    """
+    return dict(
+        CierreAnual.objects.filter(
+            Q(ejecutado=True)
+            | Q(estado__in=[CierreAnual.ESTADO_EN_PROCESO, CierreAnual.ESTADO_ERROR])
+        ).values_list("anio", "ejecutado")
+    )
+
+
+def anio_vigente(cierres=None):
+    """
+    Año al que corresponde Cuentahabiente.saldo_pendiente: el último cierre
+    ejecutado. `cierres`: el resultado de leer_cierres() si ya se tiene.
+    """
+    cierres = leer_cierres() if cierres is None else cierres
+    ejecutados = [anio for anio, ejecutado in cierres.items() if ejecutado]
+    return max(ejecutados, default=timezone.localtime().year)
+
+
+def _fecha(valor):
+    # Misma conversión que al guardar un DateField (datetime aware -> fecha local)
+    return DateField().to_python(valor)
+
+
+def _por_anios(campo, anios):
+    filtro = Q()
+    for anio in anios:
+        filtro |= Q(**{f"{campo}__gte": date(anio, 1, 1), f"{campo}__lt": date(anio + 1, 1, 1)})
+    return filtro
+
+
+def _alcance(qs, cuenta_ids, anios, campo_fecha=None):
+    if cuenta_ids is not None:
+        qs = qs.filter(cuentahabiente_id__in=cuenta_ids)
+    if anios is not None:
+        qs = qs.filter(_por_anios(campo_fecha, anios) if campo_fecha else Q(anio__in=anios))
+    return qs
+
+
+def calcular(cuenta_ids=None, anios=None):
+    """{(cuenta_id, anio): totales} desde los datos crudos; tres consultas agregadas."""
+    totales = defaultdict(lambda: dict(CEROS))
+
+    def ultimo(fila, fecha):
+        if fecha and (fila["ultimo_pago"] is None or fecha > fila["ultimo_pago"]):
+            fila["ultimo_pago"] = fecha
+
+    pagos = (
+        _alcance(Pago.objects.all(), cuenta_ids, anios)
+        .order_by()
+        .values("cuentahabiente_id", "anio")
+        .annotate(total=Sum("monto_recibido"), n=Count("pk"), ultimo=Max("fecha_pago"))
+    )
+    for p in pagos:
+        fila = totales[(p["cuentahabiente_id"], p["anio"])]
+        fila["total_pagado"] = Decimal(p["total"] or 0)
+        fila["num_pagos"] = p["n"]
+        ultimo(fila, p["ultimo"])
+
+    pagos_cargos = (
+        _alcance(PagoCargos.objects.all(), cuenta_ids, anios, "fecha_pago")
+        .annotate(anio=ExtractYear("fecha_pago"))
+        .order_by()
+        .values("cuentahabiente_id", "anio")
+        .annotate(total=Sum("monto_recibido"), ultimo=Max("fecha_pago"))
+    )
+    for p in pagos_cargos:
+        fila = totales[(p["cuentahabiente_id"], p["anio"])]
+        fila["total_pagado_cargos"] = p["total"] or Decimal("0")
+        ultimo(fila, p["ultimo"])
+
+    cargos = (
+        _alcance(Cargo.objects.filter(activo=True), cuenta_ids, anios, "fecha_cargo")
+        .annotate(anio=ExtractYear("fecha_cargo"))
+        .order_by()
+        .values("cuentahabiente_id", "anio")
+        .annotate(pendiente=Sum("saldo_restante_cargo"))
+    )
+    for c in cargos:
+        totales[(c["cuentahabiente_id"], c["anio"])]["cargos_pendientes"] = c["pendiente"] or Decimal("0")
+
+    return dict(totales)
+
+
+def _estados(cuenta_ids, anios, vigente):
+    """{cuenta_id: (saldo_pendiente, deuda)} si el año vigente está en el alcance."""
+    if anios is not None and vigente not in anios:
+        return {}
+    qs = Cuentahabiente.objects.all()
+    if cuenta_ids is not None:
+        qs = qs.filter(pk__in=cuenta_ids)
+    return {pk: (saldo, deuda) for pk, saldo, deuda in qs.values_list("pk", "saldo_pendiente", "deuda")}
+
+
+def recalcular(cuenta_ids=None, anios=None, vigente=None, lote=1000):
+    """
+    Reescribe las filas del alcance (cuentas x años; None = todas) desde los
+    datos crudos. Debe llamarse dentro de transaction.atomic(). Devuelve el
+    número de filas escritas.
+    """
+    vigente = anio_vigente() if vigente is None else vigente
+    totales = calcular(cuenta_ids, anios)
+    estados = _estados(cuenta_ids, anios, vigente)
+
+    # Filas del alcance que se quedaron sin movimientos vuelven a cero
+    _alcance(CuentahabienteSaldo.objects.all(), cuenta_ids, anios).update(
+        **CEROS, actualizado_en=timezone.now()
+    )
+
+    con_estado, sin_estado = [], []
+    for cuenta_id, anio in totales.keys() | {(pk, vigente) for pk in estados}:
+        fila = CuentahabienteSaldo(
+            cuentahabiente_id=cuenta_id, anio=anio, **totales.get((cuenta_id, anio), CEROS)
+        )
+        if anio == vigente and cuenta_id in estados:
+            fila.saldo_pendiente, fila.estatus = estados[cuenta_id]
+            con_estado.append(fila)
+        else:
+            sin_estado.append(fila)
+
+    for filas, campos in ((con_estado, CAMPOS_TOTALES + CAMPOS_ESTADO), (sin_estado, CAMPOS_TOTALES)):
+        if filas:
+            CuentahabienteSaldo.objects.bulk_create(
+                filas,
+                batch_size=lote,
+                update_conflicts=True,
+                unique_fields=["cuentahabiente", "anio"],
+                update_fields=campos + ["actualizado_en"],
+            )
+    return len(con_estado) + len(sin_estado)
+
+
+def recalcular_cuenta(*cuenta_ids):
+    """Todas las filas de una o varias cuentas (altas, cargos, ediciones de pagos)."""
+    return recalcular(cuenta_ids=[pk for pk in cuenta_ids if pk is not None])
+
+
+def verificar(cuenta_ids=None, anios=None, vigente=None):
+    """
+    Compara la tabla contra los datos crudos sin escribir nada. Devuelve una
+    lista de {"cuentahabiente_id", "anio", "campos": {campo: (esperado, actual)}}.
+    """
+    vigente = anio_vigente() if vigente is None else vigente
+    esperado = calcular(cuenta_ids, anios)
+    estados = _estados(cuenta_ids, anios, vigente)
+    actual = {
+        (f.cuentahabiente_id, f.anio): f
+        for f in _alcance(CuentahabienteSaldo.objects.all(), cuenta_ids, anios)
+    }
+
+    diferencias = []
+    claves = esperado.keys() | actual.keys() | {(pk, vigente) for pk in estados}
+    for cuenta_id, anio in sorted(claves):
+        totales = esperado.get((cuenta_id, anio), CEROS)
+        fila = actual.get((cuenta_id, anio))
+        campos = {}
+        for campo in CAMPOS_TOTALES:
+            valor = getattr(fila, campo) if fila else CEROS[campo]
+            if valor != totales[campo]:
+                campos[campo] = (totales[campo], valor)
+        if anio == vigente and cuenta_id in estados:
+            for campo, valor_esperado in zip(CAMPOS_ESTADO, estados[cuenta_id]):
+                valor = getattr(fila, campo) if fila else None
+                if valor != valor_esperado:
+                    campos[campo] = (valor_esperado, valor)
+        if campos:
+            diferencias.append({"cuentahabiente_id": cuenta_id, "anio": anio, "campos": campos})
+    return diferencias
+
+
+# ─── Incrementos en las escrituras ──────────────────────────────────────────
+
+def _mas_reciente(fecha):
+    fecha = Value(fecha, output_field=DateField())
+    return Greatest(Coalesce(F("ultimo_pago"), fecha), fecha)
+
+
+def _aplicar(cuenta_id, vigente, cambios_por_anio):
+    for anio, cambios in sorted(cambios_por_anio.items()):
+        filas = CuentahabienteSaldo.objects.filter(
+            cuentahabiente_id=cuenta_id, anio=anio
+        ).update(**cambios, actualizado_en=timezone.now())
+        if not filas:
+            recalcular(cuenta_ids=[cuenta_id], anios=[anio], vigente=vigente)
+
+
+def registrar_pago(pago, cuenta, cierres=None):
+    """Después de crear el Pago y guardar saldo/deuda de la cuenta bloqueada."""
+    vigente = anio_vigente(cierres)
+    cambios = defaultdict(dict)
+    cambios[pago.anio].update(
+        total_pagado=F("total_pagado") + pago.monto_recibido,
+        num_pagos=F("num_pagos") + 1,
+        ultimo_pago=_mas_reciente(_fecha(pago.fecha_pago)),
+    )
+    cambios[vigente].update(saldo_pendiente=cuenta.saldo_pendiente, estatus=cuenta.deuda)
+    _aplicar(cuenta.pk, vigente, cambios)
+
+
+def registrar_pagos_cargo(cuenta_id, pagos):
+    """`pagos`: PagoCargos recién creados, con su cargo cargado."""
+    if not pagos:
+        return
+    fecha = _fecha(pagos[0].fecha_pago)
+
+    por_anio_cargo = defaultdict(Decimal)
+    for p in pagos:
+        por_anio_cargo[p.cargo.fecha_cargo.year] += p.monto_recibido
+
+    cambios = defaultdict(dict)
+    cambios[fecha.year].update(
+        total_pagado_cargos=F("total_pagado_cargos") + sum(por_anio_cargo.values()),
+        ultimo_pago=_mas_reciente(fecha),
+    )
+    for anio, monto in por_anio_cargo.items():
+        cambios[anio]["cargos_pendientes"] = F("cargos_pendientes") - monto
+    # Sin cambios de saldo/estatus: el año vigente solo hace falta si hay que recalcular
+    _aplicar(cuenta_id, None, cambios)
+
+
+class SaldosMixin:
+    """
+    Para ModelViewSet de modelos con `cuentahabiente`: altas, ediciones y
+    bajas recalculan el resumen de la cuenta (y de la anterior si cambió).
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            obj = serializer.save()
+            recalcular_cuenta(obj.cuentahabiente_id)
+
+    def perform_update(self, serializer):
+        anterior = serializer.instance.cuentahabiente_id
+        with transaction.atomic():
+            obj = serializer.save()
+            recalcular_cuenta(anterior, obj.cuentahabiente_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            recalcular_cuenta(instance.cuentahabiente_id)
@@ -1,12 +1,15 @@
 # cuentahabientes/serializers.py
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Max
 from decimal import Decimal
 
 from rest_framework import serializers
 
 from cargos.models import Cargo, TipoCargo
-from .models import Cuentahabiente
+from . import contratos, saldos
+from .cierre import MODO_PYTHON, MODOS_CIERRE
+from .models import CierreAnual, Cuentahabiente, CuentahabienteSaldo
 
 class CuentahabienteSerializer(serializers.ModelSerializer):
     
@@ -49,6 +52,7 @@ class CuentahabienteSerializer(serializers.ModelSerializer):
 
         return value
     
+    @transaction.atomic
     def create(self, validated_data):
         """
         Al crear, establece saldo_pendiente = costo del servicio seleccionado.
@@ -57,18 +61,8 @@ class CuentahabienteSerializer(serializers.ModelSerializer):
 
         es_toma_nueva = validated_data.pop("es_toma_nueva", False)
 
-        # Generar numero de contrato a partir del 2000
-        ultimo_existente = set(
-            Cuentahabiente.objects
-            .filter(numero_contrato__gte=2000)
-            .values_list("numero_contrato", flat=True)
-        )
-
-        nuevo_numero = 2000
-        while nuevo_numero in ultimo_existente:
-            nuevo_numero += 1
-
-        validated_data["numero_contrato"] = nuevo_numero
+        # Primer numero de contrato libre a partir del 2000
+        validated_data["numero_contrato"] = contratos.asignar()
 
         srv = validated_data["servicio"]
         validated_data["saldo_pendiente"] = srv.costo
@@ -89,13 +83,22 @@ class CuentahabienteSerializer(serializers.ModelSerializer):
                 activo=True
             )
 
+        saldos.recalcular_cuenta(cuentahabiente.pk)
+        return cuentahabiente
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        validated_data.pop("es_toma_nueva", None)
+        cuentahabiente = super().update(instance, validated_data)
+        # deuda es editable: la foto de estatus del año vigente la sigue
+        saldos.recalcular_cuenta(cuentahabiente.pk)
         return cuentahabiente
 
 # cuentahabientes/serializers.py
 from rest_framework import serializers
 from .models_views import (VistaPagos,VistaHistorial,
                             VistaDeudores, VistaProgreso,
-                            EstadoCuenta, RCuentahabientes, EstadoCuentaResumen
+                            EstadoCuenta, RCuentahabientes
                             , VistaCargos, EstadoCuentaNew, ReporteCargos, ReportePadronGeneral
 )
 class VistaPagosSerializer(serializers.ModelSerializer):
@@ -145,8 +148,20 @@ class EstadoCuentaSerializer(serializers.ModelSerializer):
         ]
 
 class EstadoCuentaResumenSerializer(serializers.ModelSerializer):
+    """
+    Mismos campos que la vista estado_cuenta_resumen, leídos de
+    cuentahabiente_saldo (saldos.py) en lugar de recalcular desde los pagos.
+    """
+    ESTATUS = dict(Cuentahabiente.ESTATUS_DEUDA)
+
+    id_cuentahabiente = serializers.IntegerField(source="cuentahabiente_id", read_only=True)
+    numero_contrato = serializers.IntegerField(source="cuentahabiente.numero_contrato", read_only=True)
+    nombre_servicio = serializers.CharField(source="cuentahabiente.servicio.nombre", default=None, read_only=True)
+    estatus = serializers.SerializerMethodField()
+    saldo_pendiente = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
     class Meta:
-        model = EstadoCuentaResumen
+        model = CuentahabienteSaldo
         fields = [
             "id_cuentahabiente",
             "numero_contrato",
@@ -156,6 +171,12 @@ class EstadoCuentaResumenSerializer(serializers.ModelSerializer):
             "saldo_pendiente",
         ]
 
+    def get_estatus(self, obj):
+        if obj.cuentahabiente.servicio_id is None:
+            return "Sin servicio"
+        # Años sin foto (anteriores a rebuild_saldos): None
+        return self.ESTATUS.get(obj.estatus, obj.estatus)
+
 class RCuentahabientesSerializer(serializers.ModelSerializer):
     class Meta:
         model = RCuentahabientes
@@ -168,6 +189,30 @@ class CierreAnioSerializer(serializers.Serializer):
 
 class EjecutarCierreSerializer(CierreAnioSerializer):
     confirmar = serializers.BooleanField()
+    # "python": cálculo en Django | "sql": INSERT ... SELECT / UPDATE ... FROM en Postgres
+    modo = serializers.ChoiceField(choices=MODOS_CIERRE, default=MODO_PYTHON)
+    # Solo modo "lotes": cuentas por transacción
+    tamano_lote = serializers.IntegerField(required=False, min_value=50, max_value=10000)
+
+class CierreProgresoSerializer(serializers.ModelSerializer):
+    porcentaje = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CierreAnual
+        fields = (
+            "anio", "estado", "ejecutado", "fecha",
+            "total_cuentas", "cuentas_procesadas", "porcentaje",
+            "cargos_generados", "cuentas_con_pagos_anticipados",
+            "lotes_procesados", "tamano_lote", "ultimo_id_procesado", "tope_id",
+            "iniciado_en", "actualizado_en", "error",
+        )
+
+    def get_porcentaje(self, obj):
+        if obj.ejecutado:
+            return 100.0
+        if not obj.total_cuentas:
+            return 0.0
+        return round(min(obj.cuentas_procesadas / obj.total_cuentas, 1) * 100, 1)
 
 
 class VistaCargosSerializer(serializers.ModelSerializer):
@@ -239,4 +284,24 @@ class ReportePadronGeneralSerializer(serializers.ModelSerializer):
             "total_cargos_pendientes",
             "total_recaudado_global",
             "total_usuarios",
-        ]
\ No newline at end of file
+        ]
+
+class CuentahabienteSaldoSerializer(serializers.ModelSerializer):
+    numero_contrato = serializers.IntegerField(source="cuentahabiente.numero_contrato", read_only=True)
+
+    class Meta:
+        model  = CuentahabienteSaldo
+        fields = [
+            "id",
+            "cuentahabiente",
+            "numero_contrato",
+            "anio",
+            "total_pagado",
+            "num_pagos",
+            "total_pagado_cargos",
+            "cargos_pendientes",
+            "ultimo_pago",
+            "saldo_pendiente",
+            "estatus",
+            "actualizado_en",
+        ]
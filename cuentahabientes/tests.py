@@ -1,3 +1,825 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import openpyxl
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from calles.models import Calle
+from cargos.models import Cargo, TipoCargo
+from cobrador.jwt_utils import create_access_token
+from cobrador.models import Cobrador
+from cobrador.principal_cache import principal_cache
+from colonia.models import Colonia
+from corte import recaudacion
+from corte.models import RecaudacionDiaria
+from descuento.models import Descuento
+from pagos.models import Pago
+from servicio.models import Servicio
+from sicap_backend.pagination import KeysetPagination
+
+from . import contratos, materialized, saldos
+from .busqueda import rangos_contrato
+from .cierre import (
+    ejecutar_cierre_python, ejecutar_cierre_sql, preparar_cierre_por_lotes, procesar_lote,
+    resumen_cierre,
+)
+from .models import (
+    CierreAnual, ContratoLibre, Cuentahabiente, CuentahabienteSaldo, FolioContrato,
+    VistaMaterializadaEstado,
+)
+from .models_views import VistaPagos
+from .serializers import CuentahabienteSerializer
+from .views import CuentahabienteViewSet
+
+
+class PadronCierreMixin:
+    """Padrón generado (300 cuentas, pagos anticipados, descuentos) para probar el cierre."""
+
+    ANIO_NUEVO = 2026
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(2026)
+
+        cobrador = Cobrador.objects.create(
+            nombre="Test", apellidos="Cierre", email="cierre@test.mx",
+            usuario="cierre", password="secreto123",
+        )
+        colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        servicios = [
+            Servicio.objects.create(nombre="Doméstico", costo=Decimal("720.00")),
+            Servicio.objects.create(nombre="Comercial", costo=Decimal("1450.50")),
+        ]
+        descuentos = [
+            Descuento.objects.create(nombre_descuento="INAPAM", porcentaje=Decimal("360.00")),
+            Descuento.objects.create(nombre_descuento="Promoción Anual", porcentaje=Decimal("60.00")),
+            Descuento.objects.create(nombre_descuento="Inactivo", porcentaje=Decimal("99.00"), activo=False),
+        ]
+
+        for n in range(300):
+            ch = Cuentahabiente.objects.create(
+                numero_contrato=1000 + n,
+                nombres=f"Nombre{n}", ap="Ap", am="Am", telefono="0",
+                colonia=colonia,
+                servicio=rnd.choice(servicios + [None]),
+                saldo_pendiente=rnd.choice([0, 0, 120, 360, 720, -40]),
+            )
+            for _ in range(rnd.randint(0, 3)):
+                Pago.objects.create(
+                    cuentahabiente=ch,
+                    cobrador=cobrador,
+                    descuento=rnd.choice(descuentos + [None, None]),
+                    fecha_pago=date(cls.ANIO_NUEVO, rnd.randint(1, 3), rnd.randint(1, 28)),
+                    monto_recibido=rnd.choice([60, 100, 300, 720]),
+                    monto_descuento=0,
+                    mes="01",
+                    anio=cls.ANIO_NUEVO,
+                )
+
+        cls.cobrador = cobrador
+        cls.tipo_cierre = TipoCargo.objects.create(
+            nombre="CIERRE_ANUAL", monto=Decimal("0.00"), automatico=True,
+        )
+
+    def _estado_final(self):
+        cuentas = list(
+            Cuentahabiente.objects.order_by("id_cuentahabiente")
+            .values_list("id_cuentahabiente", "saldo_pendiente", "deuda")
+        )
+        cargos = sorted(
+            Cargo.objects.filter(tipo_cargo=self.tipo_cierre)
+            .values_list("cuentahabiente_id", "saldo_restante_cargo", "fecha_cargo", "activo")
+        )
+        return cuentas, cargos
+
+
+@skipUnless(connection.vendor == "postgresql", "El cierre set-based requiere PostgreSQL")
+class CierreAnualParidadTests(PadronCierreMixin, TestCase):
+    """El cierre en SQL debe dejar exactamente lo mismo que el cierre en Python."""
+
+    def _ejecutar(self, funcion):
+        with transaction.atomic():
+            resumen = funcion(self.ANIO_NUEVO, self.tipo_cierre)
+            cuentas, cargos = self._estado_final()
+            transaction.set_rollback(True)
+        return resumen, cuentas, cargos
+
+    def test_sql_igual_a_python(self):
+        resumen_py, cuentas_py, cargos_py = self._ejecutar(ejecutar_cierre_python)
+        resumen_sql, cuentas_sql, cargos_sql = self._ejecutar(ejecutar_cierre_sql)
+
+        self.assertEqual(resumen_sql, resumen_py)
+        self.assertEqual(cuentas_sql, cuentas_py)
+        self.assertEqual(cargos_sql, cargos_py)
+        self.assertGreater(resumen_py["cargos_generados"], 0)
+        self.assertGreater(resumen_py["cuentas_con_pagos_anticipados"], 0)
+
+
+class CierrePorLotesTests(PadronCierreMixin, TestCase):
+    """El cierre por lotes debe dar lo mismo que el cierre completo, aun reanudando."""
+
+    def _cierre_en_proceso(self, tamano_lote):
+        cierre = CierreAnual.objects.create(anio=self.ANIO_NUEVO, ejecutado_por=self.cobrador)
+        return preparar_cierre_por_lotes(cierre, self.cobrador, tamano_lote)
+
+    def _esperado(self):
+        with transaction.atomic():
+            resumen = ejecutar_cierre_python(self.ANIO_NUEVO, self.tipo_cierre)
+            estado = self._estado_final()
+            transaction.set_rollback(True)
+        return resumen, estado
+
+    def test_lotes_igual_a_python(self):
+        resumen, estado = self._esperado()
+
+        cierre = self._cierre_en_proceso(tamano_lote=70)
+        while procesar_lote(cierre.pk, self.tipo_cierre, 70):
+            pass
+        cierre.refresh_from_db()
+
+        self.assertEqual(self._estado_final(), estado)
+        self.assertTrue(cierre.ejecutado)
+        self.assertEqual(cierre.estado, CierreAnual.ESTADO_COMPLETADO)
+        self.assertEqual(cierre.lotes_procesados, 5)
+        self.assertEqual(cierre.cuentas_procesadas, resumen["cuentas_procesadas"])
+        self.assertEqual(cierre.cargos_generados, resumen["cargos_generados"])
+        self.assertEqual(
+            cierre.cuentas_con_pagos_anticipados, resumen["cuentas_con_pagos_anticipados"]
+        )
+        # Cada lote deja cuentahabiente_saldo del año nuevo al día
+        self.assertEqual(
+            CuentahabienteSaldo.objects.filter(anio=self.ANIO_NUEVO).count(), 300
+        )
+        self.assertEqual(saldos.verificar(anios=[self.ANIO_NUEVO], vigente=self.ANIO_NUEVO), [])
+
+    def test_reanudar_tras_fallo_no_duplica_cargos(self):
+        _, estado = self._esperado()
+
+        cierre = self._cierre_en_proceso(tamano_lote=100)
+        self.assertTrue(procesar_lote(cierre.pk, self.tipo_cierre, 100))
+
+        # El segundo lote truena después de crear sus cargos: se revierte completo
+        with mock.patch("cuentahabientes.cierre.Cuentahabiente.objects.bulk_update",
+                        side_effect=RuntimeError("se cayó el worker")):
+            with self.assertRaises(RuntimeError):
+                procesar_lote(cierre.pk, self.tipo_cierre, 100)
+
+        cierre.refresh_from_db()
+        self.assertEqual(cierre.lotes_procesados, 1)
+        self.assertEqual(cierre.cuentas_procesadas, 100)
+
+        while procesar_lote(cierre.pk, self.tipo_cierre, 100):
+            pass
+
+        self.assertEqual(self._estado_final(), estado)
+
+    def test_cuenta_nueva_a_medio_cierre_no_se_cierra(self):
+        cierre = self._cierre_en_proceso(tamano_lote=100)
+        self.assertTrue(procesar_lote(cierre.pk, self.tipo_cierre, 100))
+
+        # Alta con el saldo del año nuevo mientras el cierre sigue en proceso
+        nueva = Cuentahabiente.objects.create(
+            numero_contrato=9999, nombres="Nueva", ap="Ap", am="Am", telefono="0",
+            colonia=Colonia.objects.first(), servicio=Servicio.objects.first(), saldo_pendiente=720,
+        )
+        while procesar_lote(cierre.pk, self.tipo_cierre, 100):
+            pass
+
+        cierre.refresh_from_db()
+        self.assertEqual(cierre.cuentas_procesadas, 300)
+        self.assertFalse(Cargo.objects.filter(cuentahabiente=nueva, tipo_cargo=self.tipo_cierre).exists())
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.saldo_pendiente, 720)
+
+    def test_api_encola_y_el_job_procesa(self):
+        _, estado = self._esperado()
+        admin = Cobrador.objects.create(
+            nombre="Admin", apellidos="Cierre", email="admin-cierre@test.mx",
+            usuario="admin-cierre", password="secreto123", role=Cobrador.ROLE_ADMIN,
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": admin.pk}))
+        datos = {"anio_cierre": self.ANIO_NUEVO - 1, "anio_nuevo": self.ANIO_NUEVO,
+                 "confirmar": True, "modo": "lotes", "tamano_lote": 100}
+
+        # La API solo deja el cierre en cola; el worker web no procesa lotes
+        for _ in range(2):
+            resp = client.post("/cierre-anual/confirmar/", datos, format="json")
+            self.assertEqual(resp.status_code, 202, resp.content)
+            self.assertEqual(resp.json()["estado"], CierreAnual.ESTADO_EN_PROCESO)
+        self.assertFalse(Cargo.objects.filter(tipo_cargo=self.tipo_cierre).exists())
+
+        out = StringIO()
+        call_command("procesar_cierres_anuales", stdout=out)
+        self.assertIn(f"Cierre {self.ANIO_NUEVO} completado", out.getvalue())
+        self.assertEqual(self._estado_final(), estado)
+        self.assertEqual(
+            CierreAnual.objects.get(anio=self.ANIO_NUEVO).estado, CierreAnual.ESTADO_COMPLETADO
+        )
+
+        out = StringIO()
+        call_command("procesar_cierres_anuales", stdout=out)
+        self.assertIn("Sin cierres pendientes.", out.getvalue())
+
+
+class CierreResumenTests(PadronCierreMixin, TestCase):
+    """POST /cierre-anual/: resumen previo en una consulta, en caché con el sello de cambios."""
+
+    def test_resumen_refleja_escrituras_de_otro_worker(self):
+        admin = Cobrador.objects.create(
+            nombre="Admin", apellidos="Resumen", email="admin-resumen@test.mx",
+            usuario="admin-resumen", password="secreto123", role=Cobrador.ROLE_ADMIN,
+        )
+        self.addCleanup(principal_cache.clear)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": admin.pk}))
+        datos = {"anio_cierre": self.ANIO_NUEVO - 1, "anio_nuevo": self.ANIO_NUEVO}
+
+        r = client.post("/cierre-anual/", datos, format="json")
+        self.assertEqual(r.status_code, 200, r.content)
+        total = Cuentahabiente.objects.count()
+        self.assertEqual(r.json()["reiniciadas"], Cuentahabiente.objects.filter(saldo_pendiente=0).count())
+        self.assertEqual(r.json()["reiniciadas"] + r.json()["con_adeudo"], total)
+
+        # UPDATE directo: sin signals en este proceso, como un cambio de otro worker
+        Cuentahabiente.objects.update(saldo_pendiente=0)
+        with self.assertNumQueries(1):
+            resumen = resumen_cierre(self.ANIO_NUEVO)
+        self.assertEqual(client.post("/cierre-anual/", datos, format="json").json(), {
+            **resumen, "cargo_total": float(resumen["cargo_total"]),
+        })
+        self.assertEqual((resumen["reiniciadas"], resumen["con_adeudo"]), (total, 0))
+
+    def test_cache_por_sello_de_cambios(self):
+        # La secuencia solo existe en PostgreSQL: se simula su valor
+        self.addCleanup(cache.clear)
+        sello = mock.patch.object(materialized, "cambio_actual", return_value=7)
+        with mock.patch.object(materialized, "es_postgres", return_value=True), sello as cambio:
+            antes = resumen_cierre(self.ANIO_NUEVO)
+            Cuentahabiente.objects.update(saldo_pendiente=0)
+            with self.assertNumQueries(0):
+                self.assertEqual(resumen_cierre(self.ANIO_NUEVO), antes)
+
+            # Otro worker registró un pago: la secuencia avanzó
+            cambio.return_value = 8
+            despues = resumen_cierre(self.ANIO_NUEVO)
+        self.assertEqual(despues["reiniciadas"], Cuentahabiente.objects.count())
+        self.assertNotEqual(despues, antes)
+
+
+class LeerCierresTests(TestCase):
+    """Cierres que bloquean pagos y año vigente, leídos de cierre_anual sin caché."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Test", apellidos="Cierres", email="cierres@test.mx",
+            usuario="cierres", password="secreto123",
+        )
+
+    def test_ejecutados_y_a_medias(self):
+        # bulk_create: sin signals, como un cambio hecho por otro worker
+        CierreAnual.objects.bulk_create([
+            CierreAnual(anio=2025, ejecutado=True, estado=CierreAnual.ESTADO_COMPLETADO,
+                        ejecutado_por=self.cobrador),
+            CierreAnual(anio=2026, estado=CierreAnual.ESTADO_EN_PROCESO, ejecutado_por=self.cobrador),
+            CierreAnual(anio=2027, ejecutado_por=self.cobrador),
+        ])
+        with self.assertNumQueries(1):
+            self.assertEqual(saldos.leer_cierres(), {2025: True, 2026: False})
+        self.assertEqual(saldos.anio_vigente(), 2025)
+        self.assertEqual(saldos.anio_vigente({2025: True, 2028: True}), 2028)
+
+
+class VistaMaterializadaEstadoTests(TestCase):
+    """Cabeceras de frescura sin una consulta por respuesta; escrituras sin filas calientes."""
+
+    def setUp(self):
+        materialized._estados.clear()
+        self.addCleanup(materialized._estados.clear)
+
+    @override_settings(MATVIEW_SETTINGS={"ESTADO_CACHE_TTL": 5})
+    def test_estado_se_cachea_por_ttl(self):
+        ahora = timezone.now()
+        VistaMaterializadaEstado.objects.create(
+            nombre="vista_pagos", materializada=True, stale_since=ahora, refrescada_en=ahora,
+        )
+        with mock.patch.object(materialized.time, "monotonic", return_value=100.0):
+            with self.assertNumQueries(1):
+                self.assertEqual(materialized.estado_vista("vista_pagos"), (ahora, ahora))
+            VistaMaterializadaEstado.objects.filter(nombre="vista_pagos").update(stale_since=None)
+            with self.assertNumQueries(0):
+                self.assertEqual(materialized.estado_vista("vista_pagos"), (ahora, ahora))
+
+        with mock.patch.object(materialized.time, "monotonic", return_value=106.0):
+            with self.assertNumQueries(1):
+                self.assertEqual(materialized.estado_vista("vista_pagos"), (None, ahora))
+
+        # Las no materializadas también se cachean (None)
+        self.assertIsNone(materialized.estado_vista("reporte_cargos"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(materialized.estado_vista("reporte_cargos"))
+
+    def test_on_escritura_solo_en_postgres(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            materialized.on_escritura(sender=Pago)
+        self.assertEqual(len(callbacks), int(connection.vendor == "postgresql"))
+
+    @skipUnless(connection.vendor == "postgresql", "La secuencia de cambios requiere PostgreSQL")
+    def test_solo_la_transicion_actualiza_el_estado(self):
+        VistaMaterializadaEstado.objects.create(nombre="vista_pagos", materializada=True)
+        materialized._marcar_stale()
+        stale = VistaMaterializadaEstado.objects.get(nombre="vista_pagos").stale_since
+        self.assertIsNotNone(stale)
+
+        # Ya stale: nextval y un UPDATE que no encuentra filas
+        materialized._marcar_stale()
+        self.assertEqual(VistaMaterializadaEstado.objects.get(nombre="vista_pagos").stale_since, stale)
+
+
+class PadronBusquedaMixin:
+    """Tres cuentas con acentos, apellidos repetidos y teléfonos que parecen contratos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Test", apellidos="Busqueda", email="busqueda@test.mx",
+            usuario="busqueda", password="secreto123",
+        )
+        centro = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        jardin = Colonia.objects.create(nombre_colonia="Jardín", codigo_postal=90001)
+        datos = [
+            (2001, "José", "Hernández", "López", "2461234567", centro),
+            (2002, "Josefina", "Pérez", "Ruiz", "2462001000", jardin),
+            (2003, "María", "Gómez", "Hernández", "2469998888", centro),
+        ]
+        cls.cuentas = [
+            Cuentahabiente.objects.create(
+                numero_contrato=contrato, nombres=nombres, ap=ap, am=am,
+                telefono=telefono, colonia=colonia, saldo_pendiente=0,
+            )
+            for contrato, nombres, ap, am, telefono, colonia in datos
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.cobrador.pk})
+        )
+
+
+
+class BusquedaCuentahabienteTests(PadronBusquedaMixin, TestCase):
+    """?search= en /cuentahabientes/: contrato exacto primero, luego similitud."""
+
+    def _contratos(self, termino):
+        r = self.client.get("/cuentahabientes/", {"search": termino})
+        self.assertEqual(r.status_code, 200, r.content)
+        return [c["numero_contrato"] for c in r.json()["results"]]
+
+    def test_contrato_exacto_no_busca_en_otros_campos(self):
+        # "2001" también aparece en el teléfono de la cuenta 2002: con
+        # contrato exacto ya no se busca en los demás campos
+        self.assertEqual(self._contratos("2002"), [2002])
+        self.assertEqual(self._contratos("2001"), [2001])
+
+    def test_sin_coincidencia_exacta_busca_normal(self):
+        self.assertEqual(self._contratos("999888"), [2003])
+        self.assertEqual(self._contratos("Jardín"), [2002])
+
+    def test_prefijo_de_contrato_primero_en_todas_las_paginas(self):
+        colonia = self.cuentas[0].colonia
+        for contrato, telefono in ((9000, "2005550000"), (2004, "0")):
+            Cuentahabiente.objects.create(
+                numero_contrato=contrato, nombres="Otra", ap="Cuenta", am="X",
+                telefono=telefono, colonia=colonia, saldo_pendiente=0,
+            )
+        # 9000 entra por teléfono: después de los contratos 200x aunque su pk sea menor
+        esperado = [2001, 2002, 2003, 2004, 9000]
+        self.assertEqual(self._contratos("200"), esperado)
+
+        # Con paginación por cursor la similitud no se pierde al cambiar de página
+        class DosPorPagina(KeysetPagination):
+            page_size = 2
+
+        vistos, url = [], "/cuentahabientes/?search=200"
+        with mock.patch.object(CuentahabienteViewSet, "pagination_class", DosPorPagina):
+            while url:
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200, r.content)
+                vistos += [c["numero_contrato"] for c in r.json()["results"]]
+                url = r.json()["next"]
+        self.assertEqual(vistos, esperado)
+
+    def test_prefijo_de_contrato_por_rangos(self):
+        # Rangos sobre el entero (usan el índice), no LIKE sobre el contrato como texto
+        qs = Cuentahabiente.objects.filter(rangos_contrato("200"))
+        self.assertNotIn("LIKE", str(qs.query))
+        self.assertEqual(sorted(qs.values_list("numero_contrato", flat=True)), [2001, 2002, 2003])
+
+    @skipUnless(connection.vendor == "postgresql", "pg_trgm / unaccent requieren PostgreSQL")
+    def test_sin_acentos_y_por_similitud(self):
+        self.assertEqual(self._contratos("jose hernandez")[0], 2001)
+        self.assertIn(2003, self._contratos("hernandez"))
+        self.assertEqual(self._contratos("jardin"), [2002])
+
+
+class AutocompleteTests(PadronBusquedaMixin, TestCase):
+    """GET /cuentahabientes/autocomplete/: prefijo de contrato o nombre, en caché."""
+
+    def _q(self, q, **params):
+        r = self.client.get("/cuentahabientes/autocomplete/", {"q": q, **params})
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()["results"]
+
+    def test_prefijo_de_contrato(self):
+        self.assertEqual([c["numero_contrato"] for c in self._q("200")], [2001, 2002, 2003])
+        self.assertEqual([c["numero_contrato"] for c in self._q("2002")], [2002])
+        self.assertEqual(self._q("20021"), [])
+        self.assertEqual(len(self._q("200", limite=2)), 2)
+
+    def test_limite_fuera_de_rango(self):
+        for limite in ("-1", "0", "26", "diez", ""):
+            r = self.client.get("/cuentahabientes/autocomplete/", {"q": "200", "limite": limite})
+            self.assertEqual(r.status_code, 400, limite)
+        self.assertEqual(len(self._q("200", limite=25)), 3)
+
+    def test_prefijo_de_nombre(self):
+        resultado = self._q("Hern")
+        self.assertEqual([c["numero_contrato"] for c in resultado], [2003, 2001])
+        self.assertEqual(
+            resultado[1],
+            {"id": self.cuentas[0].pk, "numero_contrato": 2001,
+             "nombre": "José Hernández López", "calle": None},
+        )
+        self.assertEqual(self._q("j"), [])
+
+    def test_cache_por_prefijo_e_invalidacion(self):
+        self._q("ruiz")
+        with self.assertNumQueries(0):
+            self.assertEqual([c["numero_contrato"] for c in self._q("ruiz")], [2002])
+
+        # Un pago solo guarda saldo/deuda: no invalida
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cuentas[0].save(update_fields=["saldo_pendiente", "deuda"])
+        with self.assertNumQueries(0):
+            self._q("ruiz")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cuentahabiente.objects.create(
+                numero_contrato=2004, nombres="Ana", ap="Ruiz", am="Soto", telefono="0",
+                colonia=self.cuentas[0].colonia, saldo_pendiente=0,
+            )
+        self.assertEqual([c["numero_contrato"] for c in self._q("ruiz")], [2002, 2004])
+
+
+class AsignacionContratoTests(TestCase):
+    """contratos.asignar(): primer número libre >= 2000 sin recorrer el padrón."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        cls.servicio = Servicio.objects.create(nombre="Agua", costo=Decimal("720.00"))
+        for contrato in (2000, 2001, 2003):
+            cls._cuenta(contrato)
+        # Pool desde el padrón (otros TransactionTestCase vacían las tablas)
+        contratos.reconstruir()
+
+    @classmethod
+    def _cuenta(cls, contrato):
+        return Cuentahabiente.objects.create(
+            numero_contrato=contrato, nombres="N", ap="P", am="M", telefono="0",
+            colonia=cls.colonia, servicio=cls.servicio, saldo_pendiente=0,
+        )
+
+    def test_alta_toma_el_primer_hueco(self):
+        serializer = CuentahabienteSerializer(data={
+            "nombres": "Ana", "ap": "Ruiz", "am": "Soto", "telefono": "0",
+            "colonia": self.colonia.pk, "servicio": self.servicio.pk,
+        })
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(serializer.save().numero_contrato, 2002)
+        self.assertEqual(contratos.asignar(), 2004)
+        # Los números descartados o entregados ya no están en el pool
+        self.assertFalse(ContratoLibre.objects.filter(numero__lte=2004).exists())
+
+    def test_baja_y_rollback_devuelven_el_numero(self):
+        self.assertEqual(contratos.asignar(), 2002)
+        Cuentahabiente.objects.get(numero_contrato=2001).delete()
+        self.assertEqual(contratos.asignar(), 2001)
+
+        with transaction.atomic():
+            self.assertEqual(contratos.asignar(), 2004)
+            transaction.set_rollback(True)
+        self.assertEqual(contratos.asignar(), 2004)
+
+    def test_pool_agotado_se_repone_desde_el_folio(self):
+        ContratoLibre.objects.all().delete()
+        folio = FolioContrato.objects.get(serie=contratos.SERIE).siguiente
+        self.assertEqual(folio, 2004 + contratos.LOTE)
+        # Asignado a mano por encima del folio: reponer() ya no lo agrega
+        self._cuenta(folio)
+        self.assertEqual(contratos.asignar(), folio + 1)
+        self.assertEqual(ContratoLibre.objects.count(), contratos.LOTE - 2)
+
+        self.assertEqual(contratos.asignar(minimo=2500), 2500)
+
+    def test_reconstruir_desde_el_padron(self):
+        ContratoLibre.objects.all().delete()
+        self._cuenta(2010)
+        huecos = contratos.reconstruir(lote=5)
+        self.assertEqual(huecos, 7)  # 2002, 2004 ... 2009
+        self.assertEqual(contratos.asignar(), 2002)
+        self.assertEqual(contratos.asignar(minimo=2010), 2011)
+
+
+class ImportacionExcelTests(TestCase):
+    """import_base_excel: --pipeline (consultas por lote, no por fila) y --dry-run."""
+
+    ENCABEZADOS = ["Contrato", "Nombres", "AP", "AM", "Colonia", "Mes", "Año", "Monto", "Descuento", "Saldo"]
+
+    @classmethod
+    def setUpTestData(cls):
+        Cobrador.objects.create(
+            nombre="Test", apellidos="Import", email="import@test.mx",
+            usuario="importador", password="secreto123",
+        )
+        Servicio.objects.create(nombre="Agua", costo=Decimal("720.00"))
+        Descuento.objects.create(nombre_descuento="INAPAM", porcentaje=Decimal("50.00"))
+        cls.colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        Cuentahabiente.objects.create(
+            numero_contrato=100, nombres="Viejo", ap="Nombre", am="X", telefono="0",
+            colonia=cls.colonia, saldo_pendiente=0,
+        )
+        contratos.reconstruir()
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _excel(self, filas):
+        wb = openpyxl.Workbook()
+        wb.active.append(self.ENCABEZADOS)
+        for fila in filas:
+            wb.active.append(fila)
+        ruta = Path(self.dir.name) / f"padron{len(filas)}.xlsx"
+        wb.save(ruta)
+        return str(ruta)
+
+    def _importar(self, ruta, *extra, pipeline=True):
+        salida = StringIO()
+        modo = ["--pipeline"] if pipeline else []
+        call_command(
+            "import_base_excel", ruta, "--servicio", "agua", "--cobrador", "importador",
+            "--crear-pagos", *modo, *extra, stdout=salida, stderr=StringIO(),
+        )
+        return salida.getvalue()
+
+    def _filas(self, cuentas):
+        return [
+            [100 + n, f"Nombre{n}", "Ap", "Am", "centro", mes, 2025, 300, 360 if n % 2 else 0, None]
+            for n in range(cuentas)
+            for mes in ("Enero", "Febrero")
+        ]
+
+    def test_upsert_pagos_y_contratos_generados(self):
+        filas = self._filas(3) + [
+            [None, "Sin", "Contrato", "Am", "Centro", "Marzo", 2025, 720, 0],
+            [None, "Sin", "Contrato", "Am", "Centro", "Marzo", 2025, 720, 0],  # repetido
+            [300, "Colonia", "Inexistente", "X", "Norte", "Enero", 2025, 100, 0],
+        ]
+        salida = self._importar(self._excel(filas), "--generar-contratos", "--base-contrato", "5000")
+        self.assertIn("Creados: 3, Actualizados: 1", salida)
+        self.assertIn("Pagos: 7", salida)
+        self.assertIn("Errores: 1", salida)
+        self.assertIn("filas/s", salida)
+
+        viejo = Cuentahabiente.objects.get(numero_contrato=100)
+        self.assertEqual(viejo.nombres, "Nombre0")
+        self.assertEqual(Cuentahabiente.objects.get(numero_contrato=5000).ap, "Contrato")
+        inapam = Pago.objects.filter(cuentahabiente__numero_contrato=101)
+        self.assertEqual(
+            set(inapam.values_list("mes", "descuento__nombre_descuento")),
+            {("Enero", "INAPAM"), ("Febrero", "INAPAM")},
+        )
+        self.assertFalse(saldos.verificar())
+
+        # Reimportar no duplica pagos
+        salida = self._importar(self._excel(self._filas(3)))
+        self.assertIn("Creados: 0, Actualizados: 3 | Pagos: 0", salida)
+
+    def test_fila_por_fila_actualiza_tablas_derivadas(self):
+        salida = self._importar(self._excel(self._filas(3)), pipeline=False)
+        self.assertIn("Creados: 2, Actualizados: 1 | Pagos: 6", salida)
+        self.assertEqual(
+            CuentahabienteSaldo.objects.filter(anio=2025).aggregate(n=Sum("num_pagos"))["n"], 6,
+        )
+        self.assertFalse(saldos.verificar())
+        self.assertEqual(RecaudacionDiaria.objects.aggregate(n=Sum("num_pagos"))["n"], 6)
+        self.assertFalse(recaudacion.verificar())
+
+    def test_consultas_no_dependen_de_las_filas(self):
+        chico, grande = self._excel(self._filas(5)), self._excel(self._filas(40))
+        # Primera corrida aparte para comparar solo la importación
+        self._importar(chico)
+        Pago.objects.all().delete()
+        with CaptureQueriesContext(connection) as consultas_chico:
+            self._importar(chico)
+        Pago.objects.all().delete()
+        with CaptureQueriesContext(connection) as consultas_grande:
+            self._importar(grande)
+        self.assertEqual(Pago.objects.count(), 80)
+        self.assertEqual(len(consultas_chico), len(consultas_grande))
+
+    def test_dry_run_reporta_sin_escribir(self):
+        self._importar(self._excel(self._filas(2)))
+        filas = self._filas(3) + [
+            # Último pago con saldo previo: 720 - 300 = 420 pendiente
+            [101, "Nombre1", "Ap", "Am", "centro", "Marzo", 2025, 300, 0, 720],
+            [None, "Sin", "Contrato", "Am", "Centro", "Enero", 2025, 100, 0, None],
+        ]
+        filas[0][7] = 500  # mismo mes con otro monto: pago nuevo, cuenta sin cambios
+        reporte = Path(self.dir.name) / "diff.json"
+        antes = (Cuentahabiente.objects.count(), Pago.objects.count())
+
+        with CaptureQueriesContext(connection) as consultas:
+            salida = self._importar(self._excel(filas), "--dry-run", "--reporte", str(reporte))
+        self.assertEqual((Cuentahabiente.objects.count(), Pago.objects.count()), antes)
+        self.assertFalse([
+            q for q in consultas.captured_queries
+            if not q["sql"].lstrip().upper().startswith(("SELECT", "SAVEPOINT", "RELEASE"))
+        ])
+        self.assertIn("Nuevas: 1, Actualizadas: 1", salida)
+
+        datos = json.loads(reporte.read_text(encoding="utf-8"))
+        self.assertEqual(datos["resumen"]["pagos_nuevos"], 4)
+        self.assertEqual(datos["resumen"]["saldos_cambiados"], 1)
+        self.assertEqual(datos["resumen"]["errores"], 1)
+        por_contrato = {c["numero_contrato"]: c for c in datos["cuentas"]}
+        self.assertEqual(por_contrato[100]["accion"], "sin_cambios")
+        self.assertEqual(por_contrato[100]["pagos_nuevos"], 1)
+        self.assertEqual(por_contrato[101]["accion"], "actualizada")
+        self.assertEqual(por_contrato[101]["cambios"]["saldo_pendiente"], [0, 420])
+        self.assertEqual((por_contrato[101]["saldo_actual"], por_contrato[101]["saldo_nuevo"]), (0, 420))
+        self.assertEqual(por_contrato[102]["accion"], "nueva")
+        self.assertEqual(por_contrato[None]["detalle"], "Sin contrato (usa --generar-contratos).")
+
+        csv_ruta = Path(self.dir.name) / "diff.csv"
+        self._importar(self._excel(filas), "--dry-run", "--reporte", str(csv_ruta))
+        lineas = csv_ruta.read_text(encoding="utf-8-sig").splitlines()
+        self.assertTrue(lineas[0].startswith("accion,numero_contrato,nombre"))
+        self.assertEqual(len(lineas), 1 + len(por_contrato))
+
+    def test_lectura_en_paralelo_igual_a_secuencial(self):
+        from cuentahabientes.management.commands import import_base_excel as comando
+
+        ruta = self._excel(self._filas(30))
+        secuencial, _ = comando.Command()._leer(ruta, None, 1, procesos=1)
+        with mock.patch.object(comando, "MIN_FILAS_POR_PROCESO", 10):
+            paralelo, _ = comando.Command()._leer(ruta, None, 1, procesos=4)
+        self.assertEqual(len(secuencial), 60)
+        self.assertEqual(paralelo, secuencial)
+
+
+class AsignarCallesTests(TestCase):
+    """manage.py asignar_calles: catálogo por nombre normalizado y calle_fk por lotes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        cls.hidalgo = Calle.objects.create(nombre_calle="Hidalgo")
+        calles = ["  Av.  Juárez ", "AV. JUAREZ", "hidalgo", "Reforma", "", None]
+        cls.cuentas = [
+            Cuentahabiente.objects.create(
+                numero_contrato=3000 + n, nombres="N", ap="P", am="M", telefono="0",
+                calle=calle, colonia=colonia, saldo_pendiente=0,
+            )
+            for n, calle in enumerate(calles)
+        ]
+
+    def _asignar(self, *args):
+        salida = StringIO()
+        call_command("asignar_calles", *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_crea_faltantes_y_asigna(self):
+        with CaptureQueriesContext(connection) as consultas:
+            salida = self._asignar("--chunk-size", "2")
+        self.assertIn("(2 creadas)", salida)
+        self.assertIn("(4 asignadas)", salida)
+        # 4 cuentas en lotes de 2: dos UPDATE
+        updates = [q for q in consultas.captured_queries if "UPDATE" in q["sql"].upper()]
+        self.assertEqual(len(updates), 2)
+
+        fk = dict(Cuentahabiente.objects.values_list("numero_contrato", "calle_fk__nombre_calle"))
+        self.assertEqual(fk[3000], "Av. Juárez")
+        self.assertEqual(fk[3001], "Av. Juárez")
+        self.assertEqual(fk[3002], "Hidalgo")
+        self.assertEqual(fk[3003], "Reforma")
+        self.assertIsNone(fk[3004])
+        self.assertEqual(Calle.objects.count(), 3)
+
+        self.assertIn("(0 creadas)", self._asignar())
+        self.assertIn("(0 asignadas)", self._asignar())
+
+
+class ExportarTests(TestCase):
+    """GET /vista-pagos/export/: mismos filtros y orden que el listado, en CSV o XLSX."""
+
+    CAMPOS = [
+        "id", "numero_contrato", "nombre_completo", "nombre_servicio", "anio",
+        "pagos_totales", "estatus_deuda", "calle", "saldo_pendiente",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        # La vista no existe sin migraciones: una tabla con sus columnas basta.
+        # Antes de super(): el schema editor de SQLite no corre dentro de atomic().
+        with connection.schema_editor() as editor:
+            editor.create_model(VistaPagos)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(VistaPagos)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Cobra", apellidos="Dor", email="export@test.mx",
+            usuario="export", password="secreto123", role=Cobrador.ROLE_COBRADOR,
+        )
+        VistaPagos.objects.bulk_create([
+            VistaPagos(
+                id=n, numero_contrato=500 + n, nombre_completo=f"Ñoño {n}", nombre_servicio=None,
+                anio=2025 + n % 2, pagos_totales=Decimal("100.50") * n, estatus_deuda="pagado",
+                calle="Juárez", saldo_pendiente=0,
+            )
+            for n in range(1, 6)
+        ])
+
+    def setUp(self):
+        self.addCleanup(principal_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.cobrador.pk})
+        )
+
+    def _export(self, **params):
+        r = self.client.get("/vista-pagos/export/", params)
+        self.assertEqual(r.status_code, 200, getattr(r, "content", b""))
+        return r, b"".join(r.streaming_content)
+
+    def test_csv_filtrado_y_ordenado(self):
+        r, contenido = self._export(anio=2026, ordering="-numero_contrato")
+
+        self.assertTrue(r["Content-Type"].startswith("text/csv"))
+        self.assertRegex(r["Content-Disposition"], r'attachment; filename="vista_pagos_\d{8}_\d{4}\.csv"')
+        texto = contenido.decode("utf-8")
+        self.assertTrue(texto.startswith("\ufeff"))
+        lineas = texto.lstrip("\ufeff").splitlines()
+        self.assertEqual(lineas[0], ",".join(self.CAMPOS))
+        self.assertEqual(lineas[1:], [
+            "5,505,Ñoño 5,,2026,502.50,pagado,Juárez,0.00",
+            "3,503,Ñoño 3,,2026,301.50,pagado,Juárez,0.00",
+            "1,501,Ñoño 1,,2026,100.50,pagado,Juárez,0.00",
+        ])
+
+    def test_xlsx(self):
+        r, contenido = self._export(formato="xlsx", search="Ñoño 3")
+
+        self.assertEqual(
+            r["Content-Type"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        with tempfile.TemporaryFile() as archivo:
+            archivo.write(contenido)
+            hoja = openpyxl.load_workbook(archivo, read_only=True)["Reporte"]
+            filas = [list(f) for f in hoja.iter_rows(values_only=True)]
+        self.assertEqual(filas, [
+            self.CAMPOS,
+            [3, 503, "Ñoño 3", None, 2026, 301.5, "pagado", "Juárez", 0],
+        ])
+
+    def test_formato_no_soportado(self):
+        r = self.client.get("/vista-pagos/export/", {"formato": "pdf"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_requiere_autenticacion(self):
+        self.client.credentials()
+        r = self.client.get("/vista-pagos/export/")
+        self.assertEqual(r.status_code, 403)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import (EstadoCuentaResumenViewSet, CierreAnualViewSet, 
+from .views import (EstadoCuentaResumenViewSet, CierreAnualViewSet, CuentahabienteSaldoViewSet,
                     CuentahabienteViewSet, RCuentahabientesViewSet, VistaHistorialViewSet,
                     VistaPagosViewSet, VistaDeudoresViewSet, VistaProgresoPublicViewSet, EstadoCuentaViewSet
                     , VistaCargosViewSet, EstadoCuentaNewViewSet, ReporteCargosViewSet, ReportePadronGeneralViewSet)
@@ -17,6 +17,7 @@ router.register(r'estado-cuenta', EstadoCuentaViewSet, basename='estado-cuenta')
 router.register(r'r-cuentahabientes', RCuentahabientesViewSet, basename='r-cuentahabientes')
 router.register(r'cierre-anual', CierreAnualViewSet, basename='cierre-anual')
 router.register(r'estado-cuenta-resumen', EstadoCuentaResumenViewSet, basename='estado-cuenta-resumen')
+router.register(r'cuentahabiente-saldo', CuentahabienteSaldoViewSet, basename='cuentahabiente-saldo')
 router.register(r"vista-cargos", VistaCargosViewSet, basename="vista-cargos")
 router.register(r"estado-cuenta-new", EstadoCuentaNewViewSet, basename="estado-cuenta-new")
 router.register(r"reporte-cargos", ReporteCargosViewSet, basename="reporte-cargos")
@@ -1,27 +1,37 @@
 # cuentahabientes/views.py
 from datetime import date
 import django_filters
-from decimal import Decimal, InvalidOperation
-from django.db import transaction
+from decimal import Decimal
+from django.db import connection, transaction
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
-
-from cargos.models import Cargo, TipoCargo
-from pagos.models import Pago
-from .models import CierreAnual, Cuentahabiente
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.throttling import ScopedRateThrottle
+
+from cargos.models import TipoCargo
+from .cierre import (
+    MODO_LOTES, MODO_SQL, ejecutar_cierre, preparar_cierre_por_lotes, resumen_cierre,
+)
+from .models import CierreAnual, Cuentahabiente, CuentahabienteSaldo
 from .serializers import (
-    CierreAnioSerializer, CuentahabienteSerializer, EjecutarCierreSerializer, RCuentahabientesSerializer, 
+    CierreAnioSerializer, CierreProgresoSerializer, CuentahabienteSaldoSerializer, CuentahabienteSerializer, EjecutarCierreSerializer, RCuentahabientesSerializer, 
     VistaPagosSerializer, VistaHistorialSerializer,VistaDeudoresSerializer,
     VistaProgresoSerializer, EstadoCuentaSerializer, EstadoCuentaResumenSerializer, VistaCargosSerializer, 
     EstadoCuentaNewSerializer, ReporteCargosSerializer, ReportePadronGeneralSerializer)
 
+from cobrador.auth import JWTClaimsAuthentication
 from cobrador.permissions import IsDirectivoOrCobradorCreate
+from .autocompletar import autocompletar, limite_max
+from .busqueda import Busqueda, BusquedaTrigramFilter, NombreBusqueda, OrdenBusquedaFilter
+from .exports import ExportarMixin
+from .materialized import VistaMaterializadaMixin
+from sicap_backend.pagination import KeysetPagination
 from .models_views import (RCuentahabientes, VistaHistorial,VistaPagos, VistaDeudores, VistaProgreso, 
-                           EstadoCuenta, EstadoCuentaResumen, VistaCargos, EstadoCuentaNew, ReporteCargos,
+                           EstadoCuenta, VistaCargos, EstadoCuentaNew, ReporteCargos,
                            ReportePadronGeneral)
 
 
@@ -29,16 +39,43 @@ class CuentahabienteViewSet(viewsets.ModelViewSet):
     queryset = Cuentahabiente.objects.select_related("colonia", "servicio").order_by("id_cuentahabiente")
     serializer_class = CuentahabienteSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [BusquedaTrigramFilter, OrdenBusquedaFilter]
+    # ?search=: ver busqueda.py (search_fields queda como respaldo fuera de PostgreSQL)
     search_fields = ["numero_contrato", "nombres", "ap", "am", "telefono", "colonia__nombre_colonia"]
+    busqueda_contrato = "numero_contrato"
+    busqueda_trigram = [NombreBusqueda("nombres", "ap", "am"), Busqueda("colonia__nombre_colonia")]
+    busqueda_contiene = ["telefono"]
     ordering_fields = ["id_cuentahabiente", "numero_contrato", "nombres"]
     ordering = ["id_cuentahabiente"]
+    # Solo lo usa autocomplete (la única acción con ScopedRateThrottle)
+    throttle_scope = "autocomplete"
 
+    @action(
+        detail=False, methods=["get"], url_path="autocomplete",
+        authentication_classes=[JWTClaimsAuthentication],
+        throttle_classes=[ScopedRateThrottle],
+    )
+    def autocomplete(self, request):
+        """
+        GET /cuentahabientes/autocomplete/?q=ramir&limite=10
+        Top N {id, numero_contrato, nombre, calle} por prefijo de contrato o
+        nombre; sin paginación ni conteo (ver autocompletar.py).
+        """
+        limite = request.query_params.get("limite")
+        if limite is not None:
+            if not limite.isdigit() or not 1 <= int(limite) <= limite_max():
+                return Response(
+                    {"error": f"limite debe ser un entero entre 1 y {limite_max()}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            limite = int(limite)
+        return Response({"results": autocompletar(request.query_params.get("q", ""), limite)})
 
 
-class VistaPagosViewSet(viewsets.ReadOnlyModelViewSet):
+class VistaPagosViewSet(ExportarMixin, VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):
     queryset = VistaPagos.objects.all()
     serializer_class = VistaPagosSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["anio", "estatus_deuda", "nombre_servicio", "numero_contrato"]
     search_fields = ["nombre_completo", "numero_contrato"]
@@ -47,14 +84,18 @@ class VistaPagosViewSet(viewsets.ReadOnlyModelViewSet):
 class VistaHistorialViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = VistaHistorial.objects.all()
     serializer_class = VistaHistorialSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["anio", "mes", "numero_contrato", "fecha_pago"]
     search_fields = ["numero_contrato", "cobrador"]
     ordering_fields = ["fecha_pago", "anio", "numero_contrato"]
+    ordering = ["-fecha_pago", "numero_contrato"]
+    pagination_class = KeysetPagination
 
-class VistaDeudoresViewSet(viewsets.ReadOnlyModelViewSet):
+class VistaDeudoresViewSet(VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):
     queryset = VistaDeudores.objects.all().order_by("-monto_total")
     serializer_class = VistaDeudoresSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     # Campos por los que vas a poder filtrar desde el front
     filterset_fields = ["estatus", "nombre_colonia"]
@@ -94,6 +135,7 @@ class EstadoCuentaViewSet(viewsets.ReadOnlyModelViewSet):
         """
         queryset = EstadoCuenta.objects.all()
         serializer_class = EstadoCuentaSerializer
+        authentication_classes = [JWTClaimsAuthentication]
         permission_classes = [IsAuthenticated&IsDirectivoOrCobradorCreate]
         filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
         filterset_fields = ["id_cuentahabiente", "anio", "tipo_movimiento"]
@@ -112,6 +154,7 @@ class VistaCargosViewSet(viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class   = VistaCargosSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends    = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields   = ["cuentahabiente_id", "cargo_activo", "anio_cargo"]
@@ -124,34 +167,63 @@ class EstadoCuentaResumenViewSet(viewsets.ReadOnlyModelViewSet):
     """
     /api/estado-cuenta-resumen/?id_cuentahabiente=1
     /api/estado-cuenta-resumen/?numero_contrato=123
+    Lee cuentahabiente_saldo (mantenida al escribir, ver saldos.py).
     """
     serializer_class = EstadoCuentaResumenSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated & IsDirectivoOrCobradorCreate ]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["id_cuentahabiente", "numero_contrato"]
 
     def get_queryset(self):
         id_cuentahabiente = self.request.query_params.get("id_cuentahabiente")
         numero_contrato   = self.request.query_params.get("numero_contrato")
 
         if not id_cuentahabiente and not numero_contrato:
-            return EstadoCuentaResumen.objects.none()  # evita traer toda la tabla
+            return CuentahabienteSaldo.objects.none()  # evita traer toda la tabla
+
+        qs = CuentahabienteSaldo.objects.select_related("cuentahabiente__servicio")
+        try:
+            if id_cuentahabiente:
+                qs = qs.filter(cuentahabiente_id=int(id_cuentahabiente))
+            if numero_contrato:
+                qs = qs.filter(cuentahabiente__numero_contrato=int(numero_contrato))
+        except ValueError:
+            raise DRFValidationError({"detail": "id_cuentahabiente y numero_contrato deben ser numéricos."})
+        return qs.order_by("cuentahabiente_id", "anio")
 
-        return EstadoCuentaResumen.objects.all()
+
+class CuentahabienteSaldoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    /api/cuentahabiente-saldo/?cuentahabiente=1
+    /api/cuentahabiente-saldo/?anio=2025&estatus=adeudo
+    Resumen por cuenta y año mantenido al escribir (ver saldos.py).
+    """
+    queryset = CuentahabienteSaldo.objects.select_related("cuentahabiente")
+    serializer_class = CuentahabienteSaldoSerializer
+    authentication_classes = [JWTClaimsAuthentication]
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["cuentahabiente", "anio", "estatus"]
+    ordering_fields = ["id", "anio", "total_pagado", "cargos_pendientes", "saldo_pendiente"]
+    ordering = ["id"]
+    pagination_class = KeysetPagination
 
 
 
-class RCuentahabientesViewSet(viewsets.ReadOnlyModelViewSet):  
+class RCuentahabientesViewSet(ExportarMixin, VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):  
     """/api/r-cuentahabientes/
     /api/r-cuentahabientes/?id_cuentahabiente=123
     """
     queryset = RCuentahabientes.objects.all().order_by("id_cuentahabiente")
     serializer_class = RCuentahabientesSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaTrigramFilter, OrdenBusquedaFilter]
     filterset_fields = ["id_cuentahabiente", "estatus", "numero_contrato", "nombre"]
 
     search_fields = ["nombre", "calle", "nombre_colonia", "telefono", "numero_contrato"]
+    busqueda_contrato = "numero_contrato"
+    busqueda_trigram = [Busqueda("nombre"), Busqueda("calle"), Busqueda("nombre_colonia")]
+    busqueda_contiene = ["telefono"]
     ordering_fields = ["id_cuentahabiente", "numero_contrato", "saldo_pendiente", "total_pagado"]
     ordering = ["id_cuentahabiente"]
 
@@ -171,16 +243,13 @@ class CierreAnualViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        if CierreAnual.objects.filter(
-            anio=data["anio_nuevo"],
-            ejecutado=True
-        ).exists():
+        if CierreAnual.objects.filter(anio=data["anio_nuevo"], ejecutado=True).exists():
             return Response(
                 {"error": "El cierre anual ya fue ejecutado"},
                 status=status.HTTP_409_CONFLICT
             )
 
-        resumen = cambio_anio(data["anio_nuevo"])
+        resumen = resumen_cierre(data["anio_nuevo"])
         return Response(resumen, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], url_path="confirmar")
@@ -208,6 +277,15 @@ class CierreAnualViewSet(viewsets.ViewSet):
         anio_cierre = data["anio_cierre"]  # ej: 2025
         anio_nuevo  = data["anio_nuevo"]   # ej: 2026
 
+        if data["modo"] == MODO_SQL and connection.vendor != "postgresql":
+            return Response(
+                {"error": "El modo 'sql' requiere PostgreSQL"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if data["modo"] == MODO_LOTES:
+            return self._confirmar_por_lotes(request, data)
+
         with transaction.atomic():
 
             # ── Verificar y crear registro de cierre ─────────────────────
@@ -222,102 +300,29 @@ class CierreAnualViewSet(viewsets.ViewSet):
                     status=status.HTTP_409_CONFLICT
                 )
 
-            # ── Tipo de cargo para cierre anual ──────────────────────────
-            tipo_cierre, _ = TipoCargo.objects.get_or_create(
-                nombre="CIERRE_ANUAL",
-                defaults={"monto": Decimal("0.00"), "automatico": True}
-            )
-
-            # ── Bloquear y cargar cuentahabientes ────────────────────────
-            ids = list(
-                Cuentahabiente.objects.select_for_update()
-                .values_list("id_cuentahabiente", flat=True)
-            )
-            cuentahabientes = list(
-                Cuentahabiente.objects.filter(id_cuentahabiente__in=ids)
-                .select_related("servicio")
-            )
-
-            # ── Pagos anticipados del nuevo año (más reciente primero) ───
-            pagos_nuevo_anio = list(
-                Pago.objects.filter(anio=anio_nuevo)
-                .select_related("descuento")
-                .order_by("cuentahabiente_id", "-fecha_pago")
-            )
-
-            # Sumar monto_recibido por cuentahabiente
-            # (monto_recibido ya viene con el descuento aplicado)
-            pagos_por_cuenta = {}
-            for p in pagos_nuevo_anio:
-                cid = p.cuentahabiente_id
-                pagos_por_cuenta[cid] = (
-                    pagos_por_cuenta.get(cid, Decimal("0")) +
-                    decimal_seguro(p.monto_recibido)
+            # Un cierre por lotes a medias ya cerró parte de las cuentas:
+            # correrlo completo otra vez duplicaría sus cargos.
+            if cierre.estado in (CierreAnual.ESTADO_EN_PROCESO, CierreAnual.ESTADO_ERROR):
+                return Response(
+                    {"error": "Hay un cierre por lotes sin terminar; reanúdalo con modo 'lotes'"},
+                    status=status.HTTP_409_CONFLICT
                 )
 
-            # Descuento del pago más reciente con descuento activo
-            descuento_por_cuenta = {}
-            for p in pagos_nuevo_anio:
-                cid = p.cuentahabiente_id
-                if cid not in descuento_por_cuenta:
-                    if p.descuento_id and p.descuento and p.descuento.activo:
-                        descuento_por_cuenta[cid] = decimal_seguro(p.descuento.porcentaje)
-
-            # ── Procesar cada cuentahabiente ─────────────────────────────
-            cargos_a_crear       = []
-            cuentas_a_actualizar = []
-            fecha_cargo = date(anio_nuevo, 1, 1)
-
-            for c in cuentahabientes:
-                saldo_anterior = decimal_seguro(c.saldo_pendiente)
-                tarifa_base    = obtener_tarifa_cuentahabiente(c)
-
-                # Tarifa real = base - descuento fijo (si tiene)
-                descuento_fijo = descuento_por_cuenta.get(c.id_cuentahabiente, Decimal("0"))
-                tarifa_real    = tarifa_base - descuento_fijo
-
-                # Cargo de cierre: deuda del año que cierra
-                if saldo_anterior > Decimal("0"):
-                    cargos_a_crear.append(
-                        Cargo(
-                            cuentahabiente=c,
-                            tipo_cargo=tipo_cierre,
-                            saldo_restante_cargo=saldo_anterior,
-                            fecha_cargo=fecha_cargo,
-                            activo=True
-                        )
-                    )
-
-                # Nuevo saldo = tarifa real - pagos anticipados
-                pagos_anticipados = pagos_por_cuenta.get(c.id_cuentahabiente, Decimal("0"))
-                nuevo_saldo       = tarifa_real - pagos_anticipados
-
-                # Estado de deuda
-                if nuevo_saldo <= Decimal("0"):
-                    estado_deuda = "pagado"
-                elif pagos_anticipados > Decimal("0") and nuevo_saldo < tarifa_real:
-                    estado_deuda = "corriente"
-                else:
-                    estado_deuda = "adeudo"
-
-                c.saldo_pendiente = nuevo_saldo
-                c.deuda           = estado_deuda
-                cuentas_a_actualizar.append(c)
-
-            # ── Guardar en lote ──────────────────────────────────────────
-            if cargos_a_crear:
-                Cargo.objects.bulk_create(cargos_a_crear, batch_size=500)
-
-            Cuentahabiente.objects.bulk_update(
-                cuentas_a_actualizar,
-                ["saldo_pendiente", "deuda"],
-                batch_size=500
-            )
+            # ── Tipo de cargo para cierre anual ──────────────────────────
+            tipo_cierre = self._tipo_cierre()
+
+            # ── Cargos de cierre + nuevos saldos (ver cierre.py) ─────────
+            resultado = ejecutar_cierre(anio_nuevo, tipo_cierre, modo=data["modo"])
 
             # ── Marcar cierre como ejecutado ─────────────────────────────
             cierre.ejecutado     = True
+            cierre.estado        = CierreAnual.ESTADO_COMPLETADO
             cierre.fecha         = date.today()
             cierre.ejecutado_por = request.user
+            cierre.total_cuentas      = resultado["cuentas_procesadas"]
+            cierre.cuentas_procesadas = resultado["cuentas_procesadas"]
+            cierre.cargos_generados   = resultado["cargos_generados"]
+            cierre.cuentas_con_pagos_anticipados = resultado["cuentas_con_pagos_anticipados"]
             cierre.save()
 
             return Response(
@@ -325,71 +330,75 @@ class CierreAnualViewSet(viewsets.ViewSet):
                     "status": "Cierre anual ejecutado correctamente",
                     "anio_cerrado": anio_cierre,
                     "anio_nuevo": anio_nuevo,
-                    "cuentas_procesadas": len(cuentas_a_actualizar),
-                    "cargos_generados": len(cargos_a_crear),
-                    "cuentas_con_pagos_anticipados": len(pagos_por_cuenta),
+                    "cuentas_procesadas": resultado["cuentas_procesadas"],
+                    "cargos_generados": resultado["cargos_generados"],
+                    "cuentas_con_pagos_anticipados": resultado["cuentas_con_pagos_anticipados"],
                 },
                 status=status.HTTP_200_OK
             )
 
+    def _tipo_cierre(self):
+        tipo_cierre, _ = TipoCargo.objects.get_or_create(
+            nombre="CIERRE_ANUAL",
+            defaults={"monto": Decimal("0.00"), "automatico": True}
+        )
+        return tipo_cierre
 
-# ── Funciones auxiliares ─────────────────────────────────────────────────────
-
-def decimal_seguro(valor):
-    try:
-        if valor in (None, "", " ", "NULL"):
-            return Decimal("0")
-        return Decimal(str(valor))
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
-def obtener_tarifa_cuentahabiente(cuentahabiente):
-    if not cuentahabiente.servicio:
-        return Decimal("0")
-    return decimal_seguro(cuentahabiente.servicio.costo)
-
+    def _confirmar_por_lotes(self, request, data):
+        """
+        Modo "lotes": deja el CierreAnual "en_proceso" y responde 202; lo
+        procesa `manage.py procesar_cierres_anuales` (cron), no este worker.
+        El avance se consulta en .../progreso/. Si el cierre quedó en
+        "error" se reanuda desde el último lote confirmado.
+        """
+        anio_nuevo = data["anio_nuevo"]
 
-def cambio_anio(anio_nuevo):
-    """
-    Devuelve un resumen previo del cierre sin ejecutar nada.
-    """
-    resumen = {
-        "reiniciadas": 0,
-        "con_adeudo": 0,
-        "cargo_total": Decimal("0.00"),
-        "cuentas_con_pagos_anticipados": 0,
-    }
-
-    pagos_anticipados_ids = set(
-        Pago.objects.filter(anio=anio_nuevo)
-        .values_list("cuentahabiente_id", flat=True)
-        .distinct()
-    )
+        with transaction.atomic():
+            cierre, created = CierreAnual.objects.select_for_update().get_or_create(
+                anio=anio_nuevo,
+                defaults={"ejecutado_por": request.user}
+            )
 
-    for c in Cuentahabiente.objects.select_related("servicio"):
-        tarifa       = obtener_tarifa_cuentahabiente(c)
-        saldo_actual = decimal_seguro(c.saldo_pendiente)
+            if cierre.ejecutado:
+                return Response(
+                    {"error": "El cierre anual ya fue ejecutado"},
+                    status=status.HTTP_409_CONFLICT
+                )
 
-        if saldo_actual == 0:
-            resumen["reiniciadas"] += 1
-        else:
-            resumen["con_adeudo"] += 1
+            # Ya está en la cola del job (o corriendo): nada que preparar
+            if cierre.estado != CierreAnual.ESTADO_EN_PROCESO:
+                preparar_cierre_por_lotes(cierre, request.user, data.get("tamano_lote"))
 
-        resumen["cargo_total"] += tarifa
+        return Response(
+            CierreProgresoSerializer(cierre).data,
+            status=status.HTTP_202_ACCEPTED
+        )
 
-        if c.id_cuentahabiente in pagos_anticipados_ids:
-            resumen["cuentas_con_pagos_anticipados"] += 1
+    @action(detail=False, methods=["get"], url_path=r"(?P<anio>\d{4})/progreso")
+    def progreso(self, request, anio=None):
+        """
+        GET /cierre-anual/<anio>/progreso/
+        Estado y avance del cierre (pensado para consultarse periódicamente).
+        """
+        cierre = CierreAnual.objects.filter(anio=int(anio)).first()
+        if cierre is None:
+            return Response(
+                {"error": "No hay cierre registrado para ese año"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(CierreProgresoSerializer(cierre).data, status=status.HTTP_200_OK)
 
-    return resumen
 
-class EstadoCuentaNewViewSet(viewsets.ReadOnlyModelViewSet):
+class EstadoCuentaNewViewSet(VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class   = EstadoCuentaNewSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends    = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields   = ["id_cuentahabiente", "anio", "deuda_actualizada",
                           "tipo_movimiento", "id_cobrador"]
     ordering_fields    = ["anio", "numero_contrato", "saldo_pendiente_actualizado"]
+    ordering           = ["numero_contrato", "anio"]
+    pagination_class   = KeysetPagination
 
     def get_queryset(self):
         return EstadoCuentaNew.objects.all()
@@ -413,7 +422,7 @@ class ReporteCargosFilter(django_filters.FilterSet):
         ]
 
 
-class ReporteCargosViewSet(viewsets.ReadOnlyModelViewSet):
+class ReporteCargosViewSet(ExportarMixin, VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):
     """
     Filtros disponibles:
       ?id_cobrador=1
@@ -423,14 +432,17 @@ class ReporteCargosViewSet(viewsets.ReadOnlyModelViewSet):
       ?anio=2024          ← nuevo
     """
     serializer_class   = ReporteCargosSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends    = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class    = ReporteCargosFilter   # ← reemplaza filterset_fields
     ordering_fields    = ["fecha_cargo", "fecha_pago", "saldo_restante_cargo"]
+    ordering           = ["numero_contrato", "fecha_cargo"]
+    pagination_class   = KeysetPagination
 
     def get_queryset(self):
         return ReporteCargos.objects.all()
-class ReportePadronGeneralViewSet(viewsets.ReadOnlyModelViewSet):
+class ReportePadronGeneralViewSet(ExportarMixin, VistaMaterializadaMixin, viewsets.ReadOnlyModelViewSet):
     """
     Filtros disponibles:
       ?anio_reporte=2024
@@ -438,10 +450,13 @@ class ReportePadronGeneralViewSet(viewsets.ReadOnlyModelViewSet):
       ?tipo_servicio=Agua Potable
     """
     serializer_class   = ReportePadronGeneralSerializer
+    authentication_classes = [JWTClaimsAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends    = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields   = ["anio_reporte", "id_cuentahabiente", "tipo_servicio"]
     ordering_fields    = ["anio_reporte", "numero_contrato", "total_pagado_general"]
+    ordering           = ["numero_contrato", "anio_reporte"]
+    pagination_class   = KeysetPagination
 
     def get_queryset(self):
         return ReportePadronGeneral.objects.all()
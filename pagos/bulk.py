@@ -0,0 +1,165 @@
+# pagos/bulk.py
+"""
+Captura de pagos en lote (tablets de cobradores que trabajaron sin conexión).
+
+- Valida todos los renglones sin tocar la BD.
+- Reintentos: las idempotency_key ya usadas se resuelven en una consulta y
+  devuelven la respuesta original.
+- Precarga descuentos, cargos pendientes y cierres en una consulta cada
+  uno; los cierres se leen dentro de la transacción, ya con las cuentas
+  bloqueadas.
+- Bloquea las cuentas involucradas en orden de id (dos lotes con cuentas en
+  común no se bloquean en cruz) y registra cada pago en su propio savepoint:
+  un renglón con error no tumba a los demás.
+"""
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from cargos.models import Cargo
+from cuentahabientes import saldos
+from cuentahabientes.models import Cuentahabiente
+from descuento.models import Descuento
+from .idempotencia import ALCANCE_PAGO, buscar_claves, guardar_clave, huella
+from .serializers import PagoBulkItemSerializer, PagoCreateSerializer, PagoReadSerializer
+
+CREADO = "creado"
+DUPLICADO = "duplicado"
+ERROR = "error"
+
+
+def _resultado(indice, clave, estado, status_code, **extra):
+    return {
+        "indice": indice,
+        "idempotency_key": clave,
+        "estado": estado,
+        "status_code": status_code,
+        **extra,
+    }
+
+
+def _repeticion(indice, previa, huella_datos):
+    if previa.huella != huella_datos:
+        return _resultado(
+            indice, previa.clave, ERROR, 422,
+            errores=["La idempotency_key ya se usó con otros datos."],
+        )
+    return _resultado(indice, previa.clave, DUPLICADO, previa.status_code, pago=previa.respuesta)
+
+
+def registrar_pagos_en_lote(items, cobrador):
+    """Devuelve un resultado por renglón, en el mismo orden que `items`."""
+    resultados = [None] * len(items)
+
+    # ── 1. Validación (sin BD) ───────────────────────────────────────────
+    validos = []  # (indice, validated_data, huella)
+    claves_lote = set()
+    for i, item in enumerate(items):
+        ser = PagoBulkItemSerializer(data=item)
+        if not ser.is_valid():
+            clave = item.get("idempotency_key") if isinstance(item, dict) else None
+            resultados[i] = _resultado(i, clave, ERROR, 400, errores=ser.errors)
+            continue
+
+        data = ser.validated_data
+        clave = data["idempotency_key"]
+        if clave in claves_lote:
+            resultados[i] = _resultado(
+                i, clave, ERROR, 400, errores=["idempotency_key repetida dentro del lote."]
+            )
+            continue
+        claves_lote.add(clave)
+        validos.append((i, data, huella({k: v for k, v in data.items() if k != "idempotency_key"})))
+
+    # ── 2. Reintentos ya registrados ─────────────────────────────────────
+    previas = buscar_claves(cobrador, ALCANCE_PAGO, [d["idempotency_key"] for _, d, _ in validos])
+    pendientes = []
+    for i, data, h in validos:
+        previa = previas.get(data["idempotency_key"])
+        if previa is None:
+            pendientes.append((i, data, h))
+        else:
+            resultados[i] = _repeticion(i, previa, h)
+
+    if not pendientes:
+        return resultados
+
+    # ── 3. Precarga ──────────────────────────────────────────────────────
+    cuenta_ids = sorted({d["cuentahabiente"] for _, d, _ in pendientes})
+    descuentos = Descuento.objects.in_bulk(
+        {d["descuento"] for _, d, _ in pendientes if d.get("descuento")}
+    )
+    creador = PagoCreateSerializer()
+
+    with transaction.atomic():
+        # ── 4. Bloqueo en orden de id ────────────────────────────────────
+        cuentas = {
+            c.pk: c
+            for c in Cuentahabiente.objects.select_for_update(of=("self",))
+            .select_related("servicio")
+            .filter(pk__in=cuenta_ids)
+            .order_by("pk")
+        }
+        con_cargos = set(
+            Cargo.objects.filter(cuentahabiente_id__in=cuenta_ids, saldo_restante_cargo__gt=0)
+            .values_list("cuentahabiente_id", flat=True)
+            .distinct()
+        )
+        cierres = saldos.leer_cierres()
+
+        # ── 5. Un savepoint por pago ─────────────────────────────────────
+        for i, data, h in pendientes:
+            resultados[i] = _registrar(
+                i, data, h, cobrador, cuentas, descuentos, con_cargos, cierres, creador
+            )
+
+    return resultados
+
+
+def _registrar(indice, data, huella_datos, cobrador, cuentas, descuentos, con_cargos, cierres, creador):
+    clave = data["idempotency_key"]
+
+    ch = cuentas.get(data["cuentahabiente"])
+    if ch is None:
+        return _resultado(indice, clave, ERROR, 400, errores={"cuentahabiente": ["No existe la cuenta."]})
+
+    descuento = None
+    if data.get("descuento"):
+        descuento = descuentos.get(data["descuento"])
+        if descuento is None:
+            return _resultado(indice, clave, ERROR, 400, errores={"descuento": ["No existe el descuento."]})
+
+    if ch.pk in con_cargos:
+        return _resultado(
+            indice, clave, ERROR, 400,
+            errores=["Debe liquidar todos los cargos antes de pagar la tarifa"],
+        )
+
+    saldo_antes, deuda_antes = ch.saldo_pendiente, ch.deuda
+    try:
+        with transaction.atomic():
+            pago = creador.registrar(
+                ch,
+                cobrador,
+                {
+                    "cuentahabiente": ch,
+                    "descuento": descuento,
+                    "fecha_pago": data["fecha_pago"],
+                    "monto_recibido": data["monto_recibido"],
+                    "comentarios": data.get("comentarios"),
+                },
+                cierres=cierres,
+            )
+            respuesta = PagoReadSerializer(pago).data
+            guardar_clave(cobrador, ALCANCE_PAGO, clave, huella_datos, 201, respuesta)
+    except serializers.ValidationError as exc:
+        ch.saldo_pendiente, ch.deuda = saldo_antes, deuda_antes
+        return _resultado(indice, clave, ERROR, 400, errores=exc.detail)
+    except IntegrityError:
+        # Otro envío del mismo lote ganó la carrera y ya guardó esta clave
+        ch.saldo_pendiente, ch.deuda = saldo_antes, deuda_antes
+        previa = buscar_claves(cobrador, ALCANCE_PAGO, [clave]).get(clave)
+        if previa is None:
+            raise
+        return _repeticion(indice, previa, huella_datos)
+
+    return _resultado(indice, clave, CREADO, 201, pago=respuesta)
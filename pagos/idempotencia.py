@@ -0,0 +1,142 @@
+# pagos/idempotencia.py
+"""
+Claves de idempotencia para escrituras de pagos.
+
+El cliente genera una clave por operación; la respuesta original se guarda
+en pago_idempotencia en la misma transacción que el pago. Un reintento con
+la misma clave (y los mismos datos) recibe esa respuesta sin volver a cobrar.
+
+Para endpoints individuales el cliente manda el header Idempotency-Key
+(ver @idempotente); en POST /pago/bulk/ cada renglón trae su clave.
+Las claves viejas se borran con `manage.py limpiar_idempotencia`.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import ClaveIdempotencia
+
+ALCANCE_PAGO = "pago"
+ALCANCE_PAGAR_CARGO = "pagar_cargo"
+
+HEADER = "Idempotency-Key"
+HEADER_REPETIDA = "Idempotent-Replayed"
+MAX_LARGO_CLAVE = 100
+
+
+def ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCIA_SETTINGS", {}).get("TTL_HORAS", 72))
+
+
+def huella(datos):
+    """sha256 de los datos normalizados (orden de llaves y tipos no importan)."""
+    texto = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def buscar_claves(cobrador, alcance, claves):
+    """{clave: ClaveIdempotencia} de las claves ya usadas por el cobrador (una consulta)."""
+    if not claves:
+        return {}
+    return {
+        c.clave: c
+        for c in ClaveIdempotencia.objects.filter(
+            cobrador=cobrador, alcance=alcance, clave__in=set(claves)
+        )
+    }
+
+
+def guardar_clave(cobrador, alcance, clave, huella_datos, status_code, respuesta):
+    """Debe llamarse dentro de la transacción del pago; choca (IntegrityError) si la clave ya existe."""
+    return ClaveIdempotencia.objects.create(
+        cobrador=cobrador,
+        alcance=alcance,
+        clave=clave,
+        huella=huella_datos,
+        status_code=status_code,
+        # Tal cual la recibió el cliente (Decimal / fechas como los renderiza DRF)
+        respuesta=json.loads(json.dumps(respuesta, cls=JSONEncoder)),
+    )
+
+
+def purgar_vencidas(antes_de=None, lote=5000):
+    """Borra claves más viejas que el TTL, por lotes. Devuelve cuántas borró."""
+    limite = antes_de or (timezone.now() - ttl())
+    total = 0
+    while True:
+        ids = list(
+            ClaveIdempotencia.objects.filter(creado_en__lt=limite)
+            .values_list("pk", flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += ClaveIdempotencia.objects.filter(pk__in=ids).delete()[0]
+
+
+def _respuesta_guardada(previa, huella_datos):
+    if previa.huella != huella_datos:
+        return Response(
+            {"error": f"El {HEADER} ya se usó con otros datos."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(previa.respuesta, status=previa.status_code, headers={HEADER_REPETIDA: "true"})
+
+
+def idempotente(alcance):
+    """
+    Decorador para el método POST de una vista de pagos.
+
+    Sin header Idempotency-Key la vista corre igual que siempre. Con header:
+    - Si la clave ya existe, devuelve la respuesta original (sin validar ni
+      bloquear nada) con Idempotent-Replayed: true.
+    - Si no, corre la vista y, si responde 2xx, guarda la respuesta en la
+      misma transacción. Dos envíos simultáneos: el segundo choca con el
+      índice único, se revierte completo y recibe la respuesta del primero.
+    - Las respuestas de error no se guardan: el cliente puede corregir y
+      reintentar con la misma clave.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            clave = request.headers.get(HEADER)
+            if not clave:
+                return metodo(self, request, *args, **kwargs)
+            if len(clave) > MAX_LARGO_CLAVE:
+                return Response(
+                    {"error": f"{HEADER} admite máximo {MAX_LARGO_CLAVE} caracteres."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            datos = request.data.dict() if hasattr(request.data, "dict") else request.data
+            huella_datos = huella(datos)
+            cobrador = request.user
+
+            previa = buscar_claves(cobrador, alcance, [clave]).get(clave)
+            if previa is not None:
+                return _respuesta_guardada(previa, huella_datos)
+
+            try:
+                with transaction.atomic():
+                    response = metodo(self, request, *args, **kwargs)
+                    if 200 <= response.status_code < 300:
+                        guardar_clave(
+                            cobrador, alcance, clave, huella_datos,
+                            response.status_code, response.data,
+                        )
+            except IntegrityError:
+                previa = buscar_claves(cobrador, alcance, [clave]).get(clave)
+                if previa is None:
+                    raise
+                return _respuesta_guardada(previa, huella_datos)
+            return response
+
+        return envoltura
+    return decorador
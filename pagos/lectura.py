@@ -0,0 +1,69 @@
+# pagos/lectura.py
+"""
+Lectura rápida para GET /pago/.
+
+El listado no instancia Pago / Cuentahabiente / Cobrador / Descuento ni
+pasa por PagoReadSerializer: un solo SELECT con .values() trae las columnas
+pedidas, el nombre del cuentahabiente se concatena en la BD y cada renglón
+ya es el dict que se serializa. El JSON es el mismo que el del serializer
+(mismas llaves, mismo orden; `descuento_nombre` se omite cuando el pago no
+tiene descuento, igual que DRF).
+
+?fields=id_pago,fecha_pago,... limita las columnas (y los JOIN): solo se
+une cuentahabiente / cobrador / descuento si se pidió algún campo suyo.
+"""
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Concat
+from rest_framework import serializers
+
+from .serializers import PagoReadSerializer
+
+CAMPOS = PagoReadSerializer.Meta.fields
+PARAM_CAMPOS = "fields"
+
+_EXPRESIONES = {
+    "descuento_nombre": F("descuento__nombre_descuento"),
+    "cobrador_usuario": F("cobrador__usuario"),
+    "cuentahabiente_nombre": Concat(
+        "cuentahabiente__nombres", Value(" "),
+        "cuentahabiente__ap", Value(" "),
+        "cuentahabiente__am",
+        output_field=CharField(),
+    ),
+    "saldo_pendiente_actual": F("cuentahabiente__saldo_pendiente"),
+    "estatus_deuda": F("cuentahabiente__deuda"),
+}
+
+
+def campos_solicitados(request):
+    """Campos de ?fields= en el orden del serializer; todos si no viene."""
+    valor = request.query_params.get(PARAM_CAMPOS)
+    if not valor:
+        return CAMPOS
+    pedidos = {c.strip() for c in valor.split(",") if c.strip()}
+    desconocidos = pedidos - set(CAMPOS)
+    if desconocidos:
+        raise serializers.ValidationError(
+            {PARAM_CAMPOS: [f"Campos desconocidos: {', '.join(sorted(desconocidos))}"]}
+        )
+    return tuple(c for c in CAMPOS if c in pedidos)
+
+
+def proyectar(queryset, campos, extra=()):
+    """
+    queryset.values() con los campos pedidos. `extra`: columnas que hacen
+    falta aunque no se devuelvan (p. ej. las llaves del cursor).
+    """
+    columnas = list(dict.fromkeys([*campos, *extra]))
+    return queryset.values(
+        *[c for c in columnas if c not in _EXPRESIONES],
+        **{c: _EXPRESIONES[c] for c in columnas if c in _EXPRESIONES},
+    )
+
+
+def renglon(fila, campos):
+    """Dict de values() → mismo dict que PagoReadSerializer(pago).data."""
+    datos = {c: fila[c] for c in campos}
+    if datos.get("descuento_nombre", "") is None:
+        del datos["descuento_nombre"]
+    return datos
@@ -0,0 +1,126 @@
+# Ubicación: pagos/management/commands/benchmark_lectura_pagos.py
+
+import random
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from cobrador.models import Cobrador
+from colonia.models import Colonia
+from cuentahabientes.models import Cuentahabiente
+from descuento.models import Descuento
+from pagos.lectura import CAMPOS, proyectar, renglon
+from pagos.models import Pago
+from pagos.serializers import PagoReadSerializer
+from servicio.models import Servicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide renglones/s del listado de pagos: PagoReadSerializer sobre "
+        "select_related (antes) contra la proyección .values() (después), y "
+        "verifica que el JSON sea idéntico. Genera un padrón de prueba dentro "
+        "de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pagos", type=int, default=100_000,
+                            help="Pagos del fixture (default 100000).")
+        parser.add_argument("--cuentas", type=int, default=5_000,
+                            help="Cuentahabientes del fixture (default 5000).")
+        parser.add_argument("--repeticiones", type=int, default=3,
+                            help="Se reporta la mejor de N corridas (default 3).")
+        parser.add_argument("--usar-existentes", action="store_true",
+                            help="No generar fixture: medir sobre los pagos que ya hay.")
+
+    def handle(self, *args, **opts):
+        if opts["pagos"] <= 0 or opts["cuentas"] <= 0 or opts["repeticiones"] <= 0:
+            raise CommandError("--pagos, --cuentas y --repeticiones deben ser mayores que 0.")
+
+        with transaction.atomic():
+            if not opts["usar_existentes"]:
+                self._fixture(opts["pagos"], opts["cuentas"])
+            self._medir(opts["repeticiones"])
+            transaction.set_rollback(True)
+
+    def _fixture(self, num_pagos, num_cuentas):
+        rnd = random.Random(100_000)
+        inicio = time.monotonic()
+
+        cobrador = Cobrador.objects.create(
+            nombre="Bench", apellidos="Pagos", email="bench-pagos@test.mx",
+            usuario="bench_pagos", password="secreto123",
+        )
+        colonia = Colonia.objects.create(nombre_colonia="Bench", codigo_postal=90000)
+        servicio = Servicio.objects.create(nombre="Bench", costo=Decimal("720.00"))
+        descuentos = [
+            Descuento.objects.create(nombre_descuento=f"Bench {n}", porcentaje=Decimal("60.00"))
+            for n in range(3)
+        ]
+        base = (Cuentahabiente.objects.order_by("-numero_contrato")
+                .values_list("numero_contrato", flat=True).first() or 0) + 1
+        cuentas = Cuentahabiente.objects.bulk_create(
+            [
+                Cuentahabiente(
+                    numero_contrato=base + n, nombres=f"Nombre{n}", ap="Paterno", am="Materno",
+                    telefono="0", colonia=colonia, servicio=servicio,
+                    saldo_pendiente=rnd.choice([0, 120, 720]),
+                )
+                for n in range(num_cuentas)
+            ],
+            batch_size=2000,
+        )
+        Pago.objects.bulk_create(
+            [
+                Pago(
+                    cuentahabiente=rnd.choice(cuentas), cobrador=cobrador,
+                    descuento=rnd.choice(descuentos + [None, None]),
+                    fecha_pago=date(2025, rnd.randint(1, 12), rnd.randint(1, 28)),
+                    monto_recibido=rnd.choice([60, 100, 300, 720]), monto_descuento=0,
+                    mes="01", anio=2025, comentarios=rnd.choice([None, "ventanilla"]),
+                )
+                for _ in range(num_pagos)
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f"Fixture: {num_pagos} pagos / {num_cuentas} cuentas en {time.monotonic() - inicio:.1f}s"
+        )
+
+    def _medir(self, repeticiones):
+        queryset = (
+            Pago.objects.select_related("descuento", "cobrador", "cuentahabiente")
+            .order_by("-fecha_pago", "-id_pago")
+        )
+        renderer = JSONRenderer()
+
+        def antes():
+            return renderer.render(PagoReadSerializer(queryset, many=True).data)
+
+        def despues():
+            return renderer.render([renglon(f, CAMPOS) for f in proyectar(queryset, CAMPOS)])
+
+        total = queryset.count()
+        resultados = {}
+        for nombre, funcion in (("serializer", antes), ("proyección", despues)):
+            mejor, salida = None, None
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                salida = funcion()
+                tiempo = time.perf_counter() - inicio
+                mejor = tiempo if mejor is None else min(mejor, tiempo)
+            resultados[nombre] = (mejor, salida)
+            self.stdout.write(
+                f"  {nombre:<11} {mejor:7.2f}s  {total / mejor:>10,.0f} renglones/s"
+            )
+
+        (t_antes, json_antes), (t_despues, json_despues) = resultados.values()
+        if json_antes != json_despues:
+            raise CommandError("El JSON de la proyección no coincide con el del serializer.")
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ JSON idéntico ({total} pagos); {t_antes / t_despues:.1f}x más rápido"
+        ))
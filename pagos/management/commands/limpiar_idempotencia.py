@@ -0,0 +1,24 @@
+# Ubicación: pagos/management/commands/limpiar_idempotencia.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pagos.idempotencia import purgar_vencidas, ttl
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las claves de idempotencia de pagos más viejas que "
+        "IDEMPOTENCIA_SETTINGS['TTL_HORAS'] (programarlo diario)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horas", type=int, default=None,
+                            help="Sobrescribe el TTL configurado.")
+
+    def handle(self, *args, **opts):
+        vigencia = timedelta(hours=opts["horas"]) if opts["horas"] is not None else ttl()
+        borradas = purgar_vencidas(antes_de=timezone.now() - vigencia)
+        self.stdout.write(self.style.SUCCESS(f"✔ {borradas} claves de idempotencia borradas"))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobrador', '0006_alter_cobrador_role'),
+        ('pagos', '0004_rename_coment_pago_comentarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alcance', models.CharField(max_length=20)),
+                ('clave', models.CharField(max_length=100)),
+                ('huella', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('respuesta', models.JSONField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('cobrador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cobrador.cobrador')),
+            ],
+            options={
+                'db_table': 'pago_idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('cobrador', 'alcance', 'clave'), name='pago_idempotencia_unica')],
+            },
+        ),
+    ]
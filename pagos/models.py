@@ -21,3 +21,26 @@ class Pago(models.Model):
 
 
     
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    Respuesta guardada de una escritura de pagos, por cobrador + alcance + clave.
+    Un reintento con la misma clave recibe esta respuesta en lugar de volver
+    a cobrar. `huella` (sha256 del cuerpo) detecta la misma clave con otros datos.
+    """
+    cobrador = models.ForeignKey(Cobrador, on_delete=models.CASCADE)
+    alcance = models.CharField(max_length=20)  # "pago", "pagar_cargo"
+    clave = models.CharField(max_length=100)
+    huella = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    respuesta = models.JSONField()
+    creado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "pago_idempotencia"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cobrador", "alcance", "clave"], name="pago_idempotencia_unica"
+            ),
+        ]
@@ -4,7 +4,9 @@ from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 from .models import Pago
-from cuentahabientes.models import CierreAnual, Cuentahabiente
+from corte import recaudacion
+from cuentahabientes import saldos
+from cuentahabientes.models import Cuentahabiente
 from descuento.models import Descuento
 
 
@@ -116,6 +118,35 @@ class PagoCreateSerializer(serializers.ModelSerializer):
         else:
             return 'adeudo'
 
+    # ---- Cierres que bloquean el año del pago ----
+    def validar_cierres(self, anio_num, anio_actual, cierres):
+        # ejecutado del cierre siguiente si ya corrió o quedó a medias (por lotes)
+        cierre_siguiente_ejecutado = cierres.get(anio_num + 1)
+
+        if cierre_siguiente_ejecutado:
+            raise serializers.ValidationError(
+                f"El año {anio_num} ya fue cerrado. "
+                "Debe liquidar el adeudo como cargo."
+            )
+
+        # Durante el cierre por lotes parte de las cuentas ya tiene saldo del
+        # año nuevo: un pago del año que cierra lo descontaría del saldo equivocado.
+        if cierre_siguiente_ejecutado is False:
+            raise serializers.ValidationError(
+                f"El cierre anual {anio_num + 1} está en proceso o quedó incompleto. "
+                "Intente de nuevo cuando termine."
+            )
+
+        # Bloquear pagos si no se ha ejecutado el cierre anual
+        if anio_num == anio_actual:
+            cierre_ejecutado = cierres.get(anio_actual) is True
+
+            if not cierre_ejecutado:
+                raise serializers.ValidationError(
+                    f"No se pueden registrar pagos del año {anio_actual} "
+                    "sin haber ejecutado el cierre anual."
+                )
+
     # ---- Creación del pago ----
     @transaction.atomic
     def create(self, validated_data):
@@ -123,10 +154,16 @@ class PagoCreateSerializer(serializers.ModelSerializer):
         if not request or not getattr(request.user, "is_authenticated", False):
             raise serializers.ValidationError("Autenticación requerida.")
 
-        cobrador = request.user
         ch = validated_data["cuentahabiente"]
         ch_locked = Cuentahabiente.objects.select_for_update().get(pk=ch.pk)
+        return self.registrar(ch_locked, request.user, validated_data)
 
+    def registrar(self, ch_locked, cobrador, validated_data, cierres=None):
+        """
+        Aplica el pago sobre una cuenta ya bloqueada (select_for_update).
+        `cierres`: saldos.leer_cierres() de esta transacción; por defecto se
+        consulta aquí. También da el año vigente de cuentahabiente_saldo.
+        """
         # ✅ Normaliza fecha_pago
         fecha_pago = validated_data["fecha_pago"]
         if isinstance(fecha_pago, datetime) and timezone.is_naive(fecha_pago):
@@ -143,29 +180,9 @@ class PagoCreateSerializer(serializers.ModelSerializer):
                 "No se permiten pagos con fecha en el futuro."
             )
 
-        cierre_siguiente_ejecutado = CierreAnual.objects.filter(
-            anio=anio_num + 1,
-            ejecutado=True
-        ).exists()
-
-        if cierre_siguiente_ejecutado:
-            raise serializers.ValidationError(
-                f"El año {anio_num} ya fue cerrado. "
-                "Debe liquidar el adeudo como cargo."
-            )
-
-        # Bloquear pagos si no se ha ejecutado el cierre anual
-        if anio_num == anio_actual:
-            cierre_ejecutado = CierreAnual.objects.filter(
-                anio=anio_actual,
-                ejecutado=True
-            ).exists()
-
-            if not cierre_ejecutado:
-                raise serializers.ValidationError(
-                    f"No se pueden registrar pagos del año {anio_actual} "
-                    "sin haber ejecutado el cierre anual."
-                )
+        if cierres is None:
+            cierres = saldos.leer_cierres()
+        self.validar_cierres(anio_num, anio_actual, cierres)
 
         monto_recibido = Decimal(validated_data["monto_recibido"])
         descuento_obj = validated_data.get("descuento")
@@ -213,6 +230,8 @@ class PagoCreateSerializer(serializers.ModelSerializer):
             anio=anio_num,
             comentarios=comentarios,
         )
+        saldos.registrar_pago(pago, ch_locked, cierres)
+        recaudacion.registrar_pago(pago)
         return pago
 
 
@@ -220,6 +239,8 @@ class PagoReadSerializer(serializers.ModelSerializer):
     """
     Serializer para LEER pagos.
     ✅ SOLUCIÓN: Retorna fecha_pago como string YYYY-MM-DD sin timezone
+    `campos`: subconjunto de Meta.fields a devolver (?fields=).
+    El listado usa pagos/lectura.py, que devuelve el mismo JSON sin serializer.
     """
     descuento_nombre = serializers.CharField(source="descuento.nombre_descuento", read_only=True)
     cobrador_usuario = serializers.CharField(source="cobrador.usuario", read_only=True)
@@ -247,6 +268,12 @@ class PagoReadSerializer(serializers.ModelSerializer):
             "estatus_deuda",
         )
 
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
     def get_cuentahabiente_nombre(self, obj):
         ch = obj.cuentahabiente
         return f"{ch.nombres} {ch.ap} {ch.am}"
@@ -271,3 +298,25 @@ class PagoReadSerializer(serializers.ModelSerializer):
         
         # Fallback
         return str(fp)
+
+
+class PagoBulkItemSerializer(serializers.Serializer):
+    """
+    Un pago dentro de POST /pago/bulk/.
+    Las llaves foráneas llegan como id y se resuelven contra datos precargados
+    (sin una consulta por renglón).
+    """
+    idempotency_key = serializers.CharField(max_length=100)
+    cuentahabiente = serializers.IntegerField()
+    descuento = serializers.IntegerField(required=False, allow_null=True)
+    fecha_pago = serializers.DateField()
+    monto_recibido = serializers.IntegerField()
+    mes = serializers.CharField(max_length=20, required=False)
+    anio = serializers.IntegerField(required=False)
+    comentarios = serializers.CharField(
+        max_length=256, required=False, allow_blank=True, allow_null=True
+    )
+
+    def validate(self, attrs):
+        # Mismas reglas de monto y mes/anio que el alta individual
+        return PagoCreateSerializer().validate(attrs)
@@ -1,3 +1,337 @@
+from datetime import date
+from io import StringIO
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cargos.models import Cargo, TipoCargo
+from cobrador.jwt_utils import create_access_token
+from cobrador.models import Cobrador
+from colonia.models import Colonia
+from corte import recaudacion
+from corte.models import RecaudacionDiaria
+from cuentahabientes import saldos
+from cuentahabientes.models import CierreAnual, Cuentahabiente, CuentahabienteSaldo
+from descuento.models import Descuento
+from servicio.models import Servicio
+from sicap_backend.pagination import KeysetPagination
+from .models import Pago
+from .serializers import PagoReadSerializer
+from .views import PagoViewSet
+
+
+class PagosFixtureMixin:
+    """Cierre del año ejecutado, tres cuentas (la tercera con un cargo pendiente)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anio = timezone.localtime().year
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Cobra", apellidos="Dor", email="bulk@test.mx",
+            usuario="bulk", password="secreto123", role="cobrador",
+        )
+        CierreAnual.objects.create(
+            anio=cls.anio, ejecutado=True, ejecutado_por=cls.cobrador,
+            estado=CierreAnual.ESTADO_COMPLETADO,
+        )
+        colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        servicio = Servicio.objects.create(nombre="Doméstico", costo=Decimal("720.00"))
+        cls.cuentas = [
+            Cuentahabiente.objects.create(
+                numero_contrato=100 + n, nombres=f"N{n}", ap="Ap", am="Am", telefono="0",
+                colonia=colonia, servicio=servicio, saldo_pendiente=720,
+            )
+            for n in range(3)
+        ]
+        tipo = TipoCargo.objects.create(nombre="Reconexión", monto=Decimal("100.00"))
+        Cargo.objects.create(
+            cuentahabiente=cls.cuentas[2], tipo_cargo=tipo, saldo_restante_cargo=100,
+            fecha_cargo=date(cls.anio, 1, 1), activo=True,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.cobrador.pk})
+        )
+        fecha = date(self.anio, 1, 1).isoformat()
+        self.items = [
+            {"idempotency_key": "t-1", "cuentahabiente": self.cuentas[0].pk,
+             "fecha_pago": fecha, "monto_recibido": 100},
+            {"idempotency_key": "t-2", "cuentahabiente": self.cuentas[0].pk,
+             "fecha_pago": fecha, "monto_recibido": 200},
+            {"idempotency_key": "t-3", "cuentahabiente": self.cuentas[1].pk,
+             "fecha_pago": fecha, "monto_recibido": 5000},
+            {"idempotency_key": "t-4", "cuentahabiente": self.cuentas[2].pk,
+             "fecha_pago": fecha, "monto_recibido": 50},
+        ]
+
+
+class PagoBulkTests(PagosFixtureMixin, TestCase):
+    """POST /pago/bulk/: resultados por renglón y reintentos sin doble cobro."""
+
+    def test_resultados_por_renglon(self):
+        r = self.client.post("/pago/bulk/", self.items, format="json")
+
+        self.assertEqual(r.status_code, 200, r.content)
+        estados = [x["estado"] for x in r.json()["resultados"]]
+        self.assertEqual(estados, ["creado", "creado", "error", "error"])
+        self.assertEqual(r.json()["resultados"][1]["pago"]["saldo_pendiente_actual"], 420)
+
+        self.cuentas[0].refresh_from_db()
+        self.assertEqual(self.cuentas[0].saldo_pendiente, 420)
+        self.assertEqual(Pago.objects.count(), 2)
+
+    def test_reintento_no_cobra_dos_veces(self):
+        primero = self.client.post("/pago/bulk/", {"pagos": self.items[:2]}, format="json").json()
+        segundo = self.client.post("/pago/bulk/", {"pagos": self.items[:2]}, format="json").json()
+
+        self.assertEqual(segundo["duplicados"], 2)
+        self.assertEqual(
+            [x["pago"] for x in segundo["resultados"]],
+            [x["pago"] for x in primero["resultados"]],
+        )
+        self.assertEqual(Pago.objects.count(), 2)
+
+        # Misma clave con otro monto: no se registra
+        otro = dict(self.items[0], monto_recibido=1)
+        r = self.client.post("/pago/bulk/", [otro], format="json").json()
+        self.assertEqual(r["resultados"][0]["status_code"], 422)
+        self.assertEqual(Pago.objects.count(), 2)
+
+
+class CierreEnEscrituraTests(PagosFixtureMixin, TestCase):
+    """Las altas validan contra cierre_anual dentro de su transacción."""
+
+    def test_cierre_de_otro_worker_bloquea_pagos(self):
+        # Cierre iniciado en otro worker: sin signal en este proceso
+        CierreAnual.objects.bulk_create([CierreAnual(
+            anio=self.anio + 1, ejecutado_por=self.cobrador, estado=CierreAnual.ESTADO_EN_PROCESO,
+        )])
+
+        datos = {k: v for k, v in self.items[0].items() if k != "idempotency_key"}
+        r = self.client.post("/pago/", datos, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("en proceso", str(r.json()))
+
+        r = self.client.post("/pago/bulk/", self.items[:1], format="json")
+        self.assertEqual(r.json()["resultados"][0]["estado"], "error")
+        self.assertFalse(Pago.objects.exists())
+
+
+class IdempotencyKeyTests(PagosFixtureMixin, TestCase):
+    """Header Idempotency-Key en POST /pago/ y POST /pagar-cargo/."""
+
+    def test_pago_repetido_devuelve_respuesta_original(self):
+        datos = {k: v for k, v in self.items[0].items() if k != "idempotency_key"}
+
+        r1 = self.client.post("/pago/", datos, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        with self.assertNumQueries(1):
+            r2 = self.client.post("/pago/", datos, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(r1.status_code, 201, r1.content)
+        self.assertEqual(r2.status_code, 201)
+        self.assertEqual(r2.json(), r1.json())
+        self.assertEqual(r2["Idempotent-Replayed"], "true")
+        self.assertEqual(Pago.objects.count(), 1)
+
+        r3 = self.client.post("/pago/", dict(datos, monto_recibido=5), format="json",
+                              HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(r3.status_code, 422)
+
+    def test_pagar_cargo_repetido(self):
+        datos = {"cuentahabiente_id": self.cuentas[2].pk, "monto": "40.00"}
+
+        r1 = self.client.post("/pagar-cargo/", datos, format="json", HTTP_IDEMPOTENCY_KEY="c-1")
+        r2 = self.client.post("/pagar-cargo/", datos, format="json", HTTP_IDEMPOTENCY_KEY="c-1")
+
+        self.assertEqual(r1.status_code, 200, r1.content)
+        self.assertEqual(r2.json(), r1.json())
+        self.assertEqual(
+            Cargo.objects.get(cuentahabiente=self.cuentas[2]).saldo_restante_cargo, Decimal("60.00")
+        )
+
+    def test_errores_no_se_guardan(self):
+        datos = {k: v for k, v in self.items[2].items() if k != "idempotency_key"}  # sobrepago
+
+        r1 = self.client.post("/pago/", datos, format="json", HTTP_IDEMPOTENCY_KEY="x")
+        self.assertEqual(r1.status_code, 400)
+
+        datos["monto_recibido"] = 100
+        r2 = self.client.post("/pago/", datos, format="json", HTTP_IDEMPOTENCY_KEY="x")
+        self.assertEqual(r2.status_code, 201, r2.content)
+
+
+class CuentahabienteSaldoTests(PagosFixtureMixin, TestCase):
+    """cuentahabiente_saldo se mantiene al pagar y rebuild_saldos lo verifica."""
+
+    def setUp(self):
+        super().setUp()
+        call_command("rebuild_saldos", stdout=StringIO())
+
+    def _fila(self, cuenta):
+        return CuentahabienteSaldo.objects.get(cuentahabiente=cuenta, anio=self.anio)
+
+    def test_pagos_actualizan_resumen(self):
+        self.assertEqual(self._fila(self.cuentas[2]).cargos_pendientes, Decimal("100.00"))
+
+        self.client.post("/pago/bulk/", self.items[:2], format="json")
+        r = self.client.post(
+            "/pagar-cargo/", {"cuentahabiente_id": self.cuentas[2].pk, "monto": "40.00"}, format="json"
+        )
+        self.assertEqual(r.status_code, 200, r.content)
+
+        fila = self._fila(self.cuentas[0])
+        self.assertEqual((fila.total_pagado, fila.num_pagos), (Decimal("300.00"), 2))
+        self.assertEqual((fila.saldo_pendiente, fila.ultimo_pago), (420, date(self.anio, 1, 1)))
+
+        fila = self._fila(self.cuentas[2])
+        self.assertEqual(fila.total_pagado_cargos, Decimal("40.00"))
+        self.assertEqual(fila.cargos_pendientes, Decimal("60.00"))
+        self.assertEqual(saldos.verificar(), [])
+
+    def test_estado_cuenta_resumen_lee_el_resumen(self):
+        self.client.post("/pago/bulk/", self.items[:2], format="json")
+        cuenta = self.cuentas[0]
+        cuenta.refresh_from_db()
+
+        with self.assertNumQueries(2):  # count de la página + una consulta con la cuenta y el servicio
+            r = self.client.get("/estado-cuenta-resumen/", {"numero_contrato": cuenta.numero_contrato})
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(r.json()["results"], [{
+            "id_cuentahabiente": cuenta.pk,
+            "numero_contrato": cuenta.numero_contrato,
+            "anio": self.anio,
+            "nombre_servicio": "Doméstico",
+            "estatus": dict(Cuentahabiente.ESTATUS_DEUDA)[cuenta.deuda],
+            "saldo_pendiente": "420.00",
+        }])
+
+        r = self.client.get("/estado-cuenta-resumen/")
+        self.assertEqual(r.json()["results"], [])
+        r = self.client.get("/estado-cuenta-resumen/", {"id_cuentahabiente": "x"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_verificar_detecta_y_corrige(self):
+        CuentahabienteSaldo.objects.filter(cuentahabiente=self.cuentas[0]).update(total_pagado=999)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_saldos", "--verificar", stdout=StringIO())
+
+        call_command("rebuild_saldos", "--verificar", "--corregir", stdout=StringIO())
+        self.assertEqual(self._fila(self.cuentas[0]).total_pagado, 0)
+        self.assertEqual(saldos.verificar(), [])
+
+
+class RecaudacionDiariaTests(PagosFixtureMixin, TestCase):
+    """recaudacion_diaria se mantiene al cobrar; los totales solo leen pagos del día abierto."""
+
+    def test_cobros_suman_al_dia_y_cobrador(self):
+        self.client.post("/pago/bulk/", self.items[:2], format="json")
+        self.client.post(
+            "/pagar-cargo/", {"cuentahabiente_id": self.cuentas[2].pk, "monto": "40.00"}, format="json"
+        )
+
+        fila = RecaudacionDiaria.objects.get(tipo=RecaudacionDiaria.TIPO_TARIFA)
+        self.assertEqual(
+            (fila.fecha, fila.cobrador_id, fila.num_pagos, fila.total),
+            (date(self.anio, 1, 1), self.cobrador.pk, 2, Decimal("300.00")),
+        )
+        fila = RecaudacionDiaria.objects.get(tipo=RecaudacionDiaria.TIPO_CARGO)
+        self.assertEqual((fila.num_pagos, fila.total), (1, Decimal("40.00")))
+        self.assertEqual(recaudacion.verificar(), [])
+
+    def test_dias_cerrados_desde_la_tabla(self):
+        dia = date(self.anio - 1, 6, 1)
+        Pago.objects.create(
+            cobrador=self.cobrador, cuentahabiente=self.cuentas[0], fecha_pago=dia,
+            monto_recibido=150, monto_descuento=0, mes="Junio", anio=self.anio - 1,
+        )
+        # Sin registrar: un día cerrado no lo ve hasta reconstruir; el día abierto sí
+        self.assertEqual(recaudacion.totales(dia, dia)["gran_total"], 0)
+        self.assertEqual(recaudacion.totales(dia, dia, hoy=dia)["tarifa"]["num_pagos"], 1)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_recaudacion", "--verificar", stdout=StringIO())
+        call_command("rebuild_recaudacion", stdout=StringIO())
+        self.assertEqual(recaudacion.verificar(), [])
+
+        totales = recaudacion.totales(date(self.anio - 1, 1, 1), date(self.anio - 1, 12, 31))
+        self.assertEqual((totales["tarifa"]["num_pagos"], totales["gran_total"]), (1, Decimal("150")))
+        self.assertEqual(recaudacion.totales(dia, dia, [self.cobrador.pk + 1])["gran_total"], 0)
+
+
+class PagoListaTests(PagosFixtureMixin, TestCase):
+    """GET /pago/: proyección .values() con el mismo JSON que PagoReadSerializer."""
+
+    def setUp(self):
+        super().setUp()
+        descuento = Descuento.objects.create(nombre_descuento="INAPAM", porcentaje=Decimal("50.00"))
+        for n, cuenta in enumerate(self.cuentas * 2):
+            Pago.objects.create(
+                cuentahabiente=cuenta, cobrador=self.cobrador,
+                descuento=descuento if n % 2 else None,
+                fecha_pago=date(self.anio, 1, 1 + n % 3), monto_recibido=100 + n,
+                monto_descuento=0, mes="01", anio=self.anio,
+                comentarios=None if n % 3 else f"c{n}",
+            )
+
+    def _esperado(self, **kwargs):
+        pagos = Pago.objects.order_by("-fecha_pago", "-id_pago")
+        return [dict(d) for d in PagoReadSerializer(pagos, many=True, **kwargs).data]
+
+    def test_mismo_json_que_serializer(self):
+        r = self.client.get("/pago/")
+
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(r.json()["results"], self._esperado())
+        self.assertNotIn("descuento_nombre", r.json()["results"][-1])
+
+    def test_campos_dispersos(self):
+        campos = ("id_pago", "cuentahabiente_nombre", "monto_recibido")
+        r = self.client.get("/pago/", {"fields": "monto_recibido,id_pago,cuentahabiente_nombre"})
+
+        self.assertEqual(r.json()["results"], self._esperado(campos=campos))
+        self.assertEqual(list(r.json()["results"][0]), list(campos))
+
+        pago = r.json()["results"][0]["id_pago"]
+        r = self.client.get(f"/pago/{pago}/", {"fields": "id_pago,estatus_deuda"})
+        self.assertEqual(r.json(), {"id_pago": pago, "estatus_deuda": "adeudo"})
+
+        r = self.client.get("/pago/", {"fields": "id_pago,password"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_una_consulta_por_pagina(self):
+        self.client.get("/pago/", {"fields": "id_pago"})  # calienta la caché del principal JWT
+        with self.assertNumQueries(1):
+            self.client.get("/pago/", {"count": "none"})
+
+    def test_conteo(self):
+        # Aproximado por omisión (en SQLite estimar_conteo cae a COUNT); exacto solo si se pide
+        with mock.patch("sicap_backend.pagination.estimar_conteo", return_value=5) as estimar:
+            self.assertEqual(self.client.get("/pago/").json()["count"], 5)
+            self.assertEqual(self.client.get("/pago/", {"count": "exact"}).json()["count"], 6)
+        self.assertEqual(estimar.call_count, 1)
+        self.assertEqual(self.client.get("/pago/", {"count": "estimate"}).json()["count"], 6)
+        self.assertNotIn("count", self.client.get("/pago/", {"count": "none"}).json())
+
+    def test_paginas_con_fechas_repetidas(self):
+        # Sin -id_pago en el orden del viewset: la pk desempata las fechas iguales
+        class DosPorPagina(KeysetPagination):
+            page_size = 2
 
-# Create your tests here.
+        vistos, url = [], "/pago/?fields=id_pago"
+        with mock.patch.object(PagoViewSet, "pagination_class", DosPorPagina), \
+                mock.patch.object(PagoViewSet, "ordering", ["-fecha_pago"]):
+            while url:
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200, r.content)
+                vistos += [p["id_pago"] for p in r.json()["results"]]
+                url = r.json()["next"]
+        esperado = list(Pago.objects.order_by("-fecha_pago", "-id_pago").values_list("pk", flat=True))
+        self.assertEqual(vistos, esperado)
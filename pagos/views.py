@@ -1,20 +1,34 @@
 # pagos/views.py
+from collections import Counter
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
 from cargos.models import Cargo
+from .bulk import registrar_pagos_en_lote
+from .idempotencia import ALCANCE_PAGO, idempotente
+from .lectura import campos_solicitados, proyectar, renglon
 from .models import Pago
 from .serializers import PagoCreateSerializer, PagoReadSerializer
 from cobrador.permissions import IsAdminOnlyWriteExceptPost  # <— usa este permiso
+from corte import recaudacion
+from cuentahabientes.saldos import SaldosMixin
+from sicap_backend.pagination import KeysetPagination
 
-class PagoViewSet(viewsets.ModelViewSet):
+class PagoViewSet(SaldosMixin, viewsets.ModelViewSet):
     """
     - GET: cualquiera autenticado.
     - POST: admin / supervisor / cobrador.
     - PUT/PATCH/DELETE: solo admin.
     - En POST, el cobrador se toma de request.user.
+    - POST acepta header Idempotency-Key (ver pagos/idempotencia.py).
+    - PUT/PATCH/DELETE recalculan cuentahabiente_saldo de la cuenta (SaldosMixin)
+      y recaudacion_diaria del día y cobrador (antes y después del cambio).
+    - GET acepta ?fields=a,b; el listado sale de una proyección .values()
+      (ver pagos/lectura.py) con el mismo JSON que PagoReadSerializer.
     """
     queryset = (
         Pago.objects
@@ -22,12 +36,44 @@ class PagoViewSet(viewsets.ModelViewSet):
         .order_by("-fecha_pago", "-id_pago")
     )
     permission_classes = [IsAuthenticated & IsAdminOnlyWriteExceptPost]
+    pagination_class = KeysetPagination
+    ordering = ["-fecha_pago", "-id_pago"]
+    bulk_max_items = 500
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return PagoReadSerializer
         return PagoCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        campos = campos_solicitados(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Las llaves del cursor tienen que venir en cada renglón aunque no se pidan
+        filas = proyectar(queryset, campos, extra=[c.lstrip("-") for c in self.ordering])
+
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response([renglon(f, campos) for f in page])
+        return Response([renglon(f, campos) for f in filas])
+
+    def retrieve(self, request, *args, **kwargs):
+        campos = campos_solicitados(request)
+        return Response(PagoReadSerializer(self.get_object(), campos=campos).data)
+
+    def perform_update(self, serializer):
+        anterior = (serializer.instance.fecha_pago, serializer.instance.cobrador_id)
+        with transaction.atomic():
+            super().perform_update(serializer)
+            pago = serializer.instance
+            recaudacion.recalcular(dias=[anterior, (pago.fecha_pago, pago.cobrador_id)])
+
+    def perform_destroy(self, instance):
+        dia = (instance.fecha_pago, instance.cobrador_id)
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            recaudacion.recalcular(dias=[dia])
+
+    @idempotente(ALCANCE_PAGO)
     def create(self, request, *args, **kwargs):
         ser = self.get_serializer(data=request.data, context={"request": request})
         ser.is_valid(raise_exception=True)
@@ -51,3 +97,36 @@ class PagoViewSet(viewsets.ModelViewSet):
 
         read = PagoReadSerializer(pago)
         return Response(read.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        POST /pago/bulk/
+        Body: [{idempotency_key, cuentahabiente, fecha_pago, monto_recibido,
+                descuento?, comentarios?}, ...]  (o {"pagos": [...]})
+        Responde un resultado por renglón (creado / duplicado / error); un
+        reintento con las mismas claves no vuelve a cobrar.
+        """
+        items = request.data.get("pagos") if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Se espera una lista de pagos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {"error": f"Máximo {self.bulk_max_items} pagos por lote"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = registrar_pagos_en_lote(items, request.user)
+        conteo = Counter(r["estado"] for r in resultados)
+        return Response(
+            {
+                "creados": conteo["creado"],
+                "duplicados": conteo["duplicado"],
+                "errores": conteo["error"],
+                "resultados": resultados,
+            },
+            status=status.HTTP_200_OK
+        )
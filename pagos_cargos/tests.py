@@ -1,3 +1,108 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from cargos.models import Cargo, TipoCargo
+from cobrador.jwt_utils import create_access_token
+from cobrador.models import Cobrador
+from colonia.models import Colonia
+from cuentahabientes.models import Cuentahabiente
+from .models import PagoCargos
+
+
+class PagarCargoTests(TestCase):
+    """POST /pagar-cargo/: reparte el monto del cargo más viejo al más nuevo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cobrador = Cobrador.objects.create(
+            nombre="Cobra", apellidos="Dor", email="cargos@test.mx",
+            usuario="cargos", password="secreto123", role="cobrador",
+        )
+        colonia = Colonia.objects.create(nombre_colonia="Centro", codigo_postal=90000)
+        cls.tipo = TipoCargo.objects.create(nombre="Reconexión", monto=Decimal("100.00"))
+        cls.cuentas = [
+            Cuentahabiente.objects.create(
+                numero_contrato=500 + n, nombres=f"N{n}", ap="Ap", am="Am", telefono="0",
+                colonia=colonia, saldo_pendiente=0,
+            )
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer " + create_access_token({"sub": self.cobrador.pk})
+        )
+
+    def _cargos(self, cuenta, saldos):
+        return [
+            Cargo.objects.create(
+                cuentahabiente=cuenta, tipo_cargo=self.tipo, saldo_restante_cargo=saldo,
+                fecha_cargo=date(2025, mes, 1), activo=True,
+            )
+            for mes, saldo in enumerate(saldos, start=1)
+        ]
+
+    def test_reparte_en_orden(self):
+        viejo, medio, nuevo = self._cargos(
+            self.cuentas[0], [Decimal("100.00"), Decimal("50.00"), Decimal("80.00")]
+        )
+
+        r = self.client.post(
+            "/pagar-cargo/",
+            {"cuentahabiente_id": self.cuentas[0].pk, "monto": "170.00", "fecha_pago": "2025-06-01"},
+            format="json",
+        )
+
+        self.assertEqual(r.status_code, 200, r.content)
+        body = r.json()
+        self.assertEqual(body["saldo_restante_cargo"], "60.00")
+        self.assertEqual(
+            [(a["cargo_id"], a["monto_aplicado"], a["pago_completo"]) for a in body["aplicaciones"]],
+            [(viejo.pk, "100.00", True), (medio.pk, "50.00", True), (nuevo.pk, "20.00", False)],
+        )
+        self.assertEqual(
+            sorted(a["pago_id"] for a in body["aplicaciones"]),
+            sorted(PagoCargos.objects.values_list("id_pago", flat=True)),
+        )
+        nuevo.refresh_from_db()
+        self.assertEqual(nuevo.saldo_restante_cargo, Decimal("60.00"))
+        self.assertTrue(nuevo.activo)
+        self.assertEqual(Cargo.objects.filter(activo=True).count(), 1)
+
+    def test_liquidar_todo_y_excedente(self):
+        self._cargos(self.cuentas[0], [Decimal("30.00")])
+        datos = {"cuentahabiente_id": self.cuentas[0].pk, "monto": "31.00"}
+
+        r = self.client.post("/pagar-cargo/", datos, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["deuda_total"], "30.00")
+
+        datos["monto"] = "30.00"
+        r = self.client.post("/pagar-cargo/", datos, format="json")
+        self.assertEqual(r.json()["saldo_restante_cargo"], "0")
+
+        r = self.client.post("/pagar-cargo/", datos, format="json")
+        self.assertEqual(r.json()["error"], "No hay cargos pendientes")
+
+    def test_consultas_constantes(self):
+        self._cargos(self.cuentas[0], [Decimal("10.00")] * 2)
+        self._cargos(self.cuentas[1], [Decimal("10.00")] * 8)
+        call_command("rebuild_saldos", stdout=StringIO())  # filas ya existentes: solo incrementos
+
+        # Calentar la caché del principal JWT para comparar solo el pago
+        self.client.post("/pagar-cargo/", {"cuentahabiente_id": 0, "monto": "1.00"}, format="json")
 
-# Create your tests here.
+        for cuenta, monto in ((self.cuentas[0], "20.00"), (self.cuentas[1], "80.00")):
+            # savepoint, lock de la cuenta, cargos, UPDATE cargos, INSERT pagos,
+            # dos UPDATE de cuentahabiente_saldo, recaudacion_diaria, release
+            with self.assertNumQueries(9):
+                r = self.client.post(
+                    "/pagar-cargo/", {"cuentahabiente_id": cuenta.pk, "monto": monto}, format="json"
+                )
+            self.assertEqual(r.status_code, 200, r.content)
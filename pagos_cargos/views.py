@@ -3,17 +3,23 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from django.db import transaction
-from django.db.models import Sum
 from django.utils import timezone
 from cargos.models import Cargo
+from corte import recaudacion
+from cuentahabientes import saldos
+from cuentahabientes.materialized import on_escritura
+from cuentahabientes.models import Cuentahabiente
+from pagos.idempotencia import ALCANCE_PAGAR_CARGO, idempotente
 from pagos_cargos.models import PagoCargos
 from pagos_cargos.serializers import PagarCargoSerializer
 
 class PagarCargoView(APIView):
 
+    @idempotente(ALCANCE_PAGAR_CARGO)
     def post(self, request):
         """
         POST /pagar-cargo/
+        Acepta header Idempotency-Key: un reintento devuelve la respuesta original.
         """
         serializer = PagarCargoSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -26,34 +32,43 @@ class PagarCargoView(APIView):
         comentarios = data.get("comentarios", "")
         fecha_pago = data.get("fecha_pago", timezone.localtime().date())
 
-        cargos = Cargo.objects.filter(
-            cuentahabiente_id=cuentahabiente_id,
-            activo=True
-        ).order_by("fecha_cargo")
+        with transaction.atomic():
+
+            # La cuenta primero (mismo orden que PagoCreateSerializer): dos
+            # pagos de la misma cuenta no escriben cuentahabiente_saldo a la vez.
+            Cuentahabiente.objects.select_for_update().filter(pk=cuentahabiente_id).exists()
 
-        if not cargos.exists():
-            return Response(
-                {"error": "No hay cargos pendientes"},
-                status=status.HTTP_400_BAD_REQUEST
+            # Cargos activos bloqueados, el más viejo primero; el total y la
+            # repartición se calculan en memoria sobre estas mismas filas.
+            cargos = list(
+                Cargo.objects.select_for_update()
+                .filter(cuentahabiente_id=cuentahabiente_id, activo=True)
+                .order_by("fecha_cargo", "id_cargo")
             )
-        
-        total_deuda = cargos.aggregate(
-            total=Sum("saldo_restante_cargo")
-        )["total"] or Decimal("0")
 
-        if monto > total_deuda:
-            return Response(
-                {
-                    "error": "El monto excede la deuda total",
-                    "deuda_total": str(total_deuda)
-                },
-                status=status.HTTP_400_BAD_REQUEST
+            if not cargos:
+                return Response(
+                    {"error": "No hay cargos pendientes"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            total_deuda = sum(
+                (c.saldo_restante_cargo for c in cargos), Decimal("0")
             )
 
-        with transaction.atomic():
+            if monto > total_deuda:
+                return Response(
+                    {
+                        "error": "El monto excede la deuda total",
+                        "deuda_total": str(total_deuda)
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             monto_restante = monto
-            aplicaciones = []
+            cargos_aplicados = []
+            pagos = []
+            completos = []
 
             for cargo in cargos:
                 if monto_restante <= 0:
@@ -70,31 +85,41 @@ class PagarCargoView(APIView):
                     pago_completo = False
 
                 monto_restante -= monto_aplicado
-                cargo.save()
-
-                pago = PagoCargos.objects.create(
-                    cuentahabiente_id=cuentahabiente_id,
-                    cargo=cargo,
-                    cobrador=cobrador,
-                    monto_recibido=monto_aplicado,
-                    comentarios=comentarios,
-                    fecha_pago = fecha_pago,
+                cargos_aplicados.append(cargo)
+                completos.append(pago_completo)
+                pagos.append(
+                    PagoCargos(
+                        cuentahabiente_id=cuentahabiente_id,
+                        cargo=cargo,
+                        cobrador=cobrador,
+                        monto_recibido=monto_aplicado,
+                        comentarios=comentarios,
+                        fecha_pago=fecha_pago,
+                    )
                 )
 
-                aplicaciones.append({
+            # Una sentencia para los cargos y otra para los pagos
+            Cargo.objects.bulk_update(cargos_aplicados, ["saldo_restante_cargo", "activo"])
+            PagoCargos.objects.bulk_create(pagos)
+            saldos.registrar_pagos_cargo(cuentahabiente_id, pagos)
+            recaudacion.registrar_pagos_cargo(pagos)
+
+            # bulk_* no dispara post_save: avisar a reportes
+            on_escritura(sender=PagoCargos)
+
+            aplicaciones = [
+                {
                     "pago_id": pago.id_pago,
-                    "cargo_id": cargo.id_cargo,
-                    "monto_aplicado": str(monto_aplicado),
+                    "cargo_id": pago.cargo.id_cargo,
+                    "monto_aplicado": str(pago.monto_recibido),
                     "pago_completo": pago_completo,
                     "fecha_pago": str(fecha_pago),
-                })
-
-            saldo_restante = Cargo.objects.filter(
-                cuentahabiente_id=cuentahabiente_id,
-                activo=True
-            ).aggregate(
-                total=Sum("saldo_restante_cargo")
-            )["total"] or Decimal("0")
+                }
+                for pago, pago_completo in zip(pagos, completos)
+            ]
+
+            activos = [c.saldo_restante_cargo for c in cargos if c.activo]
+            saldo_restante = sum(activos, Decimal("0")) if activos else Decimal("0")
 
         return Response({
             "status": "Pago aplicado correctamente",
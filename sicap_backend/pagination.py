@@ -0,0 +1,109 @@
+# sicap_backend/pagination.py
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.settings import api_settings
+
+
+def estimar_conteo(queryset) -> int:
+    """
+    Conteo aproximado sin COUNT(*):
+    - Tabla / vista materializada sin filtros: pg_class.reltuples.
+    - Cualquier otro caso: filas estimadas por el planner (EXPLAIN).
+    Fuera de PostgreSQL cae a un COUNT normal.
+    """
+    conn = connections[queryset.db]
+    if conn.vendor != "postgresql":
+        return queryset.count()
+
+    with conn.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint, relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            if row and row[1] in ("r", "m") and row[0] >= 0:
+                return int(row[0])
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset): sin COUNT(*) ni OFFSET profundos.
+
+    - El orden sale de `ordering` del viewset (o de ?ordering= si el viewset
+      usa OrderingFilter); el primer campo es la llave del cursor y la pk
+      siempre va al final como desempate (fechas repetidas, contratos con
+      varios renglones...) para que las páginas no repitan ni salten filas.
+    - "count" viene siempre, como con PageNumberPagination, pero aproximado
+      (ver estimar_conteo): un COUNT(*) por página sobre estado_cuenta_new o
+      reporte_padron_general cuesta tanto como la página. ?count=exact lo
+      pide exacto y ?count=none lo omite. Viewsets de tablas chicas (los
+      listados de cortes) declaran `conteo_paginacion = "exact"`.
+    - Con ?search= (sin ?ordering=) en viewsets con BusquedaTrigramFilter el
+      orden es la similitud (cuentahabientes/busqueda.py), que no sirve de
+      llave de cursor: esas páginas van por ?limit=&offset= (son pocas).
+    """
+    page_size = 50
+    ordering = "-pk"
+    count_query_param = "count"
+    CONTEO_EXACTO, CONTEO_ESTIMADO, SIN_CONTEO = "exact", "estimate", "none"
+
+    def _por_ranking(self, request, view):
+        params = request.query_params
+        return bool(
+            getattr(view, "busqueda_trigram", None)
+            and params.get(api_settings.SEARCH_PARAM)
+            and not params.get(api_settings.ORDERING_PARAM)
+        )
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "ordering", None)
+        if ordering:
+            self.ordering = ordering
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        pk = queryset.model._meta.pk.name
+        if not any(campo.lstrip("-") in ("pk", pk) for campo in ordering):
+            ordering += ("-pk" if ordering[0].startswith("-") else "pk",)
+        return ordering
+
+    def _conteo(self, request, queryset, view):
+        por_omision = getattr(view, "conteo_paginacion", self.CONTEO_ESTIMADO)
+        modo = request.query_params.get(self.count_query_param, por_omision)
+        if modo == self.SIN_CONTEO:
+            return None
+        if modo == self.CONTEO_ESTIMADO:
+            return estimar_conteo(queryset)
+        return queryset.count()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.por_offset = None
+        if self._por_ranking(request, view):
+            self.por_offset = LimitOffsetPagination()
+            self.por_offset.default_limit = self.page_size
+            return self.por_offset.paginate_queryset(queryset, request, view)
+        self.count = self._conteo(request, queryset, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.por_offset is not None:
+            return self.por_offset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {"count": self.count, **response.data}
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count"] = {"type": "integer", "example": 123}
+        return schema
@@ -150,7 +150,8 @@ else:
 CSRF_TRUSTED_ORIGINS = ["https://*.onrender.com", "https://*.vercel.app"]
 
 CORS_ALLOW_CREDENTIALS = True
-CORS_ALLOW_HEADERS = ["authorization", "content-type"]
+CORS_ALLOW_HEADERS = ["authorization", "content-type", "idempotency-key"]
+CORS_EXPOSE_HEADERS = ["X-Stale-Since", "X-Refreshed-At", "Idempotent-Replayed"]
 
 # ---------- COOKIES / HTTPS ----------
 SESSION_COOKIE_SECURE = IS_PROD
@@ -180,6 +181,8 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_RATES": {
         "anon": "30/min",
         "user": "120/min",
+        # Una petición por tecla en el autocompletado de ventanilla
+        "autocomplete": "600/min",
     },
 }
 
@@ -189,11 +192,54 @@ if IS_PROD:
         "rest_framework.renderers.JSONRenderer",
     ]
 
+# ---------- VISTAS MATERIALIZADAS ----------
+# El REFRESH lo corre cron: manage.py vistas_materializadas --refrescar --solo-stale
+MATVIEW_SETTINGS = {
+    # Segundos que cada worker guarda el estado (X-Stale-Since / X-Refreshed-At)
+    "ESTADO_CACHE_TTL": int(os.environ.get("MATVIEW_ESTADO_CACHE_TTL", "5")),
+}
+
+# ---------- CIERRE ANUAL ----------
+CIERRE_SETTINGS = {
+    # Cuentas por lote (una transacción por lote) en modo "lotes"
+    "TAMANO_LOTE": int(os.environ.get("CIERRE_TAMANO_LOTE", "500")),
+    # Segundos sin avance para considerar caído un cierre "en_proceso" y permitir reanudarlo
+    "LATIDO_TIMEOUT": int(os.environ.get("CIERRE_LATIDO_TIMEOUT", "120")),
+    # Tope de vida del resumen previo en caché (se invalida antes con cada escritura)
+    "RESUMEN_CACHE_TTL": int(os.environ.get("CIERRE_RESUMEN_CACHE_TTL", "60")),
+}
+
+# ---------- IDEMPOTENCIA (pagos) ----------
+IDEMPOTENCIA_SETTINGS = {
+    # Horas que se conserva la respuesta de un pago para reintentos (limpiar_idempotencia)
+    "TTL_HORAS": int(os.environ.get("IDEMPOTENCIA_TTL_HORAS", "72")),
+}
+
+# ---------- AUTOCOMPLETADO (ventanilla) ----------
+AUTOCOMPLETE_SETTINGS = {
+    "TTL": int(os.environ.get("AUTOCOMPLETE_TTL", "30")),  # segundos en caché por prefijo
+    "LIMITE": 10,
+    "LIMITE_MAX": 25,
+    "MIN_CARACTERES": 2,  # para nombres; los contratos desde el primer dígito
+}
+
+# ---------- CORTE DE CAJA ----------
+CORTE_SETTINGS = {
+    # Segundos en que un corte idéntico sin validar se reutiliza en lugar de
+    # generar otro folio (doble clic, reintentos del front); 0 = desactivado
+    "REUTILIZAR_SEGUNDOS": int(os.environ.get("CORTE_REUTILIZAR_SEGUNDOS", "120")),
+}
+
 # ---------- JWT ----------
 JWT_SETTINGS = {
     "ACCESS_TOKEN_LIFETIME": 60 * 60 * 24,  # 1 día
     "ALGORITHM": "HS256",
     "SECRET": os.environ.get("JWT_SECRET", SECRET_KEY),
+    # Cache de principals en JWTAuthentication: segundos que un Cobrador
+    # autenticado se reutiliza sin volver a la BD (0 = desactivado).
+    "PRINCIPAL_CACHE_TTL": int(os.environ.get("JWT_PRINCIPAL_CACHE_TTL", "60")),
+    # Compartir el sello de invalidación entre workers vía CACHES["default"].
+    "PRINCIPAL_CACHE_SHARED": _to_bool(os.environ.get("JWT_PRINCIPAL_CACHE_SHARED"), False),
 }
 
 # ---------- LOGGING ----------
@@ -225,5 +271,16 @@ AWS_S3_ENDPOINT_URL     = "https://sfo3.digitaloceanspaces.com"
 AWS_S3_FILE_OVERWRITE   = False
 AWS_DEFAULT_ACL         = "private"
 
+# URLs firmadas de los PDFs de corte (corte/almacenamiento.py)
+SPACES_SETTINGS = {
+    "URL_EXPIRACION": 3600,  # segundos de validez de cada URL firmada
+    "URL_MARGEN": 300,       # se vuelve a firmar si le quedan menos de estos segundos
+    "URL_CACHE_MAX": 2048,   # URLs por proceso (LRU)
+    "LOTE_MAX": 100,         # folios por petición en ver-pdfs/
+    # Subida directa del PDF firmado (pdf/subida/ + pdf/confirmar/)
+    "SUBIDA_EXPIRACION": 900,             # segundos para usar el POST firmado
+    "PDF_TAMANO_MAX": 15 * 1024 * 1024,   # bytes
+}
+
 DEFAULT_FILE_STORAGE     = "storages.backends.s3boto3.S3Boto3Storage"
 MEDIA_URL                = "https://sicap-pdfs.sfo3.digitaloceanspaces.com/"
\ No newline at end of file